@@ -19,7 +19,7 @@ class SourceViewSet(rf_mixins.RetrieveModelMixin, rf_mixins.UpdateModelMixin,
     Viewset that does not implement listing, deleting and creating of sources.
     """
     serializer_class = serializers.SourceSerializer
-    queryset = source.models.Source.objects.all()
+    queryset = source.models.Source.objects.with_main_seed()
     http_method_names = ['head', 'get', 'patch']
 
 
@@ -0,0 +1,110 @@
+"""
+Compiled blacklists
+
+Blacklist ``url_list`` entries are compiled into hashed indexes once so that
+any number of seeds can be matched in a single pass. Supported rules:
+
+    http://example.com/page     exact URL, as are all entries without "*"
+    example.com/*               any URL on the host
+    *.example.com               any URL on the domain or its subdomains
+    http://example.com/path/*   any URL starting with the prefix, the scheme
+                                can be left out to match both http & https
+
+Hosts are compared case-insensitively and without ports.
+"""
+from collections import defaultdict
+from urllib.parse import urlsplit, urlunsplit
+
+
+def split_url(url):
+    """
+    Split ``url`` (the scheme is optional) into lowercase scheme (or None),
+    lowercase host without port and the rest of the URL starting with "/"
+    :return: (scheme, host, rest) or None if it can't be parsed
+    """
+    if '://' not in url:
+        url = '//' + url
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    rest = urlunsplit(('', '', parts.path or '/', parts.query, parts.fragment))
+    return parts.scheme.lower() or None, host.rstrip('.'), rest
+
+
+class BlacklistMatcher:
+    """
+    Blacklist rules indexed by their host, matching a URL takes a few set
+    lookups regardless of the number of rules
+    """
+
+    def __init__(self, rules=()):
+        self.exact = set()
+        self.domains = set()
+        # {host: [(scheme or None, rest of the prefix)]}
+        self.prefixes = defaultdict(list)
+        # Prefixes that can't be parsed are compared as they are
+        self.raw_prefixes = []
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule):
+        rule = rule.strip()
+        if not rule:
+            return
+        if rule.startswith('*.'):
+            parts = split_url(rule[2:])
+            if parts is not None:
+                self.domains.add(parts[1])
+        elif rule.endswith('*'):
+            prefix = rule[:-1]
+            parts = split_url(prefix)
+            if parts is None:
+                self.raw_prefixes.append(prefix)
+            else:
+                scheme, host, rest = parts
+                self.prefixes[host].append((scheme, rest))
+        else:
+            self.exact.add(rule)
+
+    def __len__(self):
+        return (len(self.exact) + len(self.domains) + len(self.raw_prefixes) +
+                sum(len(p) for p in self.prefixes.values()))
+
+    @property
+    def has_patterns(self):
+        return bool(self.domains or self.prefixes or self.raw_prefixes)
+
+    def _match_parts(self, scheme, host, rest):
+        if self.domains:
+            # example.com, then all of its parent domains
+            labels = host.split('.')
+            for i in range(len(labels)):
+                if '.'.join(labels[i:]) in self.domains:
+                    return True
+        return any(
+            (prefix_scheme is None or prefix_scheme == scheme) and
+            rest.startswith(prefix_rest)
+            for prefix_scheme, prefix_rest in self.prefixes.get(host, ()))
+
+    def matches(self, url):
+        if url in self.exact:
+            return True
+        if not self.has_patterns:
+            return False
+        parts = split_url(url)
+        if parts is not None and self._match_parts(*parts):
+            return True
+        return any(url.startswith(prefix) for prefix in self.raw_prefixes)
+
+    def __contains__(self, url):
+        return self.matches(url)
+
+    def clean(self, urls):
+        """ :return: set of ``urls`` that aren't blacklisted """
+        if not self.has_patterns:
+            return set(urls) - self.exact
+        return set(url for url in urls if not self.matches(url))
@@ -1,5 +1,4 @@
-import operator
-from functools import reduce
+from itertools import chain
 
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
@@ -7,6 +6,11 @@ from reversion import revisions
 
 from core.models import BaseModel
 
+from .matcher import BlacklistMatcher
+
+# Compiled matchers of this process, {blacklist_type: (version, matcher)}
+_matchers = {}
+
 
 @revisions.register
 class Blacklist(BaseModel):
@@ -46,17 +50,31 @@ class Blacklist(BaseModel):
             blacklist_type=blacklist_type
         ).values_list('url_list', flat=True)
         # blacklist urls is now list of contents
-        urls_parsed = map(str.split, blacklist_urls)
-        return reduce(operator.add, urls_parsed, [])
+        return list(chain.from_iterable(map(str.split, blacklist_urls)))
 
     @classmethod
     def last_change(cls):
         agg = Blacklist.objects.all().aggregate(models.Max('last_changed'))
         return agg.get('last_changed__max')
 
+    @classmethod
+    def get_matcher(cls, blacklist_type):
+        """
+        Return the compiled BlacklistMatcher of the type; compiled matchers
+        are cached by the process until any blacklist changes
+        """
+        # Count catches deleted blacklists which don't change last_changed
+        version = tuple(cls.objects.aggregate(
+            models.Max('last_changed'), models.Count('pk')).values())
+        cached_version, matcher = _matchers.get(blacklist_type, (None, None))
+        if matcher is None or cached_version != version:
+            matcher = BlacklistMatcher(
+                cls.collect_urls_by_type(blacklist_type))
+            _matchers[blacklist_type] = (version, matcher)
+        return matcher
+
     @classmethod
     def dump(cls):
         blacklist_urls = cls.objects.all().values_list('url_list', flat=True)
-        urls_parsed = map(str.split, blacklist_urls)
         # Remove duplicates
-        return list(set(reduce(operator.add, urls_parsed, [])))
+        return list(set(chain.from_iterable(map(str.split, blacklist_urls))))
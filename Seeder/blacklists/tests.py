@@ -0,0 +1,78 @@
+from django.test import TestCase
+
+from blacklists.matcher import BlacklistMatcher
+from blacklists.models import Blacklist
+
+
+class BlacklistMatcherTest(TestCase):
+    """
+    Tests matching of the different blacklist rules
+    """
+
+    def test_rules(self):
+        matcher = BlacklistMatcher([
+            "http://exact.cz/page",
+            "bare.cz",
+            "host.cz/*",
+            "*.domain.cz",
+            "http://prefix.cz/private/*",
+            "any-scheme.cz/private/*",
+        ])
+        seeds = {
+            "http://exact.cz/page": True,
+            "http://exact.cz/page/other": False,
+            # Entries without "*" are exact URLs
+            "bare.cz": True,
+            "http://bare.cz/": False,
+            "https://host.cz/anything": True,
+            "http://host.cz": True,
+            "http://sub.host.cz/": False,
+            "http://domain.cz": True,
+            "http://www.DOMAIN.cz/x": True,
+            "http://notdomain.cz/": False,
+            "http://prefix.cz/private/1": True,
+            "https://prefix.cz/private/1": False,
+            "http://prefix.cz/public/": False,
+            "https://any-scheme.cz/private/1": True,
+            "http://any-scheme.cz/public/": False,
+        }
+        for seed, blacklisted in seeds.items():
+            self.assertEqual(matcher.matches(seed), blacklisted, seed)
+        self.assertSetEqual(
+            matcher.clean(seeds),
+            set(s for s, blacklisted in seeds.items() if not blacklisted))
+
+    def test_hosts_normalized(self):
+        matcher = BlacklistMatcher([
+            "http://Prefix.cz/private/*",
+            "port.cz:8080/*",
+            "*.domain.cz:443",
+        ])
+        seeds = {
+            "http://prefix.cz/private/1": True,
+            "HTTP://PREFIX.CZ/private/2": True,
+            "http://prefix.cz:80/private/3": True,
+            # Paths stay case-sensitive
+            "http://prefix.cz/PRIVATE/4": False,
+            "http://port.cz/": True,
+            "https://PORT.cz:8080/page": True,
+            "http://www.domain.cz:8000/": True,
+        }
+        for seed, blacklisted in seeds.items():
+            self.assertEqual(matcher.matches(seed), blacklisted, seed)
+
+    def test_matcher_cached(self):
+        blacklist = Blacklist.objects.create(
+            title="B", blacklist_type=Blacklist.TYPE_HARVEST,
+            url_list="http://a.cz\nhttp://b.cz")
+        matcher = Blacklist.get_matcher(Blacklist.TYPE_HARVEST)
+        self.assertIn("http://b.cz", matcher)
+        self.assertIs(matcher, Blacklist.get_matcher(Blacklist.TYPE_HARVEST))
+        # Changed blacklists are compiled again
+        blacklist.url_list = "http://a.cz"
+        blacklist.save()
+        matcher = Blacklist.get_matcher(Blacklist.TYPE_HARVEST)
+        self.assertNotIn("http://b.cz", matcher)
+        blacklist.delete()
+        self.assertEqual(
+            len(Blacklist.get_matcher(Blacklist.TYPE_HARVEST)), 0)
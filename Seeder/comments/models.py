@@ -81,6 +81,8 @@ class Comment(SearchModel, MPTTModel):
 
     objects = CommentManager()
 
+    search_prefetch = ('content_object',)
+
     def _get_user_info(self):
         """
         Get a dictionary that pulls together information about the poster
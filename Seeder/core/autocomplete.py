@@ -0,0 +1,70 @@
+from hashlib import md5
+
+from dal import autocomplete
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+
+def trigram_enabled(model):
+    """ pg_trgm is only available on PostgreSQL, see the trigram migrations """
+    return connections[model._default_manager.db].vendor == 'postgresql'
+
+
+class RankedAutocompleteView(autocomplete.Select2QuerySetView):
+    """
+    Autocomplete for authenticated users. On PostgreSQL the results are
+    matched using trigram indexes (so typos are forgiven) and ranked by their
+    similarity to the query, other databases fall back to icontains.
+
+    Only the first ``max_results`` results are fetched, so that matches don't
+    have to be counted for the pagination, and responses are cached for a
+    short while as the same prefixes are typed over and over.
+    """
+    model = None
+    search_fields = ()
+    max_results = 50
+    cache_timeout = 60
+
+    def get_base_queryset(self):
+        return self.model._default_manager.all()
+
+    def get_search_filter(self):
+        """ :return: Q object of matches of ``self.q`` """
+        query = Q()
+        for field in self.search_fields:
+            query |= Q(**{f'{field}__icontains': self.q})
+            if trigram_enabled(self.model):
+                query |= Q(**{f'{field}__trigram_similar': self.q})
+        return query
+
+    def get_queryset(self):
+        if not self.request.user.is_authenticated:
+            return self.model.objects.none()
+        qs = self.get_base_queryset()
+        if self.q:
+            qs = qs.filter(self.get_search_filter())
+            if trigram_enabled(self.model):
+                similarity = [TrigramSimilarity(field, self.q)
+                              for field in self.search_fields]
+                qs = qs.annotate(rank=(
+                    Greatest(*similarity) if len(similarity) > 1
+                    else similarity[0]
+                )).order_by('-rank', 'pk')
+        return list(qs[:self.max_results])
+
+    def get_cache_key(self):
+        params = md5(self.request.GET.urlencode().encode()).hexdigest()
+        return f'autocomplete:{type(self).__name__}:{params}'
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = self.get_cache_key()
+        response = cache.get(key)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            cache.set(key, response, self.cache_timeout)
+        return response
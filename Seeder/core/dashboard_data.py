@@ -3,7 +3,8 @@ from django.utils.translation import ugettext_lazy as _
 from django.utils import timezone
 from django.db.models import Count, Q, Case, When, Value, BooleanField
 from django.db.models.functions import Lower
-from django.core.paginator import Paginator
+
+from paginator.paginator import KeysetPaginator
 
 from qa.models import QualityAssuranceCheck
 from source import models as source_models
@@ -29,7 +30,7 @@ class DashboardCard(object):
     empty = False
     reversable = False
 
-    def __init__(self, request, page=1):
+    def __init__(self, request, page=1, cursor=None):
         """
         Request is passed to have access to user and session
         """
@@ -40,9 +41,9 @@ class DashboardCard(object):
         reverse_session_name = REVERSE_SESSION.format(self.id)
         reverse_session = self.request.session.get(reverse_session_name, False)
         qs = self.get_queryset()
-        self.paginator = Paginator(qs.reverse() if reverse_session else qs,
-                                   self.elements_per_card,
-                                   orphans=3)
+        self.paginator = KeysetPaginator(
+            qs.reverse() if reverse_session else qs,
+            self.elements_per_card, orphans=3, cursor=cursor)
         self.page = self.paginator.page(page)
         if not self.paginator.count:
             self.empty = True
@@ -3,10 +3,14 @@
 """
 
 from django.contrib import messages
-from django.http.response import HttpResponseRedirect, JsonResponse
+from django.http.response import (
+    HttpResponseRedirect, JsonResponse, StreamingHttpResponse)
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.gzip import gzip_page
 from django.views.generic.base import View, ContextMixin
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import DetailView
@@ -19,7 +23,9 @@ from django_tables2.export.views import ExportMixin
 
 from reversion.models import Version
 
-from .utils import dict_diff
+from paginator.paginator import TableKeysetPaginator
+
+from .utils import dict_diff, chunked_text
 
 
 class LoginMixin(object):
@@ -152,6 +158,12 @@ class FilteredListView(ExportMixin, SingleTableMixin, FilterView):
     add_link_title = _('Add')
     full_export_url = None
 
+    def get_table_pagination(self, table):
+        """ Deep pages of large tables are sought by the table ordering """
+        return dict(super().get_table_pagination(table),
+                    klass=TableKeysetPaginator,
+                    cursor=self.request.GET.get('cursor'))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['export_formats'] = ['csv', 'xlsx']
@@ -177,3 +189,54 @@ class JSONView(View, ContextMixin):
 
     def get_data(self, context):
         raise NotImplementedError
+
+
+class ConditionalStreamingMixin(object):
+    """
+    Streams the response content in chunks instead of rendering it in memory.
+    Responses are gzipped when the client accepts it and conditional requests
+    (If-None-Match, If-Modified-Since) are answered with 304 Not Modified
+    without producing the content at all.
+    """
+    content_type = 'text/plain; charset=utf-8'
+
+    @method_decorator(gzip_page)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_etag(self, context):
+        return None
+
+    def get_last_modified(self, context):
+        return None
+
+    def get_streaming_content(self, context):
+        """
+        :return: iterable of strings
+        """
+        raise NotImplementedError
+
+    def render_to_response(self, context, **response_kwargs):
+        etag = self.get_etag(context)
+        if etag:
+            etag = quote_etag(etag)
+        last_modified = self.get_last_modified(context)
+        if last_modified:
+            last_modified = int(last_modified.timestamp())
+
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = StreamingHttpResponse(
+                chunked_text(self.get_streaming_content(context)),
+                content_type=self.content_type,
+                **response_kwargs
+            )
+            # Keep the context available e.g. for tests
+            response.context_data = context
+
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
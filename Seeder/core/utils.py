@@ -1,6 +1,8 @@
 # pylint: disable=W0613
 
-from urllib.parse import urlparse
+import csv
+import tld
+from urllib.parse import urlparse, urlsplit
 from django.conf import settings
 
 def merge_dicts(x, y):
@@ -41,6 +43,39 @@ def dict_diff(first, second):
     return diff
 
 
+def chunked_text(parts, chunk_size=64 * 1024):
+    """
+    Join an iterable of strings into chunks of roughly ``chunk_size``
+    characters, so that streamed responses aren't sent (and gzipped) in
+    many tiny pieces
+    """
+    buffer, length = [], 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= chunk_size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+class _Echo:
+    """ File-like object that returns what's written instead of storing it """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """
+    Format an iterable of rows as CSV lines one by one, to be streamed
+    """
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
 def show_toolbar(request):
     """
     Only show Django Toolbar for user "fasand" or "petr"
@@ -61,4 +96,47 @@ def get_wayback_url(url):
         url = f"{parsed.netloc}{parsed.path}"
     except: # If it fails (likely on ValueError), keep original URL
         pass
-    return settings.WAYBACK_URL.format(url=url)
\ No newline at end of file
+    return settings.WAYBACK_URL.format(url=url)
+
+
+def canonicalize_url(url):
+    """
+    Normalized form of a URL used to compare seeds: without the scheme,
+    "www.", default port, fragment and trailing slash, with a lowercase host.
+
+    >>> canonicalize_url('https://WWW.Example.cz:443/Path/?q=1#top')
+    'example.cz/Path?q=1'
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = f"http://{url}"
+    try:
+        parsed = urlsplit(url)
+        port = parsed.port
+    except ValueError:
+        return url.split('://', 1)[1].lower()
+    host = (parsed.hostname or '').rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    canonical = host if port in (None, 80, 443) else f"{host}:{port}"
+    canonical += parsed.path.rstrip('/')
+    if parsed.query:
+        canonical += f"?{parsed.query}"
+    return canonical
+
+
+def get_registered_domain(url):
+    """
+    Domain of a URL registered under a public suffix, or None if the URL
+    doesn't have one
+
+    >>> get_registered_domain('https://www.blog.example.co.uk/page')
+    'example.co.uk'
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = f"http://{url}"
+    try:
+        return tld.get_tld(url.lower(), fail_silently=True)
+    except ValueError:
+        return None
@@ -36,7 +36,8 @@ class DashboardCard(LoginMixin, TemplateView):
     def get(self, request, *args, **kwargs):
         card = cards_registry[self.kwargs['card']]
         page_number = self.request.GET.get('page', 1)
-        self.card = card(request, page_number)
+        self.card = card(request, page_number,
+                         cursor=self.request.GET.get('cursor'))
         return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
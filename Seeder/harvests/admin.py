@@ -77,3 +77,12 @@ class HarvestConfigurationAdmin(admin.ModelAdmin):
     def dataLimit_GB(self, obj):
         return obj.dataLimit / 10**9
     dataLimit_GB.short_description = "dataLimit (GB)"
+
+
+@admin.register(models.FreezeJob)
+class FreezeJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "harvest", "state", "progress", "seeds_count", "attempts", "created",
+        "started", "finished",
+    )
+    list_filter = ("state",)
@@ -0,0 +1,188 @@
+"""
+Composition of Harvest seeds into collections
+
+All candidate seeds of a Harvest are fetched at once (one query for the
+topic collections, one UNION query for the seeds) and only then split into
+the individual collections in memory. Harvest.get_seeds() and get_json()
+are both built on top of this instead of querying every collection apart.
+"""
+from collections import defaultdict
+
+from django.db import models
+from django.db.models import F, Value
+from django.utils.functional import cached_property
+
+from source import constants as source_constants
+from source.models import Seed
+
+# Source frequencies that are harvested as a part of ArchiveIt
+ARCHIVEIT_FREQUENCIES = (1, 2, 4, 6)
+
+# Kinds of rows returned by the composition query
+KIND_FREQUENCY = 'frequency'
+KIND_TESTS = 'tests'
+KIND_CUSTOM = 'custom'
+KIND_TOPIC_COLLECTION = 'tc'
+
+
+def _tagged(queryset, kind, key=None):
+    """ Annotate seed rows with the collection they belong to """
+    return queryset.order_by().annotate(
+        kind=Value(kind, output_field=models.CharField()),
+        key=(F(key) if key is not None
+             else Value(None, output_field=models.IntegerField())),
+    ).values_list('url', 'kind', 'key')
+
+
+class SeedComposition:
+    """
+    Candidate seeds of a single Harvest split into collections.
+    Returned seed sets are *not* cleaned of blacklisted seeds, this is left
+    to the caller so it only happens once per collection.
+    """
+
+    def __init__(self, harvest):
+        self.harvest = harvest
+
+    @cached_property
+    def frequencies(self):
+        """ Source frequencies whose archiving seeds are needed """
+        frequencies = set(
+            int(freq) for freq in self.harvest.target_frequency or [])
+        if self.harvest.archive_it:
+            frequencies.update(ARCHIVEIT_FREQUENCIES)
+        return frequencies
+
+    @property
+    def has_tests(self):
+        # TODO: For now, allow both tests checkbox and harvest type
+        return (self.harvest.tests or
+                self.harvest.harvest_type == self.harvest.TYPE_TESTS)
+
+    @cached_property
+    def topic_collections(self):
+        """
+        Selected topic collections followed by the ones selected by
+        frequency, without duplicates
+        """
+        selected = list(self.harvest.topic_collections.all())
+        selected_pks = set(tc.pk for tc in selected)
+        return selected + [
+            tc for tc in self.harvest.get_topic_collections_by_frequency()
+            if tc.pk not in selected_pks
+        ]
+
+    @cached_property
+    def _rows(self):
+        """
+        Fetch all candidate seeds in a single query and split them by kind
+        :return: {kind: {key: set(urls)}}
+        """
+        parts = []
+        if self.frequencies:
+            parts.append(_tagged(
+                Seed.objects.archiving().filter(
+                    source__frequency__in=self.frequencies),
+                KIND_FREQUENCY, 'source__frequency'))
+        if self.has_tests:
+            parts.append(_tagged(
+                Seed.objects.filter(
+                    source__state=source_constants.STATE_TECHNICAL_REVIEW),
+                KIND_TESTS))
+        if self.harvest.pk is not None:
+            parts.append(_tagged(
+                Seed.objects.filter(
+                    source__in=self.harvest.custom_sources.all()),
+                KIND_CUSTOM))
+        # Frozen topic collections don't need to be queried at all
+        unfrozen = [tc.pk for tc in self.topic_collections
+                    if not tc.seeds_frozen]
+        if unfrozen:
+            parts.append(_tagged(
+                Seed.objects.filter(source__topiccollection__in=unfrozen),
+                KIND_TOPIC_COLLECTION, 'source__topiccollection'))
+
+        rows = defaultdict(lambda: defaultdict(set))
+        if not parts:
+            return rows
+        queryset = parts[0].union(*parts[1:], all=True)
+        for url, kind, key in queryset.iterator():
+            rows[kind][key].add(url)
+        return rows
+
+    def _frequency_seeds(self, frequencies):
+        by_frequency = self._rows[KIND_FREQUENCY]
+        return set().union(*[by_frequency[int(f)] for f in frequencies])
+
+    def get_serials_seeds(self, frequency=None):
+        """
+        Archiving seeds of one or all of the Harvest's target frequencies,
+        disregards OneShot (0-frequency) seeds
+        """
+        if frequency is not None:
+            frequencies = [frequency]
+        else:
+            frequencies = self.harvest.target_frequency or []
+        return self._frequency_seeds(f for f in frequencies if int(f) != 0)
+
+    def get_tests_seeds(self):
+        if not self.has_tests:
+            return set()
+        return set(self._rows[KIND_TESTS][None])
+
+    def get_custom_seeds(self):
+        """ Custom seeds and seeds of custom sources """
+        return self.harvest.get_custom_seeds() | self._rows[KIND_CUSTOM][None]
+
+    @cached_property
+    def previously_harvested(self):
+        """
+        OneShot and ArchiveIt candidates that have already been harvested,
+        looked up at once for both
+        """
+        candidates = set()
+        if self.harvest.is_oneshot:
+            candidates |= self._frequency_seeds([0])
+        if self.harvest.archive_it:
+            candidates |= self._frequency_seeds(ARCHIVEIT_FREQUENCIES)
+        if not candidates:
+            return set()
+        return self.harvest.get_previously_harvested(candidates)
+
+    def get_oneshot_seeds(self):
+        """
+        Custom seeds/sources and, if the Harvest is OneShot, 0-frequency
+        seeds that haven't been harvested yet
+        """
+        seeds = self.get_custom_seeds()
+        if self.harvest.is_oneshot:
+            oneshot = self._frequency_seeds([0])
+            seeds |= oneshot - self.previously_harvested
+        return seeds
+
+    def get_archiveit_seeds(self):
+        if not self.harvest.archive_it:
+            return set()
+        archiveit = self._frequency_seeds(ARCHIVEIT_FREQUENCIES)
+        return archiveit - self.previously_harvested
+
+    def get_topic_collection_seeds(self, tc):
+        if tc.seeds_frozen:
+            return set(tc.seeds_frozen.split())
+        return tc.get_custom_seeds() | self._rows[KIND_TOPIC_COLLECTION][tc.pk]
+
+    def get_topic_collections(self):
+        """ :return: list of (TopicCollection, seeds) """
+        return [(tc, self.get_topic_collection_seeds(tc))
+                for tc in self.topic_collections]
+
+    def get_seeds(self):
+        """ All seeds of the Harvest combined """
+        seeds = set()
+        for tc, tc_seeds in self.get_topic_collections():
+            seeds.update(tc_seeds)
+        seeds.update(self.get_serials_seeds())
+        seeds.update(self.get_tests_seeds())
+        seeds.update(self.get_oneshot_seeds())
+        seeds.update(self.get_archiveit_seeds())
+        return seeds
@@ -0,0 +1,12 @@
+from .models import FreezeJob
+
+
+def freeze_harvests():
+    """ Process all queued FreezeJobs """
+    while True:
+        job = FreezeJob.claim()
+        if job is None:
+            break
+        print('Freezing', job.harvest)
+        job.run()
+        print('Freezing finished:', job.get_state_display(), job.duration)
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from harvests.cron import freeze_harvests
+
+
+class Command(BaseCommand):
+    help = ("Freeze Harvests queued for freezing. Use --loop to keep the "
+            "worker running and polling for new jobs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling for new jobs instead of exiting",
+        )
+        parser.add_argument(
+            '--sleep', type=int, default=10,
+            help="Seconds to wait between polls when using --loop",
+        )
+
+    def handle(self, *args, **options):
+        freeze_harvests()
+        while options.get("loop"):
+            time.sleep(options["sleep"])
+            freeze_harvests()
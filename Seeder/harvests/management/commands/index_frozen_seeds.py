@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from harvests.models import Harvest, FrozenSeed
+
+
+class Command(BaseCommand):
+    help = ("Fill the FrozenSeed index from seeds_frozen of existing Harvests."
+            "\nHarvests that are already indexed are skipped unless the "
+            "--force option is used.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Re-index Harvests that already have indexed seeds",
+        )
+
+    def handle(self, *args, **options):
+        harvests = Harvest.objects.exclude(
+            seeds_frozen__isnull=True).exclude(seeds_frozen='')
+        if not options.get("force"):
+            harvests = harvests.filter(frozen_seed_set__isnull=True)
+        # Only load what's needed, seeds_frozen can be huge
+        harvests = harvests.only("pk", "seeds_frozen").order_by("pk")
+
+        total = 0
+        for harvest in harvests.iterator():
+            seeds = harvest.get_seeds(frozen_only=True)
+            FrozenSeed.objects.store(harvest, seeds)
+            total += 1
+            self.stdout.write(f"Harvest {harvest.pk}: {len(seeds)} seeds")
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully indexed {total} harvests"))
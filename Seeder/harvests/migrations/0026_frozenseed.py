@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('harvests', '0025_auto_20230704_0733'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrozenSeed',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField()),
+                ('url_hash', models.CharField(db_index=True, max_length=32)),
+                ('harvest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frozen_seed_set', to='harvests.Harvest')),
+            ],
+            options={
+                'unique_together': {('harvest', 'url_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('harvests', '0026_frozenseed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FreezeJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=7, verbose_name='State')),
+                ('progress', models.CharField(blank=True, max_length=255, verbose_name='Progress')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('seeds_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('harvest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='freeze_jobs', to='harvests.Harvest')),
+            ],
+            options={
+                'verbose_name': 'Freeze job',
+                'verbose_name_plural': 'Freeze jobs',
+                'ordering': ('created',),
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('harvests', '0027_freezejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='harvest',
+            name='hash_frozen',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
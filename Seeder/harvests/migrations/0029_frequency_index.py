@@ -0,0 +1,74 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_frequencies(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return set(int(f) for f in value or [] if str(f).strip())
+
+
+def index_frequencies(apps, schema_editor):
+    """ Fill the frequency indexes from the existing MultiSelectFields """
+    indexes = (
+        ("Harvest", "target_frequency", "HarvestFrequency", "harvest_id"),
+        ("Harvest", "topic_collection_frequency",
+         "HarvestTopicCollectionFrequency", "harvest_id"),
+        ("TopicCollection", "target_frequency", "TopicCollectionFrequency",
+         "topic_collection_id"),
+    )
+    for model_name, field, index_name, fk in indexes:
+        Model = apps.get_model("harvests", model_name)
+        Index = apps.get_model("harvests", index_name)
+        Index.objects.bulk_create((
+            Index(**{fk: pk, "frequency": freq})
+            for pk, value in Model.objects.values_list("pk", field).iterator()
+            for freq in split_frequencies(value)
+        ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('harvests', '0028_harvest_hash_frozen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicCollectionFrequency',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.PositiveSmallIntegerField(db_index=True)),
+                ('topic_collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='target_frequency_set', to='harvests.TopicCollection')),
+            ],
+            options={
+                'unique_together': {('topic_collection', 'frequency')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HarvestTopicCollectionFrequency',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.PositiveSmallIntegerField(db_index=True)),
+                ('harvest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_collection_frequency_set', to='harvests.Harvest')),
+            ],
+            options={
+                'unique_together': {('harvest', 'frequency')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HarvestFrequency',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.PositiveSmallIntegerField(db_index=True)),
+                ('harvest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='target_frequency_set', to='harvests.Harvest')),
+            ],
+            options={
+                'unique_together': {('harvest', 'frequency')},
+            },
+        ),
+        migrations.RunPython(index_frequencies,
+                             reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('harvests', '0029_frequency_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='freezejob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -4,14 +4,16 @@ import logging
 
 from itertools import chain
 from hashlib import md5
+from urllib.parse import urlparse
 from django.utils import timezone
-from datetime import date
+from datetime import date, timedelta
 
-from django.db import models
+from django.core.cache import cache
+from django.db import models, connections, transaction
 from django.utils.translation import ugettext_lazy as _
 from django.urls import reverse
 from django.dispatch import receiver
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.conf import settings
 
 from reversion import revisions
@@ -21,6 +23,8 @@ from ckeditor.fields import RichTextField
 
 from blacklists.models import Blacklist
 from core.models import BaseModel, DatePickerField, DateTimePickerField
+from core.utils import canonicalize_url, get_wayback_url
+from harvests.composition import SeedComposition
 from harvests.scheduler import get_dates_for_timedelta
 from source import constants as source_constants
 from source.models import Source, Seed, KeyWord
@@ -61,7 +65,10 @@ class HarvestAbstractModel(BaseModel):
     )
 
     # Pre-computed values for seed retrieval
-    blacklisted, previously_harvested = None, None
+    blacklisted, composition = None, None
+
+    # {frequency field: related name of its FrequencyIndex}
+    FREQUENCY_INDEXES = NotImplemented
 
     def repr(self):
         if self.title:
@@ -89,12 +96,12 @@ class HarvestAbstractModel(BaseModel):
         seeds need to be cleaned of blacklisted, counted, and hashed.
 
         :param seeds: set()
-        :param blacklisted: set()
+        :param blacklisted: BlacklistMatcher
         :param `the rest`: everything else is just passed to the dict()
         """
         if blacklisted is None:
             blacklisted = self.get_blacklisted()
-        seeds = sorted(seeds - blacklisted)
+        seeds = sorted(blacklisted.clean(seeds))
         # Collections shouldn't be empty
         if len(seeds) == 0:
             return None
@@ -125,21 +132,27 @@ class HarvestAbstractModel(BaseModel):
         """
         # Includes stripping and empty string filtering; set()
         seeds = self.get_custom_seeds()
-        # Match only Sources with equal URL and add them
-        sources = Source.objects.filter(
-            seed__state=source_constants.SEED_STATE_INCLUDE,
-            seed__url__in=seeds)
-        self.custom_sources.add(*sources)
+        # Match Sources with the same canonical URL, i.e. regardless of the
+        # scheme, "www." or a trailing slash, and add them; deleted Sources
+        # are inactive and excluded, like in Source.objects
+        pairs = list(Seed.objects.filter(
+            source__active=True,
+            state=source_constants.SEED_STATE_INCLUDE,
+            canonical_url__in=set(canonicalize_url(url) for url in seeds),
+        ).values_list("canonical_url", "source_id"))
+        matched = set(pair[0] for pair in pairs)
+        self.custom_sources.add(*set(pair[1] for pair in pairs))
         # Save un-matched seeds, remove anything that was matched
         self.custom_seeds = '\n'.join(
-            seeds - set(sources.values_list("seed__url", flat=True)))
+            url for url in seeds if canonicalize_url(url) not in matched)
         self.save()
+        # Custom seeds & sources changed, pre-computed seeds are outdated
+        self.composition = None
 
     def get_blacklisted(self):
-        """ Return pre-computed blacklisted seeds or retrieve & save """
+        """ Return pre-computed blacklist matcher or retrieve & save """
         if self.blacklisted is None:
-            self.blacklisted = set(
-                Blacklist.collect_urls_by_type(Blacklist.TYPE_HARVEST))
+            self.blacklisted = Blacklist.get_matcher(Blacklist.TYPE_HARVEST)
         return self.blacklisted
 
     def get_custom_seeds(self):
@@ -151,7 +164,8 @@ class HarvestAbstractModel(BaseModel):
     def get_custom_sources_seeds(self):
         seeds = Seed.objects.filter(
             source__in=self.custom_sources.all())
-        return set(seeds.values_list('url', flat=True)) - self.get_blacklisted()
+        return self.get_blacklisted().clean(
+            seeds.values_list('url', flat=True))
 
     def get_seeds(self, blacklisted=None, frozen_only=False):
         """
@@ -173,21 +187,49 @@ class HarvestAbstractModel(BaseModel):
         if blacklisted is None:
             blacklisted = self.get_blacklisted()
 
-        return seeds - blacklisted
+        return blacklisted.clean(seeds)
 
     def get_calendar_style(self):
         return 'calendar_state_{0}'.format(self.status)
 
+    def index_frequencies(self, update_fields=None):
+        """
+        Keep FrequencyIndex rows in sync with the frequency fields
+        :param update_fields: only re-index these fields if provided
+        """
+        for field, related_name in self.FREQUENCY_INDEXES.items():
+            if update_fields is not None and field not in update_fields:
+                continue
+            frequencies = set(int(f) for f in getattr(self, field) or [])
+            index = getattr(self, related_name)
+            if set(index.values_list('frequency', flat=True)) == frequencies:
+                continue
+            index.all().delete()
+            for freq in frequencies:
+                index.create(frequency=freq)
+
     @classmethod
     def get_harvests_by_frequency(cls, freq, **kwargs):
         """
-        Necessary because MultiSelectField returns e.g. '12', '52' for query '2'
+        Exact lookup in the FrequencyIndex; querying the MultiSelectField
+        would also return e.g. '12', '52' for query '2'
         """
-        harvests = cls.objects.filter(
-            **kwargs, target_frequency__contains=freq)
-        # Filter only the ones that really contain the frequency
-        ids = [h.pk for h in harvests if freq in h.target_frequency]
-        return cls.objects.filter(pk__in=ids)  # QuerySet instead of a list
+        return cls.objects.filter(
+            **kwargs, target_frequency_set__frequency=int(freq))
+
+
+class FreezeAborted(Exception):
+    """ Harvest status was changed while its seeds were being frozen """
+
+
+class FreezeOutdated(Exception):
+    """ Harvest was edited while its seeds were being frozen """
+
+
+def seeds_changed_since(time):
+    """ Whether any Seed or Source (incl. inactive ones) changed since time """
+    return (Seed.objects.filter(last_changed__gte=time).exists() or
+            Source._base_manager.filter(last_changed__gte=time).exists())
 
 
 @revisions.register(exclude=('last_changed',))
@@ -203,6 +245,9 @@ class Harvest(HarvestAbstractModel):
     STATE_CANCELLED = 4
     STATE_FAILED = 5
 
+    # How many times seeds are computed when Seeds change while freezing
+    FREEZE_ATTEMPTS = 3
+
     STATES = (
         (STATE_PLANNED, _('Planned')),
         (STATE_READY_TO_HARVEST, _('Ready to harvest')),
@@ -225,6 +270,11 @@ class Harvest(HarvestAbstractModel):
         (TYPE_TOTALS, "Totals"),
     )
 
+    FREQUENCY_INDEXES = {
+        'target_frequency': 'target_frequency_set',
+        'topic_collection_frequency': 'topic_collection_frequency_set',
+    }
+
     # Only Harvests with these states will be checked in prev_harv_seeds
     PREVIOUSLY_HARVESTED_STATES = (
         STATE_RUNNING, STATE_SUCCESS, STATE_SUCCESS_WITH_FAILURES
@@ -255,6 +305,8 @@ class Harvest(HarvestAbstractModel):
         blank=True, null=True)
     date_frozen = models.DateTimeField(
         _("Date frozen"), null=True, blank=True)
+    # hash_seeds() of sorted frozen seeds, so they don't have to be loaded
+    hash_frozen = models.CharField(max_length=32, blank=True, null=True)
     auto_created = models.BooleanField(default=False)
 
     # Topic collections
@@ -300,33 +352,33 @@ class Harvest(HarvestAbstractModel):
     seeds_not_harvested = models.TextField(
         _("Seeds not harvested"), blank=True, null=True)
 
+    def get_composition(self):
+        """ Return pre-computed seed composition or create & save """
+        if self.composition is None:
+            self.composition = SeedComposition(self)
+        return self.composition
+
     def get_topic_collections_by_frequency(self):
-        pks = []
-        if self.topic_collection_frequency:
-            for freq in self.topic_collection_frequency:
-                pks.extend(TopicCollection.get_harvests_by_frequency(
-                    freq).values_list('pk', flat=True))
-        return TopicCollection.objects.filter(pk__in=pks)
-
-    def get_previously_harvested(self):
-        """ Return pre-computed previously_harvested or retrieve & save """
-        if self.previously_harvested is None:
-            seeds = set()
-            for h in Harvest.objects.filter(
-                scheduled_on__lt=self.scheduled_on,
-                status__in=Harvest.PREVIOUSLY_HARVESTED_STATES
-            ):
-                # Only retrieve frozen seeds, otherwise we're in recursive hell
-                seeds.update(h.get_seeds(frozen_only=True))
-            self.previously_harvested = seeds
-        return self.previously_harvested
+        if not self.topic_collection_frequency:
+            return TopicCollection.objects.none()
+        return TopicCollection.objects.filter(
+            target_frequency_set__frequency__in=[
+                int(freq) for freq in self.topic_collection_frequency],
+        ).distinct()
+
+    def get_previously_harvested(self, seeds):
+        """
+        Return those of ``seeds`` that were frozen by any Harvest harvested
+        before this one; looked up in the FrozenSeed index
+        """
+        return FrozenSeed.objects.harvested_before(
+            self.scheduled_on).filter_urls(seeds)
 
     def get_serials_frequency_json(self, frequency):
         # Disregard OneShot seeds, should be dealt with separately
         if str(frequency) == "0":
             return None
-        seeds = set(Seed.objects.archiving().filter(
-            source__frequency=frequency).values_list('url', flat=True))
+        seeds = self.get_composition().get_serials_seeds(frequency)
         alias = f"M{frequency}"
         return self.construct_collection_json(
             seeds,
@@ -348,32 +400,24 @@ class Harvest(HarvestAbstractModel):
 
         # Pre-compute blacklisted and pass down to TopicCollection functions
         blacklisted = self.get_blacklisted()
+        composition = self.get_composition()
 
         collections = []
 
         # TODO: where should I check if there are topics+serials? – in Edit/Create Form, don't allow to create/change Harvest to something unsupported but if it already exists, it's fine
 
-        # Add selected topic collections
-        for tc in self.topic_collections.all():
+        # Add selected topic collections followed by the ones by frequency,
+        # duplicates are already left out by the composition
+        for tc, tc_seeds in composition.get_topic_collections():
             collections.append(tc.get_collection_json(
-                self.scheduled_on, blacklisted))
-        # Add all topic collections by frequency
-        for tc in self.get_topic_collections_by_frequency():
-            # Ensure topic collection hasn't already been added
-            tc_json = tc.get_collection_json(self.scheduled_on, blacklisted)
-            if tc_json and not any(
-                [tc_json["idCollection"] == c.get("idCollection")
-                 # Collection can be None if it has no seeds
-                 for c in collections if c is not None]
-            ):
-                collections.append(tc_json)
+                self.scheduled_on, blacklisted, seeds=tc_seeds))
         # Add frequency serials, auto-ignores OneShots (0-frequency)
         if self.target_frequency:
             for freq in self.target_frequency:
                 collections.append(
                     self.get_serials_frequency_json(freq))
         # OneShot & ArchiveIt return empty sets if not set
-        archiveit_seeds = self.get_archiveit_seeds()
+        archiveit_seeds = composition.get_archiveit_seeds()
         collections.append(self.construct_collection_json(
             archiveit_seeds,
             name=f"Serials_ArchiveIt_{self.scheduled_on:%Y-%m-%d}",
@@ -384,7 +428,7 @@ class Harvest(HarvestAbstractModel):
             aggregationWithSameType=True,
         ))
         # OneShot collections contain OneShot and Custom sources/seeds
-        oneshot_seeds = self.get_oneshot_seeds()
+        oneshot_seeds = composition.get_oneshot_seeds()
         collections.append(self.construct_collection_json(
             oneshot_seeds,
             name=f"Serials_OneShot_{self.scheduled_on:%Y-%m-%d}",
@@ -394,9 +438,8 @@ class Harvest(HarvestAbstractModel):
             idCollection=None,
             aggregationWithSameType=True,
         ))
-        # TODO: For now, allow both tests checkbox and harvest type
-        if self.tests or self.harvest_type == Harvest.TYPE_TESTS:
-            tests_seeds = self.get_tests_seeds()
+        if composition.has_tests:
+            tests_seeds = composition.get_tests_seeds()
             collections.append(self.construct_collection_json(
                 tests_seeds,
                 name=f"Serials_Tests_{self.scheduled_on:%Y-%m-%d}",
@@ -410,7 +453,8 @@ class Harvest(HarvestAbstractModel):
         # Filter out any potential None from collections
         collections = [c for c in collections if c is not None]
         # Get all seeds combined
-        seeds_combined = sum([c.get("seeds") for c in collections], [])
+        seeds_combined = list(
+            chain.from_iterable(c.get("seeds") for c in collections))
         aliases = "-".join([c.get("collectionAlias") for c in collections])
         annotations = " ~ ".join([c.get("annotation") for c in collections])
 
@@ -438,22 +482,13 @@ class Harvest(HarvestAbstractModel):
         }
 
     def get_seeds_by_frequency(self):
-        if not self.target_frequency:
-            return set()
         # Ignore "0" frequency, oneshot dealt with separately
-        seeds = Seed.objects.archiving().filter(
-            source__frequency__in=self.target_frequency
-        ).exclude(source__frequency=0)
-        blacklisted = self.get_blacklisted()
-        return set(seeds.values_list('url', flat=True)) - blacklisted
+        seeds = self.get_composition().get_serials_seeds()
+        return self.get_blacklisted().clean(seeds)
 
     def get_tests_seeds(self):
-        if not self.tests and self.harvest_type != Harvest.TYPE_TESTS:
-            return set()
-        seeds = Seed.objects.filter(
-            source__state=source_constants.STATE_TECHNICAL_REVIEW)
-        blacklisted = self.get_blacklisted()
-        return set(seeds.values_list('url', flat=True)) - blacklisted
+        seeds = self.get_composition().get_tests_seeds()
+        return self.get_blacklisted().clean(seeds)
 
     def get_oneshot_seeds(self):
         """
@@ -465,32 +500,14 @@ class Harvest(HarvestAbstractModel):
         returns custom seeds/sources (if there are any), and only attempts to
         retrieve 0-frequency seeds if the frequency is set (self.is_oneshot)
         """
-        # Get custom sources and seeds regardless of frequency
-        custom_seeds = super(Harvest, self).get_seeds()
-        # If not 0-frequency, only return custom seeds
-        if not self.is_oneshot:
-            return custom_seeds
-        # Get all potential OneShot (0-frequency) seeds
-        oneshot = Seed.objects.archiving().filter(source__frequency=0)
-        oneshot = set(oneshot.values_list('url', flat=True))
-        # Get all harvested seeds up to this Harvest's scheduled date
-        previously_harvested = self.get_previously_harvested()
-        blacklisted = self.get_blacklisted()
         # Discard previously harvested OneShots but include all custom seeds
-        return ((oneshot - previously_harvested) | custom_seeds) - blacklisted
+        seeds = self.get_composition().get_oneshot_seeds()
+        return self.get_blacklisted().clean(seeds)
 
     def get_archiveit_seeds(self):
-        if not self.archive_it:
-            return set()
-        # Get all potential ArchiveIt seeds
-        archiveit = Seed.objects.archiving().filter(
-            source__frequency__in=[1, 2, 4, 6])
-        archiveit = set(archiveit.values_list('url', flat=True))
-        # Get all harvested seeds up to this Harvest's scheduled date
-        previously_harvested = self.get_previously_harvested()
-        blacklisted = self.get_blacklisted()
         # Return only the ArchiveIt seeds that haven't been harvested yet
-        return archiveit - previously_harvested - blacklisted
+        seeds = self.get_composition().get_archiveit_seeds()
+        return self.get_blacklisted().clean(seeds)
 
     def get_topic_collection_seeds(self, slug):
         seeds = set()
@@ -500,8 +517,7 @@ class Harvest(HarvestAbstractModel):
         # Could be either manual or by frequency
         for tc in self.get_topic_collections_by_frequency().filter(slug=slug):
             seeds.update(tc.get_seeds())
-        blacklisted = self.get_blacklisted()
-        return seeds - blacklisted
+        return self.get_blacklisted().clean(seeds)
 
     def get_seeds(self, blacklisted=None, frozen_only=False):
         if self.seeds_frozen and self.seeds_frozen != '':
@@ -509,22 +525,10 @@ class Harvest(HarvestAbstractModel):
         if frozen_only:  # Prematurely return so seeds aren't computed
             return set()
 
-        # Pre-compute blacklisted and pass down to TopicCollection functions
         if blacklisted is None:
             blacklisted = self.get_blacklisted()
-
-        base_set = super(Harvest, self).get_seeds(blacklisted)
-        # Add seeds from all selected topic collections
-        for tc in self.topic_collections.all():
-            base_set.update(tc.get_seeds(blacklisted))
-        # Add all topic collections by frequency
-        for tc in self.get_topic_collections_by_frequency():
-            base_set.update(tc.get_seeds(blacklisted))
-        base_set.update(self.get_seeds_by_frequency())
-        base_set.update(self.get_tests_seeds())
-        base_set.update(self.get_oneshot_seeds())
-        base_set.update(self.get_archiveit_seeds())
-        return base_set - blacklisted
+        # Blacklisted seeds are only removed once from all seeds combined
+        return blacklisted.clean(self.get_composition().get_seeds())
 
     def get_absolute_url(self):
         return reverse('harvests:detail', args=[str(self.id)])
@@ -532,18 +536,94 @@ class Harvest(HarvestAbstractModel):
     def get_dataLimit_display(self):
         return f"{self.dataLimit / 10**9:.1f} GB"
 
-    def freeze_seeds(self):
+    def freeze_seeds(self, progress=None, job=None):
         """
-        Freezes the seeds and JSON to preserve them for later use
+        Freezes the seeds and JSON to preserve them for later use and marks
+        the Harvest as ready to harvest once they are committed. Only planned
+        Harvests are frozen, freeze_urls keeps them planned until then.
+
+        Seeds are computed again (up to ``FREEZE_ATTEMPTS`` times) if any
+        Seed or Source is changed meanwhile, the computed seeds are then
+        frozen anyway.
+        :param progress: optional callable receiving progress messages
+        :param job: FreezeJob freezing the Harvest, nothing is frozen if it's
+                    cancelled meanwhile
+        :raises FreezeAborted: the Harvest isn't planned anymore or the job
+                               was cancelled
+        :raises FreezeOutdated: the Harvest was edited while freezing
         """
-        seeds = self.get_seeds()
-        if len(seeds) > 0:
-            self.seeds_frozen = '\n'.join(seeds)
-            self.date_frozen = timezone.now()
-            self.json_frozen = json.dumps(self.get_json())
-            self.save()
-            return True     # frozen correctly
-        return False        # not frozen
+        if progress is None:
+            progress = log.info
+        initial = Harvest.objects.filter(pk=self.pk).values_list(
+            'status', 'last_changed').first()
+        if initial is None:
+            raise FreezeAborted(_("Harvest was deleted"))
+        if initial[0] != Harvest.STATE_PLANNED:
+            raise FreezeAborted(_("Harvest is not planned"))
+        for attempt in range(1, self.FREEZE_ATTEMPTS + 1):
+            started = timezone.now()
+            # Don't reuse seeds composed by the previous attempt
+            self.composition = None
+            self.blacklisted = None
+            progress(_("Computing seeds"))
+            seeds = self.get_seeds()
+            if len(seeds) == 0:
+                return False    # not frozen
+            progress(_("Computing JSON of %(count)d seeds") % {
+                "count": len(seeds)})
+            json_frozen = json.dumps(self.get_json())
+            progress(_("Saving frozen seeds"))
+            with transaction.atomic():
+                # Edits of the Harvest wait until the frozen seeds are
+                # committed, the ones made while computing are detected here
+                current = Harvest.objects.select_for_update().filter(
+                    pk=self.pk).values_list('status', 'last_changed').first()
+                if current is None or current[0] != Harvest.STATE_PLANNED:
+                    raise FreezeAborted(
+                        _("Harvest status changed while freezing"))
+                if job is not None and not FreezeJob.objects.filter(
+                        pk=job.pk, state=FreezeJob.STATE_RUNNING).exists():
+                    raise FreezeAborted(_("Freezing was cancelled"))
+                if current[1] != initial[1]:
+                    raise FreezeOutdated(_("Harvest changed while freezing"))
+                if (attempt < self.FREEZE_ATTEMPTS
+                        and seeds_changed_since(started)):
+                    continue
+                self.date_frozen = timezone.now()
+                self.json_frozen = json_frozen
+                self.seeds_frozen = '\n'.join(seeds)
+                self.hash_frozen = self.hash_seeds(sorted(seeds))
+                self.status = Harvest.STATE_READY_TO_HARVEST
+                self.save(update_fields=(
+                    "seeds_frozen", "json_frozen", "date_frozen",
+                    "hash_frozen", "status", "last_changed"))
+                FrozenSeed.objects.store(self, seeds)
+            return True         # frozen correctly
+
+    @property
+    def is_frozen(self):
+        return bool(self.date_frozen)
+
+    def get_frozen_hash(self):
+        """
+        Return hash of the frozen seeds; computed & saved for Harvests
+        frozen before the hash was stored
+        """
+        if not self.hash_frozen and self.seeds_frozen:
+            self.hash_frozen = self.hash_seeds(
+                sorted(self.get_seeds(frozen_only=True)))
+            Harvest.objects.filter(pk=self.pk).update(
+                hash_frozen=self.hash_frozen)
+        return self.hash_frozen
+
+    def get_freeze_job(self):
+        """ Return the latest FreezeJob of this Harvest if there is any """
+        return self.freeze_jobs.order_by('-created').first()
+
+    @property
+    def is_freezing(self):
+        return self.freeze_jobs.filter(
+            state__in=FreezeJob.PENDING_STATES).exists()
 
     @property
     def is_oneshot(self):
@@ -565,10 +645,8 @@ class Harvest(HarvestAbstractModel):
             if not delta:
                 continue
 
-            previously_scheduled = cls.objects.filter(
-                auto_created=True,
-                target_frequency=freq
-            )
+            previously_scheduled = cls.get_harvests_by_frequency(
+                freq, auto_created=True)
 
             if not ignore_existing and previously_scheduled.exists():
                 continue
@@ -589,6 +667,246 @@ class Harvest(HarvestAbstractModel):
                 ).save()
 
 
+class FrequencyIndex(models.Model):
+    """
+    Normalized copy of a frequency MultiSelectField, one row per frequency.
+    Allows exact, indexed lookups instead of substring matching the
+    comma-separated values.
+    """
+    frequency = models.PositiveSmallIntegerField(db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return str(self.frequency)
+
+
+class HarvestFrequency(FrequencyIndex):
+    """ Index of Harvest.target_frequency """
+    harvest = models.ForeignKey(
+        Harvest, on_delete=models.CASCADE,
+        related_name='target_frequency_set')
+
+    class Meta:
+        unique_together = ('harvest', 'frequency')
+
+
+class HarvestTopicCollectionFrequency(FrequencyIndex):
+    """ Index of Harvest.topic_collection_frequency """
+    harvest = models.ForeignKey(
+        Harvest, on_delete=models.CASCADE,
+        related_name='topic_collection_frequency_set')
+
+    class Meta:
+        unique_together = ('harvest', 'frequency')
+
+
+class FrozenSeedQuerySet(models.QuerySet):
+    # Other databases than PostgreSQL are queried in batches to keep the
+    # number of query parameters reasonable (SQLite allows 999)
+    LOOKUP_BATCH_SIZE = 900
+
+    def harvested_before(self, scheduled_on):
+        return self.filter(
+            harvest__scheduled_on__lt=scheduled_on,
+            harvest__status__in=Harvest.PREVIOUSLY_HARVESTED_STATES,
+        )
+
+    def filter_urls(self, urls):
+        """
+        :param urls: iterable of urls
+        :return: set of those urls that are present in the queryset
+        """
+        hashes = {FrozenSeed.hash_url(url): url for url in urls}
+        keys = list(hashes.keys())
+        found = set()
+        if not keys:
+            return found
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            # All hashes in one array parameter, i.e. a single query
+            column = '{0}.{1}'.format(
+                connection.ops.quote_name(self.model._meta.db_table),
+                connection.ops.quote_name('url_hash'))
+            found.update(self.extra(
+                where=[f'{column} = ANY(%s)'], params=[keys],
+            ).values_list('url_hash', flat=True))
+            return set(hashes[h] for h in found)
+        for i in range(0, len(keys), self.LOOKUP_BATCH_SIZE):
+            found.update(self.filter(
+                url_hash__in=keys[i:i + self.LOOKUP_BATCH_SIZE],
+            ).values_list('url_hash', flat=True))
+        return set(hashes[h] for h in found)
+
+    def store(self, harvest, seeds):
+        """ Replace the index of ``harvest`` with the given frozen seeds """
+        self.filter(harvest=harvest).delete()
+        self.bulk_create((
+            FrozenSeed(
+                harvest=harvest, url=url, url_hash=FrozenSeed.hash_url(url))
+            for url in set(seeds)
+        ), batch_size=1000)
+
+
+class FrozenSeed(models.Model):
+    """
+    Index of seeds frozen in Harvests, one row per seed and Harvest.
+    Enables set-based lookups of previously harvested seeds instead of
+    splitting ``seeds_frozen`` of all earlier Harvests.
+    """
+    harvest = models.ForeignKey(
+        Harvest, on_delete=models.CASCADE, related_name='frozen_seed_set')
+    url = models.TextField()
+    # URLs can be arbitrarily long, so the index is on their MD5 hash
+    url_hash = models.CharField(max_length=32, db_index=True)
+
+    objects = FrozenSeedQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('harvest', 'url_hash')
+
+    @staticmethod
+    def hash_url(url):
+        return md5(url.encode("utf-8")).hexdigest()
+
+    def __str__(self):
+        return self.url
+
+
+class FreezeJob(models.Model):
+    """
+    Request to freeze a Harvest. Freezing of large Harvests takes too long to
+    be done inside a web request, so it's processed by the freeze_harvests
+    worker instead.
+    """
+    STATE_QUEUED = 'queued'
+    STATE_RUNNING = 'running'
+    STATE_DONE = 'done'
+    STATE_FAILED = 'failed'
+
+    STATES = (
+        (STATE_QUEUED, _('Queued')),
+        (STATE_RUNNING, _('Running')),
+        (STATE_DONE, _('Done')),
+        (STATE_FAILED, _('Failed')),
+    )
+
+    PENDING_STATES = (STATE_QUEUED, STATE_RUNNING)
+
+    # Running jobs that didn't finish for this long were left by a crashed
+    # worker, they're queued again unless they were already started
+    # MAX_ATTEMPTS times
+    STALE_AFTER = timedelta(hours=6)
+    MAX_ATTEMPTS = 3
+
+    harvest = models.ForeignKey(
+        Harvest, on_delete=models.CASCADE, related_name='freeze_jobs')
+    state = models.CharField(
+        _('State'), max_length=7, choices=STATES, default=STATE_QUEUED,
+        db_index=True)
+    progress = models.CharField(_('Progress'), max_length=255, blank=True)
+    error = models.TextField(_('Error'), blank=True)
+    seeds_count = models.PositiveIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    created = models.DateTimeField(default=timezone.now, editable=False)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Freeze job')
+        verbose_name_plural = _('Freeze jobs')
+        ordering = ('created',)
+
+    def __str__(self):
+        return '{0} - {1}'.format(self.harvest_id, self.get_state_display())
+
+    @property
+    def duration(self):
+        if self.started and self.finished:
+            return self.finished - self.started
+
+    @classmethod
+    def recover_stale(cls):
+        """ Queue again (or fail) jobs left running by a crashed worker """
+        stale = cls.objects.filter(
+            state=cls.STATE_RUNNING,
+            started__lt=timezone.now() - cls.STALE_AFTER)
+        stale.filter(attempts__gte=cls.MAX_ATTEMPTS).update(
+            state=cls.STATE_FAILED, finished=timezone.now(), progress='',
+            error=str(_("The worker stopped while freezing")))
+        stale.update(state=cls.STATE_QUEUED, started=None, progress='')
+
+    @classmethod
+    def enqueue(cls, harvest):
+        """ Queue the Harvest for freezing unless it's already queued """
+        cls.recover_stale()
+        job = cls.objects.filter(
+            harvest=harvest, state__in=cls.PENDING_STATES).first()
+        return job or cls.objects.create(harvest=harvest)
+
+    @classmethod
+    def cancel(cls, harvest):
+        """ Fail pending jobs of a Harvest that isn't to be frozen anymore """
+        return cls.objects.filter(
+            harvest=harvest, state__in=cls.PENDING_STATES,
+        ).update(state=cls.STATE_FAILED, finished=timezone.now(), progress='',
+                 error=str(_("Freezing was cancelled")))
+
+    @classmethod
+    def claim(cls):
+        """
+        Take the oldest queued job, jobs locked by other workers are skipped
+        :return: FreezeJob or None if there is nothing to do
+        """
+        cls.recover_stale()
+        with transaction.atomic():
+            job = cls.objects.select_for_update(skip_locked=True).filter(
+                state=cls.STATE_QUEUED).order_by('created').first()
+            if job is None:
+                return None
+            job.state = cls.STATE_RUNNING
+            job.started = timezone.now()
+            job.attempts += 1
+            job.save()
+        return job
+
+    def set_progress(self, progress):
+        self.progress = progress
+        self.save(update_fields=('progress',))
+
+    def run(self):
+        """ Freeze the Harvest and record the result """
+        harvest = self.harvest
+        try:
+            if harvest.freeze_seeds(progress=self.set_progress, job=self):
+                self.state = self.STATE_DONE
+                self.seeds_count = len(harvest.seeds_frozen.split())
+            else:
+                self.state = self.STATE_FAILED
+                self.error = str(_("Harvest contains no seeds!"))
+        except FreezeOutdated:
+            # Freeze the edited Harvest from scratch
+            log.info("Harvest %s changed while freezing", harvest.pk)
+            self.state = self.STATE_QUEUED
+            self.started = None
+            self.progress = ''
+            self.save()
+            return False
+        except FreezeAborted as e:
+            self.state = self.STATE_FAILED
+            self.error = str(e)
+        except Exception as e:
+            log.exception("Cannot freeze Harvest %s", harvest.pk)
+            self.state = self.STATE_FAILED
+            self.error = str(e)
+        self.finished = timezone.now()
+        self.progress = ''
+        self.save()
+        return self.state == self.STATE_DONE
+
+
 @revisions.register(exclude=('last_changed',))
 class ExternalTopicCollection(BaseModel, OrderedModel):
     """
@@ -631,6 +949,27 @@ class ExternalTopicCollection(BaseModel, OrderedModel):
         """ Return custom sources of all internal collections combined """
         return Source.objects.filter(topiccollection__external_collection=self)
 
+    @staticmethod
+    def get_custom_seeds_cache_key(pk):
+        return f'external_collection_seeds:{pk}'
+
+    def get_custom_seeds(self):
+        """
+        Custom seeds of all internal collections parsed for the web, cached
+        until an internal collection is saved
+        :return: list of dicts with name, url and wayback_url
+        """
+        key = self.get_custom_seeds_cache_key(self.pk)
+        seeds = cache.get(key)
+        if seeds is None:
+            seeds = [{
+                'name': urlparse(url).netloc,
+                'url': url,
+                'wayback_url': get_wayback_url(url),
+            } for url in dict.fromkeys(self.custom_seeds.split())]
+            cache.set(key, seeds, 60 * 60 * 24)
+        return seeds
+
     @property
     def attachment_set(self):
         """ Return attachments of all internal collections combined """
@@ -703,6 +1042,10 @@ class TopicCollection(HarvestAbstractModel):
         null=True, blank=True,
     )
 
+    FREQUENCY_INDEXES = {
+        'target_frequency': 'target_frequency_set',
+    }
+
     # Should be named differently because it's semantically different
     target_frequency = PatchedMultiSelectField(
         verbose_name=_('Frequency'),
@@ -758,12 +1101,17 @@ class TopicCollection(HarvestAbstractModel):
         return reverse(
             'harvests:internal_collection_detail', args=[str(self.id)])
 
-    def get_collection_json(self, scheduled_on, blacklisted=None):
-        """ Returns a dict() with topic collection details and seeds """
+    def get_collection_json(self, scheduled_on, blacklisted=None, seeds=None):
+        """
+        Returns a dict() with topic collection details and seeds
+        :param seeds: pre-computed seeds, retrieved if not provided
+        """
         alias = (self.collection_alias if len(self.collection_alias) > 0
                  else "NoAlias")
+        if seeds is None:
+            seeds = self.get_seeds()
         return self.construct_collection_json(
-            self.get_seeds(), blacklisted=blacklisted,
+            seeds, blacklisted=blacklisted,
             name=f"Topics_{alias}_{scheduled_on:%Y-%m-%d}",
             collectionAlias=alias,
             annotation=self.annotation,
@@ -813,6 +1161,16 @@ class TopicCollection(HarvestAbstractModel):
         ordering = ('-last_changed',)
 
 
+class TopicCollectionFrequency(FrequencyIndex):
+    """ Index of TopicCollection.target_frequency """
+    topic_collection = models.ForeignKey(
+        TopicCollection, on_delete=models.CASCADE,
+        related_name='target_frequency_set')
+
+    class Meta:
+        unique_together = ('topic_collection', 'frequency')
+
+
 class Attachment(models.Model):
     #! TODO: External collections should display attachments from all internal attachments now!!
     file = models.FileField(verbose_name=_('file'), upload_to='attachments')
@@ -873,21 +1231,52 @@ class HarvestConfiguration(BaseModel):
 @receiver(pre_save, sender=Harvest)
 def freeze_urls(sender, instance, **kwargs):
     """
-    Signal that freezes seeds when Harvest is marked as ready to harvest
+    Signal that queues seeds for freezing when Harvest is marked as ready to
+    harvest. The Harvest stays planned until the freeze_harvests worker
+    commits the frozen seeds and sets the status.
     :param instance: Harvest instance
     :type instance: Harvest
     """
     # Need to check both seeds_ and json_ frozen because older won't have JSON
     if (instance.status == Harvest.STATE_READY_TO_HARVEST
             and (not instance.seeds_frozen or not instance.json_frozen)):
-        # If cannot freeze correctly, reset Harvest status
-        if not instance.freeze_seeds():
-            instance.status = Harvest.STATE_PLANNED
+        instance.status = Harvest.STATE_PLANNED
+        instance._freeze_requested = True
+        return
     # Allow un-freezing when status changed back to Planned
-    elif instance.status == Harvest.STATE_PLANNED:
+    if instance.status == Harvest.STATE_PLANNED:
         instance.date_frozen = None
         instance.seeds_frozen = None
         instance.json_frozen = None
+        instance.hash_frozen = None
+        if instance.pk is not None:
+            FrozenSeed.objects.filter(harvest=instance).delete()
+    # Freezing requested before isn't wanted anymore, unless it's the frozen
+    # Harvest saved by the worker
+    if (instance.pk is not None
+            and instance.status != Harvest.STATE_READY_TO_HARVEST):
+        FreezeJob.cancel(instance)
+
+
+@receiver(post_save, sender=Harvest)
+def queue_freezing(sender, instance, **kwargs):
+    """
+    Signal that creates the FreezeJob requested in freeze_urls, the Harvest
+    must be saved first in order to have an ID
+    """
+    if getattr(instance, '_freeze_requested', False):
+        instance._freeze_requested = False
+        FreezeJob.enqueue(instance)
+
+
+@receiver(post_save, sender=Harvest)
+@receiver(post_save, sender=TopicCollection)
+def index_frequencies(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal that keeps the FrequencyIndex of Harvests and TCs up to date
+    """
+    instance.index_frequencies(update_fields)
+
 
 @receiver(pre_save, sender=TopicCollection)
 def freeze_tc_urls(sender, instance, **kwargs):
@@ -900,4 +1289,22 @@ def freeze_tc_urls(sender, instance, **kwargs):
         instance.save()
         # Avoid recursive save by not committing in pre_save
         instance.seeds_frozen = "" # delete so they're recomputed
-        instance.freeze_seeds(commit=False)
\ No newline at end of file
+        instance.freeze_seeds(commit=False)
+
+
+@receiver(pre_save, sender=TopicCollection)
+@receiver(post_save, sender=TopicCollection)
+@receiver(post_delete, sender=TopicCollection)
+def invalidate_custom_seeds(sender, instance, **kwargs):
+    """
+    Custom seeds of the external collection are parsed again, before saving
+    for the collection the TC is leaving
+    """
+    external_id = instance.external_collection_id
+    if kwargs['signal'] is pre_save and instance.pk is not None:
+        external_id = TopicCollection._base_manager.filter(
+            pk=instance.pk).values_list('external_collection', flat=True) \
+            .first()
+    if external_id is not None:
+        cache.delete(
+            ExternalTopicCollection.get_custom_seeds_cache_key(external_id))
@@ -1,12 +1,20 @@
 from datetime import datetime, timedelta
+from io import StringIO
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
 
+from blacklists.models import Blacklist
+from source import constants as source_constants
 from source.constants import SOURCE_FREQUENCY_PER_YEAR
+from source.models import Seed, Source
 from harvests.scheduler import get_dates_for_timedelta
-from harvests.models import Harvest, TopicCollection
+from harvests.cron import freeze_harvests
+from harvests.models import Harvest, TopicCollection, FrozenSeed, FreezeJob
+from source.testing import SourceTestCase
 
 TODAY = datetime.today()
 
@@ -173,7 +181,7 @@ class HarvestUrlTest(TestCase):
         for url in urls:
             r = self.c.get(url)
             self.assertEqual(200, r.status_code)
-            harvest_ids.extend(r.context['harvest_ids'])
+            harvest_ids.extend(r.context_data['harvest_ids'])
         # Make sure all harvests for that date appear
         correct_harvest_ids = [
             h.pk for h in Harvest.objects.filter(scheduled_on=h_date)
@@ -207,7 +215,7 @@ class HarvestUrlTest(TestCase):
             })
             res = self.c.get(get_url)
             self.assertEqual(200, res.status_code)
-            harvest_ids = res.context['harvest_ids']
+            harvest_ids = res.context_data['harvest_ids']
             harvests = Harvest.objects.filter(pk__in=harvest_ids)
             for h in harvests:
                 self.assertEqual(self.DATE, h.scheduled_on)
@@ -224,7 +232,7 @@ class HarvestUrlTest(TestCase):
             })
             res = self.c.get(get_url)
             self.assertEqual(200, res.status_code)
-            harvest_ids = res.context['harvest_ids']
+            harvest_ids = res.context_data['harvest_ids']
             self.assertIn(h.pk, harvest_ids)
 
     def test_harvests_totals(self):
@@ -235,7 +243,7 @@ class HarvestUrlTest(TestCase):
         })
         res = self.c.get(get_url)
         self.assertEqual(200, res.status_code)
-        harvest_ids = res.context['harvest_ids']
+        harvest_ids = res.context_data['harvest_ids']
         correct_harvest_ids = [
             h.pk for h in Harvest.objects.filter(scheduled_on=self.DATE)
         ]
@@ -249,8 +257,8 @@ class HarvestUrlTest(TestCase):
         })
         res = self.c.get(get_url)
         self.assertEqual(200, res.status_code)
-        self.assertListEqual([], res.context['harvest_ids'])
-        self.assertListEqual([], res.context['urls'])
+        self.assertListEqual([], res.context_data['harvest_ids'])
+        self.assertListEqual([], res.context_data['urls'])
 
     def test_harvests_oneshot(self):
         get_url = reverse('harvests:shortcut_urls_by_date_and_type', kwargs={
@@ -260,13 +268,327 @@ class HarvestUrlTest(TestCase):
         })
         res = self.c.get(get_url)
         self.assertEqual(200, res.status_code)
-        harvest_ids = res.context['harvest_ids']
+        harvest_ids = res.context_data['harvest_ids']
         harvests = Harvest.objects.filter(pk__in=harvest_ids)
         for h in harvests:
             self.assertEqual(self.DATE, h.scheduled_on)
             self.assertTrue('0' in h.target_frequency)
 
 
+class SeedCompositionTest(SourceTestCase):
+    """
+    Tests that seeds of all collections are composed correctly
+    """
+
+    def setUp(self):
+        super().setUp()
+        running = source_constants.STATE_RUNNING
+        for url, frequency in (("http://yearly.cz", 1),
+                               ("http://blacklisted.cz", 1),
+                               ("http://monthly.cz", 12),
+                               ("http://oneshot.cz", 0),
+                               ("http://harvested.cz", 0)):
+            self.create_source(url, url, state=running, frequency=frequency)
+        self.create_source("http://tests.cz", "http://tests.cz",
+                           state=source_constants.STATE_TECHNICAL_REVIEW)
+        custom, tc_source = [
+            self.create_source(url, url, state=source_constants.STATE_VOTE)
+            for url in ("http://custom.cz", "http://tc-source.cz")]
+        Blacklist.objects.create(
+            title="B", blacklist_type=Blacklist.TYPE_HARVEST,
+            url_list="http://blacklisted.cz")
+        Harvest.objects.create(
+            status=Harvest.STATE_SUCCESS, title="Previous",
+            scheduled_on=TODAY - timedelta(days=7),
+            seeds_frozen="http://harvested.cz")
+        call_command('index_frozen_seeds', stdout=StringIO())
+        # Bypass pre_save freezing of topic collections
+        tc, = TopicCollection.objects.bulk_create([TopicCollection(
+            owner=self.user, title="TC", annotation="", all_open=True,
+            custom_seeds="http://tc-custom.cz")])
+        tc = TopicCollection.objects.get(title="TC")
+        tc.custom_sources.add(tc_source)
+
+        self.harvest = Harvest.objects.create(
+            status=Harvest.STATE_PLANNED, title="Harvest",
+            scheduled_on=TODAY, target_frequency=['0', '1'], tests=True,
+            custom_seeds="http://custom-seed.cz")
+        self.harvest.custom_sources.add(custom)
+        self.harvest.topic_collections.add(tc)
+
+    def test_get_seeds(self):
+        self.assertSetEqual(self.harvest.get_seeds(), {
+            "http://yearly.cz", "http://oneshot.cz", "http://tests.cz",
+            "http://custom.cz", "http://custom-seed.cz",
+            "http://tc-source.cz", "http://tc-custom.cz",
+        })
+
+    def test_get_json(self):
+        collections = {c["collectionAlias"]: c["seeds"]
+                       for c in self.harvest.get_json()["collections"]}
+        self.assertDictEqual(collections, {
+            "NoAlias": ["http://tc-custom.cz", "http://tc-source.cz"],
+            "M1": ["http://yearly.cz"],
+            "OneShot": ["http://custom-seed.cz", "http://custom.cz",
+                        "http://oneshot.cz"],
+            "Tests": ["http://tests.cz"],
+        })
+
+    def test_pair_custom_seeds(self):
+        deleted = self.create_source(
+            "Deleted", "http://deleted.cz", active=False)
+        self.harvest.custom_seeds = (
+            "https://www.monthly.cz/\nhttp://new.cz\nhttp://deleted.cz")
+        self.harvest.pair_custom_seeds()
+        # Seeds of deleted sources aren't paired
+        self.assertEqual(sorted(self.harvest.custom_seeds.split()),
+                         ["http://deleted.cz", "http://new.cz"])
+        self.assertNotIn(deleted, self.harvest.custom_sources.all())
+        self.assertSetEqual(
+            set(self.harvest.custom_sources.values_list('name', flat=True)),
+            {"http://custom.cz", "http://monthly.cz"})
+
+    def test_seeds_fetched_at_once(self):
+        harvest = Harvest.objects.get(pk=self.harvest.pk)
+        harvest.get_blacklisted()
+        # Selected topic collections, all seeds together and previously
+        # harvested OneShot seeds
+        with self.assertNumQueries(3):
+            harvest.get_seeds()
+        with self.assertNumQueries(0):
+            harvest.get_oneshot_seeds()
+            harvest.get_tests_seeds()
+
+    def test_freezing_queued(self):
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        # Seeds aren't frozen inside the request
+        self.harvest.refresh_from_db()
+        self.assertEqual(self.harvest.status, Harvest.STATE_PLANNED)
+        self.assertIsNone(self.harvest.seeds_frozen)
+        self.assertTrue(self.harvest.is_freezing)
+        # Queued only once
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        self.assertEqual(self.harvest.freeze_jobs.count(), 1)
+
+        freeze_harvests()
+        self.harvest.refresh_from_db()
+        self.assertEqual(self.harvest.status, Harvest.STATE_READY_TO_HARVEST)
+        self.assertSetEqual(
+            self.harvest.get_seeds(frozen_only=True),
+            Harvest.objects.get(pk=self.harvest.pk).get_seeds())
+        self.assertIsNotNone(self.harvest.json_frozen)
+        self.assertFalse(self.harvest.is_freezing)
+        job = self.harvest.get_freeze_job()
+        self.assertEqual(job.state, FreezeJob.STATE_DONE)
+        self.assertEqual(job.seeds_count, 7)
+        self.assertIsNotNone(job.duration)
+
+    def test_freezing_without_seeds_fails(self):
+        harvest = Harvest.objects.create(
+            title="Empty", scheduled_on=TODAY,
+            status=Harvest.STATE_READY_TO_HARVEST)
+        freeze_harvests()
+        harvest.refresh_from_db()
+        self.assertEqual(harvest.status, Harvest.STATE_PLANNED)
+        self.assertEqual(harvest.get_freeze_job().state,
+                         FreezeJob.STATE_FAILED)
+
+    def test_freezing_changed_harvest(self):
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        job = FreezeJob.claim()
+
+        def edit(progress):
+            Harvest.objects.filter(pk=self.harvest.pk).update(
+                last_changed=timezone.now() + timedelta(seconds=1))
+        job.set_progress = edit
+        # Edited while freezing, queued again
+        self.assertFalse(job.run())
+        job.refresh_from_db()
+        self.assertEqual(job.state, FreezeJob.STATE_QUEUED)
+        self.harvest.refresh_from_db()
+        self.assertIsNone(self.harvest.seeds_frozen)
+
+        job = FreezeJob.claim()
+
+        def cancel(progress):
+            Harvest.objects.filter(pk=self.harvest.pk).update(
+                status=Harvest.STATE_CANCELLED)
+        job.set_progress = cancel
+        # Cancelled while freezing, the status is kept
+        self.assertFalse(job.run())
+        self.assertEqual(job.state, FreezeJob.STATE_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.harvest.refresh_from_db()
+        self.assertEqual(self.harvest.status, Harvest.STATE_CANCELLED)
+        self.assertIsNone(self.harvest.seeds_frozen)
+
+    def test_cancelled_before_claimed(self):
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        self.harvest.status = Harvest.STATE_CANCELLED
+        self.harvest.save()
+        job = self.harvest.get_freeze_job()
+        self.assertEqual(job.state, FreezeJob.STATE_FAILED)
+        freeze_harvests()
+        self.harvest.refresh_from_db()
+        self.assertEqual(self.harvest.status, Harvest.STATE_CANCELLED)
+        self.assertIsNone(self.harvest.seeds_frozen)
+
+        # Set back to planned before the worker got to it
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        self.harvest.status = Harvest.STATE_PLANNED
+        self.harvest.save()
+        freeze_harvests()
+        self.harvest.refresh_from_db()
+        self.assertEqual(self.harvest.status, Harvest.STATE_PLANNED)
+        self.assertIsNone(self.harvest.seeds_frozen)
+        self.assertEqual(self.harvest.get_freeze_job().state,
+                         FreezeJob.STATE_FAILED)
+
+        # Status changed without signals, the worker checks it as well
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        Harvest.objects.filter(pk=self.harvest.pk).update(
+            status=Harvest.STATE_CANCELLED)
+        freeze_harvests()
+        self.harvest.refresh_from_db()
+        self.assertEqual(self.harvest.status, Harvest.STATE_CANCELLED)
+        self.assertIsNone(self.harvest.seeds_frozen)
+        self.assertEqual(self.harvest.get_freeze_job().state,
+                         FreezeJob.STATE_FAILED)
+
+    def test_freezing_recomputed_after_seed_changes(self):
+        messages = []
+
+        def add_seed(progress):
+            messages.append(str(progress))
+            if len(messages) == 2:
+                # Seeds were computed, but not frozen yet
+                Seed.objects.create(
+                    source=Source.objects.get(name="http://yearly.cz"),
+                    url="http://yearly-new.cz")
+        self.assertTrue(self.harvest.freeze_seeds(progress=add_seed))
+        self.assertIn("http://yearly-new.cz",
+                      self.harvest.get_seeds(frozen_only=True))
+        self.assertEqual(messages.count("Computing seeds"), 2)
+
+    def test_stale_freeze_job_recovered(self):
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        job = FreezeJob.claim()
+        # The worker crashed
+        FreezeJob.objects.filter(pk=job.pk).update(
+            started=timezone.now() - FreezeJob.STALE_AFTER * 2)
+        self.assertEqual(FreezeJob.enqueue(self.harvest), job)
+        job.refresh_from_db()
+        self.assertEqual(job.state, FreezeJob.STATE_QUEUED)
+        freeze_harvests()
+        job.refresh_from_db()
+        self.assertEqual(job.state, FreezeJob.STATE_DONE)
+        self.assertEqual(job.attempts, 2)
+
+        # Too many attempts
+        FreezeJob.objects.filter(pk=job.pk).update(
+            state=FreezeJob.STATE_RUNNING, attempts=FreezeJob.MAX_ATTEMPTS,
+            started=timezone.now() - FreezeJob.STALE_AFTER * 2)
+        self.assertIsNone(FreezeJob.claim())
+        job.refresh_from_db()
+        self.assertEqual(job.state, FreezeJob.STATE_FAILED)
+
+    def test_frozen_seeds_indexed(self):
+        self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+        self.harvest.save()
+        freeze_harvests()
+        later = Harvest(scheduled_on=TODAY + timedelta(days=1))
+        self.assertSetEqual(
+            later.get_previously_harvested(["http://yearly.cz"]), set())
+        # Only Harvests that were actually harvested count
+        Harvest.objects.filter(pk=self.harvest.pk).update(
+            status=Harvest.STATE_SUCCESS)
+        self.assertSetEqual(
+            later.get_previously_harvested(
+                ["http://yearly.cz", "http://unknown.cz"]),
+            {"http://yearly.cz"})
+        self.assertEqual(
+            FrozenSeed.objects.filter(harvest=self.harvest).count(),
+            len(self.harvest.get_seeds()))
+        # Un-freezing removes the seeds from the index
+        self.harvest.status = Harvest.STATE_PLANNED
+        self.harvest.save()
+        self.assertFalse(
+            FrozenSeed.objects.filter(harvest=self.harvest).exists())
+
+    def test_urls_not_modified(self):
+        c = Client()
+        c.login(username='pedro', password='password')
+        for name in ('harvests:urls', 'harvests:json'):
+            url = reverse(name, kwargs={'pk': self.harvest.pk})
+            res = c.get(url)
+            self.assertEqual(200, res.status_code)
+            content = b''.join(res.streaming_content).decode()
+            self.assertIn("http://yearly.cz", content)
+            res = c.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+            self.assertEqual(304, res.status_code)
+
+            # Frozen seeds are served as they were frozen
+            self.harvest.status = Harvest.STATE_READY_TO_HARVEST
+            self.harvest.save()
+            freeze_harvests()
+            res = c.get(url)
+            self.assertEqual(200, res.status_code)
+            frozen_content = b''.join(res.streaming_content).decode()
+            self.assertIn("http://yearly.cz", frozen_content)
+            # Session, user and the harvest without its frozen seeds
+            with self.assertNumQueries(3):
+                res = c.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+            self.assertEqual(304, res.status_code)
+
+            self.harvest.status = Harvest.STATE_PLANNED
+            self.harvest.save()
+
+
+class FrequencyIndexTest(TestCase):
+    """
+    Tests exact frequency lookups of Harvests and topic collections
+    """
+
+    def test_harvests_by_frequency(self):
+        yearly = Harvest.objects.create(
+            title="Yearly", scheduled_on=TODAY, target_frequency=['2'])
+        monthly = Harvest.objects.create(
+            title="Monthly", scheduled_on=TODAY, target_frequency=['12'])
+        self.assertListEqual(
+            list(Harvest.get_harvests_by_frequency('2')), [yearly])
+        self.assertListEqual(
+            list(Harvest.get_harvests_by_frequency('12')), [monthly])
+        # Index follows changes of the field
+        monthly.target_frequency = ['2', '52']
+        monthly.save()
+        self.assertSetEqual(set(Harvest.get_harvests_by_frequency('2')),
+                            {yearly, monthly})
+        self.assertFalse(Harvest.get_harvests_by_frequency('12').exists())
+
+    def test_topic_collections_by_frequency(self):
+        user = User.objects.create_user('pedro', '', 'password')
+        TopicCollection.objects.bulk_create([TopicCollection(
+            owner=user, title="TC", annotation="", all_open=True,
+            target_frequency=['12'])])
+        TopicCollection.objects.get(title="TC").index_frequencies()
+        harvest = Harvest.objects.create(
+            title="Harvest", scheduled_on=TODAY,
+            topic_collection_frequency=['2'])
+        self.assertFalse(harvest.get_topic_collections_by_frequency().exists())
+        harvest.topic_collection_frequency = ['2', '12']
+        harvest.save()
+        self.assertListEqual(
+            [tc.title for tc in harvest.get_topic_collections_by_frequency()],
+            ["TC"])
+
+
 class ScheduleTest(TestCase):
     """
     Tests scheduling functionality
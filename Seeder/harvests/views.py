@@ -1,9 +1,11 @@
 import time
 import re
+import json
 from datetime import date
+from itertools import chain
 from dal import autocomplete
 import datetime
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.urls import reverse
 from django.http import Http404
 from django.contrib import messages
@@ -16,11 +18,13 @@ from . import forms
 from . import tables
 from . import field_filters
 
-from django.http.response import Http404, HttpResponseRedirect, JsonResponse
+from django.http.response import Http404, HttpResponseRedirect
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic.base import TemplateView
 from django.views.generic import DetailView, FormView, View
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
 from core import generic_views
@@ -48,6 +52,45 @@ def timestamp(dtm_object):
     """
     return time.mktime(dtm_object.timetuple()) * 1000
 
+
+def url_lines(head_lines, urls):
+    """
+    Format lines the same way as the urls.html template does
+    """
+    for line in chain(head_lines, urls):
+        yield '{0}<br>\n'.format(escape(line))
+
+
+def text_chunks(text, chunk_size=64 * 1024):
+    for i in range(0, len(text), chunk_size):
+        yield text[i:i + chunk_size]
+
+
+def get_json_etag(harvest_json):
+    """
+    ETag of Harvest JSON; seeds are already covered by the collection hashes
+    and the generation date changes every time
+    """
+    meta = dict(harvest_json, dateGenerated=None, collections=[
+        dict(collection, seeds=None)
+        for collection in harvest_json["collections"]
+    ])
+    return models.Harvest.hash_seeds([json.dumps(meta, sort_keys=True)])
+
+
+def check_harvest_seeds(request, harvest):
+    """
+    Alert if there are no seeds at all in the Harvest. Seeds of Harvests
+    queued for freezing are checked by the freezing worker instead so that
+    they aren't computed inside the request.
+    """
+    if harvest.is_freezing:
+        messages.info(request, _(
+            "Seeds will be frozen in the background, the harvest will be "
+            "ready to harvest afterwards"))
+    elif len(harvest.get_seeds()) == 0:
+        messages.error(request, _("Harvest contains no seeds!"))
+
 # ======== #
 # Harvests #
 # ======== #
@@ -84,14 +127,19 @@ class CalendarJsonView(generic_views.JSONView):
         harvests = models.Harvest.objects.filter(
             scheduled_on__gte=date_from,
             scheduled_on__lte=date_to
-        )
+        ).annotate(freezing=Exists(models.FreezeJob.objects.filter(
+            harvest=OuterRef('pk'),
+            state__in=models.FreezeJob.PENDING_STATES,
+        )))
 
         return {
             "success": 1,
             "result": [
                 {
                     "id": harvest.id,
-                    "title": harvest.repr(),
+                    "title": (harvest.repr() if not harvest.freezing else
+                              "{0} ({1})".format(harvest.repr(),
+                                                 _("freezing…"))),
                     "url": harvest.get_absolute_url(),
                     "class": harvest.get_calendar_style(),
                     "start": timestamp(harvest.scheduled_on),
@@ -109,9 +157,7 @@ class AddView(HarvestView, FormView):
         # TODO: check that serials don't have Topic Collections and the other way around
         harvest = form.save()
         harvest.pair_custom_seeds()
-        # If there are no seeds at all in the Harvest, send an alert
-        if len(harvest.get_seeds()) == 0:
-            messages.error(self.request, _("Harvest contains no seeds!"))
+        check_harvest_seeds(self.request, harvest)
         return HttpResponseRedirect(harvest.get_absolute_url())
 
 
@@ -127,9 +173,7 @@ class Edit(HarvestView, EditView):
         # TODO: check that serials don't have Topic Collections and the other way around
         harvest = form.save()
         harvest.pair_custom_seeds()
-        # If there are no seeds at all in the Harvest, send an alert
-        if len(harvest.get_seeds()) == 0:
-            messages.error(self.request, _("Harvest contains no seeds!"))
+        check_harvest_seeds(self.request, harvest)
         return HttpResponseRedirect(harvest.get_absolute_url())
 
 # =================== #
@@ -151,29 +195,66 @@ class ListHarvestUrls(HarvestView, TemplateView):
         return context
 
 
-class ListUrls(HarvestView, DetailView, TemplateView):
+class ListUrls(HarvestView, generic_views.ConditionalStreamingMixin,
+               DetailView):
     """
     List all seeds for a specific harvest.
+    Seeds of frozen harvests are streamed as they are and polling them again
+    is answered with 304 Not Modified without loading the seeds at all.
     """
-    template_name = 'urls.html'
+    content_type = 'text/html; charset=utf-8'
+    queryset = models.Harvest.objects.defer('seeds_frozen', 'json_frozen')
 
     def get_context_data(self, **kwargs):
-        self.object = self.get_object()
         context = super().get_context_data(**kwargs)
         context['head_lines'] = [f"# {self.object.title}"]
-        context['urls'] = self.object.get_seeds()
+        if not self.object.is_frozen:
+            context['urls'] = sorted(self.object.get_seeds())
         return context
 
+    def get_etag(self, context):
+        if self.object.is_frozen:
+            seeds_hash = self.object.get_frozen_hash() or ''
+        else:
+            seeds_hash = self.object.hash_seeds(context['urls'])
+        return self.object.hash_seeds(context['head_lines'] + [seeds_hash])
+
+    def get_streaming_content(self, context):
+        if self.object.is_frozen:
+            urls = self.object.seeds_frozen.split()
+        else:
+            urls = context['urls']
+        return url_lines(context['head_lines'], urls)
+
 
-class JsonUrls(HarvestView, DetailView):
+class JsonUrls(HarvestView, generic_views.ConditionalStreamingMixin,
+               DetailView):
     """
     Return all seeds for a specific harvest as JSON
+    Frozen JSON is streamed as it is and polling it again is answered with
+    304 Not Modified without loading the JSON at all.
     """
+    content_type = 'application/json'
+    queryset = models.Harvest.objects.defer('seeds_frozen', 'json_frozen')
 
-    def get(self, *args, **kwargs):
-        self.object = self.get_object()
-        return JsonResponse(
-            self.object.get_json(), json_dumps_params={'ensure_ascii': False})
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if not self.object.is_frozen:
+            context['json'] = self.object.get_json()
+        return context
+
+    def get_etag(self, context):
+        if self.object.is_frozen:
+            return '{0}-{1:.0f}'.format(self.object.get_frozen_hash(),
+                                        self.object.date_frozen.timestamp())
+        return get_json_etag(context['json'])
+
+    def get_streaming_content(self, context):
+        # Frozen JSON is already serialized, no need to load & dump it again
+        if self.object.is_frozen and self.object.json_frozen:
+            return text_chunks(self.object.json_frozen)
+        harvest_json = context.get('json') or self.object.get_json()
+        return DjangoJSONEncoder(ensure_ascii=False).iterencode(harvest_json)
 
 
 class ListShortcutUrlsByDate(HarvestView, TemplateView):
@@ -243,7 +324,9 @@ class ListShortcutUrlsByDate(HarvestView, TemplateView):
         return context
 
 
-class ListUrlsByDateAndShortcut(HarvestView, TemplateView):
+class ListUrlsByDateAndShortcut(HarvestView,
+                                generic_views.ConditionalStreamingMixin,
+                                TemplateView):
     """
     List seeds for the selected date and shortcut. Seeds from all harvests
     scheduled on the date and matching the shortcut are listed.
@@ -253,7 +336,7 @@ class ListUrlsByDateAndShortcut(HarvestView, TemplateView):
         'TT-<str>',
         'ArchiveIt', 'OneShot', 'VNC', 'Tests', 'Totals'
     """
-    template_name = 'urls.html'
+    content_type = 'text/html; charset=utf-8'
 
     def get_context_data(self, h_date, h_date2=None, shortcut=None, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -335,10 +418,16 @@ class ListUrlsByDateAndShortcut(HarvestView, TemplateView):
         if harvests is None:
             raise Exception("Server error: No harvests were gathered")
 
-        context['urls'] = list(urls)
+        context['urls'] = sorted(urls)
         context['harvest_ids'] = [h.pk for h in harvests]
         return context
 
+    def get_etag(self, context):
+        return models.Harvest.hash_seeds(context['urls'])
+
+    def get_streaming_content(self, context):
+        return url_lines([], context['urls'])
+
 
 class HarvestUrlCatalogue(TemplateView):
     template_name = 'harvest_catalogue.html'
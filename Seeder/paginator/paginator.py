@@ -1,5 +1,37 @@
-from django.core.paginator import Paginator, Page
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import (
+    Paginator, Page, EmptyPage, PageNotAnInteger)
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+def estimate_count(queryset):
+    """
+    Number of rows as estimated by PostgreSQL: ``reltuples`` of the table
+    for unfiltered querysets, the planner's estimate otherwise
+    :return: the estimate or None on other databases
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table])
+            return int(cursor.fetchone()[0])
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
 
 
 class CustomPaginator(Paginator):
@@ -11,7 +43,243 @@ class CustomPage(Page):
     """
     Custom page that supports range around current page
     """
+    # Links to other pages only need a cursor with KeysetPaginator
+    cursor = None
 
     def get_current_range(self):
         lower_bound = max((self.number-5, 1))
         return range(lower_bound, self.paginator.num_pages+1)[0:10]
+
+
+class KeysetPaginator(CustomPaginator):
+    """
+    Paginator of querysets that seeks pages near the previous one by their
+    ordering instead of OFFSET, so deep pages are as fast as the first ones.
+
+    Pages are still numbered. Every page has a ``cursor`` with the ordering
+    values of its first and last row; when it's passed back with a link to
+    another page, only the rows between that page and the cursor are skipped.
+    Without a cursor, or when the ordering uses expressions or nullable fields,
+    it falls back to OFFSET.
+
+    Large querysets are counted using the PostgreSQL estimate, ``approximate``
+    is True then. Pages fetch one more row to find out whether there's a next
+    page, and the estimate is corrected by the rows found.
+    """
+    exact_count_limit = 10000
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, cursor=None):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.cursor = cursor
+        self.approximate = False
+
+    def get_queryset(self):
+        """ :return: the paginated queryset or None if it's not one """
+        if isinstance(self.object_list, QuerySet):
+            return self.object_list
+        return None
+
+    def wrap(self, records):
+        """ Items of a page from records of the queryset """
+        return records
+
+    @cached_property
+    def ordering(self):
+        """
+        :return: list of (field, descending) ending with the primary key, or
+                 None if the ordering can't be used for seeking
+        """
+        queryset = self.get_queryset()
+        if queryset is None:
+            return None
+        opts = queryset.model._meta
+        ordering = list(queryset.query.order_by or (
+            opts.ordering if queryset.query.default_ordering else ()))
+        fields = []
+        for name in ordering:
+            if not isinstance(name, str) or name == '?':
+                return None
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            if name == 'pk':
+                name = opts.pk.name
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.is_relation or field.null:
+                return None
+            fields.append((field, descending))
+        if opts.pk not in [field for field, _ in fields]:
+            fields.append((opts.pk, False))
+        if not queryset.query.standard_ordering:
+            # queryset.reverse()
+            fields = [(field, not descending) for field, descending in fields]
+        return fields
+
+    @cached_property
+    def count(self):
+        queryset = self.get_queryset()
+        if queryset is None:
+            return super().count
+        # Small querysets are counted exactly, the estimate can be far off
+        count = queryset.order_by()[:self.exact_count_limit + 1].count()
+        if count <= self.exact_count_limit:
+            return count
+        estimate = estimate_count(queryset)
+        if estimate is None:
+            return queryset.count()
+        self.approximate = True
+        return max(estimate, count)
+
+    def correct_count(self, number, records, more):
+        """
+        Replace the estimated count with what's known from page ``number``
+        :param records: rows of the page
+        :param more: whether there are rows after the page
+        """
+        found = (number - 1) * self.per_page + len(records)
+        if more:
+            count = max(self.count, found + 1)
+        elif records or number == 1:
+            count = found
+            self.approximate = False
+        else:
+            # Past the end, the real last page is needed to fall back to it
+            count = self.get_queryset().count()
+            self.approximate = False
+        self.__dict__['count'] = count
+        for name in ('num_pages', 'page_range'):
+            self.__dict__.pop(name, None)
+
+    def validate_number(self, number):
+        if self.count and self.approximate:
+            # The estimate can be too low, pages past the end are only found
+            # out when they're empty
+            try:
+                number = int(number)
+            except (TypeError, ValueError):
+                raise PageNotAnInteger(_('That page number is not an integer'))
+            if number < 1:
+                raise EmptyPage(_('That page number is less than 1'))
+            return number
+        return super().validate_number(number)
+
+    def get_order_by(self, forward=True):
+        return ['{0}{1}'.format('-' if descending == forward else '',
+                                field.attname)
+                for field, descending in self.ordering]
+
+    def get_ordered_queryset(self, forward=True):
+        queryset = self.get_queryset()
+        if not queryset.query.standard_ordering:
+            # Already part of self.ordering
+            queryset = queryset.reverse()
+        return queryset.order_by(*self.get_order_by(forward))
+
+    def encode_cursor(self, number, records):
+        def values(record):
+            return [self.encode_value(getattr(record, field.attname))
+                    for field, _ in self.ordering]
+
+        data = json.dumps([number, self.get_order_by(),
+                           values(records[0]), values(records[-1])])
+        return urlsafe_b64encode(data.encode()).decode()
+
+    @staticmethod
+    def encode_value(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if not isinstance(value, (int, float, str, bool)):
+            return str(value)
+        return value
+
+    def decode_cursor(self):
+        """ :return: (page number, first values, last values) or None """
+        if not self.cursor:
+            return None
+        try:
+            number, order_by, *values = json.loads(
+                urlsafe_b64decode(self.cursor))
+            # The cursor is from a list with a different ordering
+            if order_by != self.get_order_by() or len(values) != 2:
+                return None
+            first, last = [
+                [field.to_python(value)
+                 for (field, _), value in zip(self.ordering, v)]
+                for v in values
+            ]
+            return int(number), first, last
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def get_bounds(self, number):
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if not self.approximate and top + self.orphans >= self.count:
+            top = self.count
+        return bottom, top
+
+    def seek(self, values, forward):
+        """ Rows after (or before) the row with ``values`` """
+        query = Q()
+        equal = {}
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'gt' if descending != forward else 'lt'
+            query |= Q(**equal, **{f'{field.attname}__{lookup}': value})
+            equal[field.attname] = value
+        return self.get_ordered_queryset(forward).filter(query)
+
+    def get_records(self, number, cursor, extra=0):
+        """
+        :param extra: number of rows after the page to fetch as well, they
+                      aren't when seeking back from the cursor
+        """
+        bottom, top = self.get_bounds(number)
+        if not self.ordering:
+            return list(self.get_queryset()[bottom:top + extra])
+        if cursor is None or cursor[0] == number:
+            return list(self.get_ordered_queryset()[bottom:top + extra])
+        cursor_number, first, last = cursor
+        if number > cursor_number:
+            start = cursor_number * self.per_page
+            rows = self.seek(last, forward=True)
+            return list(rows[bottom - start:top + extra - start])
+        start = (cursor_number - 1) * self.per_page
+        rows = self.seek(first, forward=False)
+        return list(reversed(rows[start - top:start - bottom]))
+
+    def page(self, number):
+        # Counts first, so it's known whether the count is approximate
+        number = self.validate_number(number)
+        if not self.approximate:
+            if not self.ordering:
+                return super().page(number)
+            records = self.get_records(number, self.decode_cursor())
+        else:
+            cursor = self.decode_cursor() if self.ordering else None
+            records = self.get_records(number, cursor, extra=1)
+            # Pages before the cursor's one are followed by it
+            more = (len(records) > self.per_page or
+                    cursor is not None and number < cursor[0])
+            records = records[:self.per_page]
+            self.correct_count(number, records, more)
+        if number > 1 and not records:
+            raise EmptyPage(_('That page contains no results'))
+        page = self._get_page(self.wrap(records), number, self)
+        if records and self.ordering:
+            page.cursor = self.encode_cursor(number, records)
+        return page
+
+
+class TableKeysetPaginator(KeysetPaginator):
+    """ KeysetPaginator of django_tables2 rows, which wrap a queryset """
+
+    def get_queryset(self):
+        queryset = getattr(self.object_list.data, 'data', None)
+        return queryset if isinstance(queryset, QuerySet) else None
+
+    def wrap(self, records):
+        return type(self.object_list)(records, self.object_list.table)
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:40
+
+from django.db import migrations
+
+# See source 0011_trigram_indexes
+FORWARD_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX publishers_publisher_name_trgm
+    ON publishers_publisher USING gin (name gin_trgm_ops);
+CREATE INDEX publishers_publisher_name_upper_trgm
+    ON publishers_publisher USING gin (UPPER(name) gin_trgm_ops);
+"""
+
+REVERSE_SQL = """
+DROP INDEX IF EXISTS publishers_publisher_name_trgm;
+DROP INDEX IF EXISTS publishers_publisher_name_upper_trgm;
+"""
+
+
+def run_postgresql(sql):
+    """ Trigram indexes are only available on PostgreSQL """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publishers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgresql(FORWARD_SQL),
+                             reverse_code=run_postgresql(REVERSE_SQL)),
+    ]
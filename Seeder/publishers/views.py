@@ -5,6 +5,7 @@ from django.http.response import HttpResponseRedirect
 from dal import autocomplete
 
 from core import generic_views
+from core.autocomplete import RankedAutocompleteView
 from comments.views import CommentViewGeneric
 from . import models, forms, tables, field_filters
 
@@ -68,15 +69,9 @@ class EditContacts(PublisherView, FormView, generic_views.ObjectMixinFixed):  #
         return HttpResponseRedirect(self.object.get_absolute_url())
 
 
-class PublisherAutocomplete(autocomplete.Select2QuerySetView):
-
-    def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return models.Publisher.objects.none()
-        qs = models.Publisher.objects.all()
-        if self.q:
-            qs = qs.filter(name__icontains=self.q)
-        return qs
+class PublisherAutocomplete(RankedAutocompleteView):
+    model = models.Publisher
+    search_fields = ('name',)
 
 
 class PublisherContactAutocomplete(autocomplete.Select2QuerySetView):
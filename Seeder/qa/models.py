@@ -50,6 +50,8 @@ class QualityAssuranceCheck(SearchModel, BaseModel):
         help_text=_('This will close QA and act upon the source'),
     )
 
+    search_prefetch = ('source',)
+
     class Meta:
         verbose_name = _('Quality assurance check')
         verbose_name_plural = _('Quality assurance checks')
@@ -0,0 +1,14 @@
+from .models import DirtyRecord
+
+
+def update_search_index():
+    """ Rebuild search Blobs of all records marked as dirty """
+    count, age = DirtyRecord.get_lag()
+    print('Search index lag:', count, 'records, oldest', age)
+    total = 0
+    while True:
+        processed = DirtyRecord.process_batch()
+        if not processed:
+            break
+        total += processed
+    print('Search index updated:', total, 'records')
@@ -1,19 +1,126 @@
-from django.core.management.base import BaseCommand
+import os
+import time
+from multiprocessing import Pool
 
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from search_blob.models import Blob
 from source.models import Source
 from comments.models import Comment
 from qa.models import QualityAssuranceCheck
 
+MODELS = {
+    'source': Source,
+    'comment': Comment,
+    'qa': QualityAssuranceCheck,
+}
+
+
+def build_blobs(instance):
+    """ Runs in the worker processes, related objects are prefetched """
+    return instance.pk, instance.get_search_blobs()
+
 
 class Command(BaseCommand):
-    help = 'Initializes search index'
+    help = ("Initializes search index. Search blobs of the selected models "
+            "are rebuilt in chunks and replaced at once, use --since to only "
+            "update records changed since the date.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', choices=sorted(MODELS),
+            help="Only rebuild this model, can be used repeatedly",
+        )
+        parser.add_argument(
+            '--since',
+            help="Only update records changed since the date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help="Number of records fetched at once",
+        )
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help="Number of processes building the blobs",
+        )
 
     def handle(self, *args, **options):
-        for s in Source.objects.all():
-            s.update_search_blob()
+        since = options.get('since')
+        if since:
+            since = parse_datetime(since) or parse_date(since)
+            if since is None:
+                raise CommandError("Invalid --since date")
+
+        pool = None
+        if options['processes'] > 1:
+            # Workers must not share the database connection
+            connections.close_all()
+            pool = Pool(options['processes'])
+        try:
+            for name in options.get('model') or sorted(MODELS):
+                self.rebuild(MODELS[name], since, options['chunk_size'], pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def rebuild(self, model, since, chunk_size, pool):
+        record_type = ContentType.objects.get_for_model(model)
+        queryset = model._default_manager.all()
+        # Inactive records keep their Blobs, as in DirtyRecord.process_batch
+        has_active = any(
+            field.name == 'active' for field in model._meta.fields)
+        if has_active:
+            queryset = queryset.filter(active=True)
+        if since:
+            queryset = queryset.filter(last_changed__gte=since)
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+
+        start = time.time()
+        chunks = self.build_chunks(model, pks, chunk_size, pool, start)
+        # Changed records can be written right away
+        if since:
+            for blobs in chunks:
+                Blob.objects.store(record_type, blobs)
+        # Whole index of the model is replaced in a single transaction, so
+        # searching keeps working with the old blobs in the meantime. Chunks
+        # are written as they're built, not kept in memory
+        else:
+            with transaction.atomic():
+                old_blobs = Blob.objects.filter(record_type=record_type)
+                if has_active:
+                    old_blobs = old_blobs.exclude(
+                        record_id__in=model._base_manager.filter(
+                            active=False).values('pk'))
+                old_blobs.delete()
+                for blobs in chunks:
+                    Blob.objects.bulk_create((
+                        Blob(record_type=record_type, record_id=record_id,
+                             is_public=is_public, **values)
+                        for record_id, record_blobs in blobs.items()
+                        for is_public, values in record_blobs.items()
+                        if values
+                    ), batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            '{0}: {1} records indexed in {2:.1f}s'.format(
+                model.__name__, len(pks), time.time() - start)))
 
-        for c in Comment.objects.all():
-            c.update_search_blob()
+    def build_chunks(self, model, pks, chunk_size, pool, start):
+        """ Yield {record id: blobs} of ``pks`` by chunks """
+        for i in range(0, len(pks), chunk_size):
+            instances = list(model._default_manager.filter(
+                pk__in=pks[i:i + chunk_size],
+            ).prefetch_related(*model.search_prefetch))
+            if pool is not None:
+                yield dict(pool.map(build_blobs, instances))
+            else:
+                yield dict(map(build_blobs, instances))
 
-        for qa in QualityAssuranceCheck.objects.all():
-            qa.update_search_blob()
+            done = min(i + chunk_size, len(pks))
+            self.stdout.write('{0}: {1}/{2} ({3:.0f} records/s)'.format(
+                model.__name__, done, len(pks),
+                done / max(time.time() - start, 0.001)))
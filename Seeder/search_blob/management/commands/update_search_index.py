@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from search_blob.cron import update_search_index
+
+
+class Command(BaseCommand):
+    help = ("Rebuild search blobs of records changed since the last run. "
+            "Use --loop to keep the worker running and polling for changes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling for changed records instead of exiting",
+        )
+        parser.add_argument(
+            '--sleep', type=int, default=10,
+            help="Seconds to wait between polls when using --loop",
+        )
+
+    def handle(self, *args, **options):
+        update_search_index()
+        while options.get("loop"):
+            time.sleep(options["sleep"])
+            update_search_index()
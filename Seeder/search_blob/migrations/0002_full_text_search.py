@@ -0,0 +1,54 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:10
+
+from django.db import migrations
+import django.contrib.postgres.search
+
+FORWARD_SQL = """
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE TEXT SEARCH CONFIGURATION seeder (COPY = simple);
+ALTER TEXT SEARCH CONFIGURATION seeder
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+
+CREATE INDEX search_blob_blob_search_vector_gin
+    ON search_blob_blob USING gin (search_vector);
+
+CREATE TRIGGER search_blob_blob_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, blob ON search_blob_blob
+    FOR EACH ROW EXECUTE PROCEDURE
+    tsvector_update_trigger(search_vector, 'public.seeder', title, blob);
+
+UPDATE search_blob_blob SET search_vector = to_tsvector(
+    'public.seeder', coalesce(title, '') || ' ' || coalesce(blob, ''));
+"""
+
+REVERSE_SQL = """
+DROP TRIGGER IF EXISTS search_blob_blob_search_vector_update
+    ON search_blob_blob;
+DROP INDEX IF EXISTS search_blob_blob_search_vector_gin;
+DROP TEXT SEARCH CONFIGURATION IF EXISTS seeder;
+"""
+
+
+def run_postgresql(sql):
+    """ Full-text search is only available on PostgreSQL """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_blob', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_postgresql(FORWARD_SQL),
+                             reverse_code=run_postgresql(REVERSE_SQL)),
+    ]
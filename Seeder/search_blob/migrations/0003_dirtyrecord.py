@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('search_blob', '0002_full_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.PositiveIntegerField()),
+                ('marked', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('record_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.ContentType')),
+            ],
+            options={
+                'unique_together': {('record_type', 'record_id')},
+            },
+        ),
+    ]
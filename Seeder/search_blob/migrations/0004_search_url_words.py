@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# The default parser keeps hosts and URLs as single tokens, so "seznam"
+# wouldn't find "www.seznam.cz". Words of URL-like tokens (i.e. host labels
+# and path segments) are indexed separately as well.
+FORWARD_SQL = r"""
+CREATE FUNCTION search_blob_url_words(text) RETURNS text AS $$
+    SELECT coalesce(string_agg(
+        regexp_replace(m[1], '[\W_]+', ' ', 'g'), ' '), '')
+    FROM regexp_matches($1, '(\S+[./:]\S+)', 'g') AS m
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE FUNCTION search_blob_search_vector_update() RETURNS trigger AS $$
+DECLARE
+    content text := coalesce(NEW.title, '') || ' ' || coalesce(NEW.blob, '');
+BEGIN
+    NEW.search_vector := to_tsvector(
+        'public.seeder', content || ' ' || search_blob_url_words(content));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER search_blob_blob_search_vector_update ON search_blob_blob;
+CREATE TRIGGER search_blob_blob_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, blob ON search_blob_blob
+    FOR EACH ROW EXECUTE PROCEDURE search_blob_search_vector_update();
+
+UPDATE search_blob_blob SET title = title;
+"""
+
+REVERSE_SQL = """
+DROP TRIGGER search_blob_blob_search_vector_update ON search_blob_blob;
+CREATE TRIGGER search_blob_blob_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, blob ON search_blob_blob
+    FOR EACH ROW EXECUTE PROCEDURE
+    tsvector_update_trigger(search_vector, 'public.seeder', title, blob);
+DROP FUNCTION search_blob_search_vector_update();
+DROP FUNCTION search_blob_url_words(text);
+
+UPDATE search_blob_blob SET title = title;
+"""
+
+
+def run_postgresql(sql):
+    """ Full-text search is only available on PostgreSQL """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_blob', '0003_dirtyrecord'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgresql(FORWARD_SQL),
+                             reverse_code=run_postgresql(REVERSE_SQL)),
+    ]
@@ -1,13 +1,64 @@
-from django.db import models
+import re
+from collections import defaultdict
+
+from django.db import models, connections, transaction
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVectorField)
 from django.core.paginator import EmptyPage, PageNotAnInteger
-from django.db.models import Q
+from django.db.models import F, Q, Count, Min
+from django.utils import timezone
 
 from paginator.paginator import CustomPaginator
 
 from unidecode import unidecode
 
+# Text search configuration created in migrations, "simple" with unaccent
+SEARCH_CONFIG = 'seeder'
+
+
+class BlobQuerySet(models.QuerySet):
+    BLOB_FIELDS = ('title', 'url', 'blob')
+
+    def store(self, record_type, records):
+        """
+        Create, update or delete Blobs of many records of one type at once
+        :param record_type: ContentType of the records
+        :param records: {record_id: SearchModel.get_search_blobs()}, None
+                        deletes all Blobs of the record
+        """
+        existing = {}
+        to_create, to_update, to_delete = [], [], []
+        for blob in self.filter(record_type=record_type,
+                                record_id__in=list(records)):
+            key = (blob.record_id, blob.is_public)
+            if key in existing:  # Left over duplicate
+                to_delete.append(blob.pk)
+            existing[key] = blob
+
+        for record_id, blobs in records.items():
+            for is_public in (False, True):
+                values = (blobs or {}).get(is_public)
+                blob = existing.get((record_id, is_public))
+                if values is None:
+                    if blob is not None:
+                        to_delete.append(blob.pk)
+                elif blob is None:
+                    to_create.append(Blob(
+                        record_type=record_type, record_id=record_id,
+                        is_public=is_public, **values))
+                # Don't rewrite (and re-index) Blobs that haven't changed
+                elif any(getattr(blob, f) != v for f, v in values.items()):
+                    for field, value in values.items():
+                        setattr(blob, field, value)
+                    to_update.append(blob)
+
+        if to_delete:
+            self.filter(pk__in=to_delete).delete()
+        self.bulk_create(to_create, batch_size=500)
+        self.bulk_update(to_update, self.BLOB_FIELDS, batch_size=500)
+
 
 class Blob(models.Model):
     url = models.CharField(max_length=255)
@@ -23,17 +74,58 @@ class Blob(models.Model):
     record_id = models.PositiveIntegerField()
     record_object = GenericForeignKey('record_type', 'record_id')
 
+    # Filled in by a database trigger from title & blob (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = BlobQuerySet.as_manager()
+
+    @classmethod
+    def full_text_enabled(cls):
+        """ Full-text search needs PostgreSQL, others use icontains """
+        return connections[cls.objects.db].vendor == 'postgresql'
+
+    @staticmethod
+    def get_raw_query(query):
+        """
+        Every word has to match as a prefix, e.g. "sezn" finds "seznam.cz".
+        Words of URL-like terms follow each other, matching the URL words
+        indexed by the search_vector trigger: "seznam.cz" is "seznam <-> cz"
+        :return: tsquery text
+        """
+        terms = []
+        for term in query.split():
+            words = [f'{word}:*' for word in re.findall(r'[^\W_]+', term)]
+            if len(words) > 1:
+                terms.append('({0})'.format(' <-> '.join(words)))
+            elif words:
+                terms.append(words[0])
+        return ' & '.join(terms)
+
     @classmethod
     def search(cls, query, is_public=False):
         if not query:
             return []
 
-        return cls.objects.filter(is_public=is_public).filter(
-            Q(blob__icontains=query) | Q(blob__icontains=unidecode(query))
-        )
+        blobs = cls.objects.filter(is_public=is_public)
+        if not cls.full_text_enabled():
+            return blobs.filter(
+                Q(blob__icontains=query) | Q(blob__icontains=unidecode(query))
+            )
+
+        raw_query = cls.get_raw_query(query)
+        if not raw_query:
+            return blobs.none()
+        search_query = SearchQuery(
+            raw_query, config=SEARCH_CONFIG, search_type='raw')
+        return blobs.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+        ).order_by('-rank', 'pk')
 
     @classmethod
-    def search_paginator(cls, query, page, is_public=False):
+    def search_paginator(cls, query, page, is_public=False, hydrate=False):
+        """
+        :param hydrate: load record objects of the page at once
+        """
         paginator = CustomPaginator(cls.search(query, is_public), 12)
         try:
             results = paginator.page(page)
@@ -41,10 +133,134 @@ class Blob(models.Model):
             results = paginator.page(1)
         except EmptyPage:
             results = paginator.page(1)
+        if hydrate:
+            results.object_list = cls.hydrate(results.object_list)
         return results
 
+    @classmethod
+    def hydrate(cls, blobs):
+        """
+        Load ``record_object`` of all blobs with one query per record type
+        (plus the model's search result prefetches) instead of one per blob
+        :return: list of blobs
+        """
+        blobs = list(blobs)
+        ids_by_type = defaultdict(set)
+        for blob in blobs:
+            ids_by_type[blob.record_type_id].add(blob.record_id)
+
+        records = {}
+        for type_id, ids in ids_by_type.items():
+            model = ContentType.objects.get_for_id(type_id).model_class()
+            if model is None or not issubclass(model, SearchModel):
+                continue
+            # Inactive records keep their Blobs, see process_batch
+            queryset = model._base_manager.prefetch_related(
+                *model.get_search_result_prefetch())
+            for pk, record in queryset.in_bulk(ids).items():
+                records[type_id, pk] = record
+
+        field = cls._meta.get_field('record_object')
+        for blob in blobs:
+            record = records.get((blob.record_type_id, blob.record_id))
+            if record is not None:
+                field.set_cached_value(blob, record)
+        return blobs
+
+
+class DirtyRecord(models.Model):
+    """
+    Record whose search Blobs are out of date. Saving a SearchModel only
+    marks it here and the Blobs are rebuilt in batches by the
+    update_search_index cron, outside of the user's request.
+    """
+    record_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name='+')
+    record_id = models.PositiveIntegerField()
+    marked = models.DateTimeField(default=timezone.now, db_index=True)
+
+    # Processed records are deleted by their pk & marked, two parameters
+    # each (SQLite allows 999)
+    DELETE_BATCH_SIZE = 400
+
+    class Meta:
+        unique_together = ('record_type', 'record_id')
+
+    @classmethod
+    def mark(cls, instance):
+        """
+        Mark the instance as dirty; if it's already waiting, the time it was
+        marked is updated so that a batch processing it doesn't remove it
+        """
+        record_type = ContentType.objects.get_for_model(instance)
+        now = timezone.now()
+        if not cls.objects.filter(
+                record_type=record_type, record_id=instance.pk,
+        ).update(marked=now):
+            cls.objects.bulk_create([cls(
+                record_type=record_type, record_id=instance.pk, marked=now,
+            )], ignore_conflicts=True)
+
+    @classmethod
+    def get_lag(cls):
+        """
+        :return: (number of dirty records, age of the oldest one or None)
+        """
+        agg = cls.objects.aggregate(count=Count('pk'), oldest=Min('marked'))
+        age = timezone.now() - agg['oldest'] if agg['oldest'] else None
+        return agg['count'], age
+
+    @classmethod
+    def process_batch(cls, batch_size=500):
+        """
+        Rebuild Blobs of the oldest dirty records, records marked again in
+        the meantime wait for the next batch
+        :return: number of processed records
+        """
+        with transaction.atomic():
+            records = list(cls.objects.select_for_update(skip_locked=True)
+                           .order_by('marked')[:batch_size])
+            ids_by_type = defaultdict(list)
+            for record in records:
+                ids_by_type[record.record_type_id].append(record.record_id)
+
+            for type_id, ids in ids_by_type.items():
+                record_type = ContentType.objects.get_for_id(type_id)
+                model = record_type.model_class()
+                if model is None or not issubclass(model, SearchModel):
+                    continue
+                instances = model._base_manager.filter(
+                    pk__in=ids).prefetch_related(*model.search_prefetch)
+                instances = {instance.pk: instance for instance in instances}
+                blobs = {}
+                for record_id in ids:
+                    instance = instances.get(record_id)
+                    # Deleted records lose their Blobs, inactive keep them
+                    if instance is None:
+                        blobs[record_id] = None
+                    elif getattr(instance, 'active', True):
+                        blobs[record_id] = instance.get_search_blobs()
+                Blob.objects.store(record_type, blobs)
+
+            # Records marked again since they were read stay in the queue
+            for i in range(0, len(records), cls.DELETE_BATCH_SIZE):
+                done = Q(pk__in=[])
+                for record in records[i:i + cls.DELETE_BATCH_SIZE]:
+                    done |= Q(pk=record.pk, marked=record.marked)
+                cls.objects.filter(done).delete()
+        return len(records)
+
 
 class SearchModel:
+    # Related objects used by get_search_blob(), prefetched when Blobs are
+    # rebuilt in batches
+    search_prefetch = ()
+
+    @classmethod
+    def get_search_result_prefetch(cls):
+        """ Related objects used when displaying search results """
+        return ()
+
     def get_search_title(self):
         raise NotImplementedError
 
@@ -60,63 +276,54 @@ class SearchModel:
     def get_search_public_url(self):
         return self.get_search_url()
 
+    @staticmethod
+    def get_blob_content(search_blob):
+        # Full-text search ignores diacritics itself, icontains needs
+        # a version without them
+        if Blob.full_text_enabled():
+            return search_blob
+        return search_blob + unidecode(search_blob)
+
     def delete_blob(self):
         Blob.objects.filter(
             record_type=ContentType.objects.get_for_model(self),
             record_id=self.id,
         ).delete()
 
-    def update_search_blob(self):
-        if hasattr(self, 'active') and not self.active:
-            return
-
-        # Add version without diacritics:
-        search_blob = self.get_search_blob()
-        blob_all = search_blob + unidecode(search_blob)
-
-        # if url is empty then we will delete this blob.
+    def get_search_blobs(self):
+        """
+        :return: {is_public: Blob field values or None if there shouldn't
+                  be such Blob}
+        """
         url = self.get_search_url()
+        # if url is empty then we will delete this blob.
         if not url:
-            Blob.objects.filter(
-                record_type=ContentType.objects.get_for_model(self),
-                record_id=self.id,
-            ).delete()
-            return
-
-        Blob.objects.update_or_create(
-            record_type=ContentType.objects.get_for_model(self),
-            record_id=self.id,
-            is_public=False,
-            defaults={
-                "title": self.get_search_title(),
-                "url": self.get_search_url(),
-                "blob": blob_all
-            }
-        )
+            return {False: None, True: None}
+        title = self.get_search_title()
 
+        blobs = {False: {
+            "title": title,
+            "url": url,
+            "blob": self.get_blob_content(self.get_search_blob()),
+        }, True: None}
+        # When the model is not public anymore, delete the public search blobs
         blob_public = self.get_public_search_blob()
         if blob_public:
-            blob_all = blob_public + unidecode(blob_public)
-            Blob.objects.update_or_create(
-                record_type=ContentType.objects.get_for_model(self),
-                record_id=self.id,
-                is_public=True,
-                defaults={
-                    "title": self.get_search_title(),
-                    "url": self.get_search_public_url(),
-                    "blob": blob_all
-                }
-            )
-        # When the model is not public anymore, delete the public search blobs
-        else:
-            Blob.objects.filter(
-                record_type=ContentType.objects.get_for_model(self),
-                record_id=self.id,
-                is_public=True,
-            ).delete()
+            blobs[True] = {
+                "title": title,
+                "url": self.get_search_public_url(),
+                "blob": self.get_blob_content(blob_public),
+            }
+        return blobs
 
+    def update_search_blob(self):
+        """ Rebuild Blobs of this instance right away """
+        if hasattr(self, 'active') and not self.active:
+            return
+        Blob.objects.store(ContentType.objects.get_for_model(self),
+                           {self.id: self.get_search_blobs()})
 
 
 def update_search(instance, **kwargs):
-    instance.update_search_blob()
+    DirtyRecord.mark(instance)
 # post_save.connect(update_search, sender=<SearchModel instance>)
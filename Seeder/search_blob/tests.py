@@ -0,0 +1,146 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+
+from qa.models import QualityAssuranceCheck
+from search_blob.models import Blob, DirtyRecord
+from source import constants as source_constants
+from source.models import Source
+from source.testing import SourceTestCase
+
+
+class SearchIndexTest(SourceTestCase):
+    """
+    Tests that search blobs are rebuilt from the dirty records queue
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.source = self.create_source(
+            "Searched source", "http://searched.cz", slug="searched",
+            state=source_constants.STATE_RUNNING)
+
+    def test_saving_marks_dirty(self):
+        self.assertTrue(DirtyRecord.objects.filter(
+            record_id=self.source.pk).exists())
+        self.assertFalse(Blob.objects.exists())
+        self.assertEqual(DirtyRecord.get_lag()[0], 1)
+
+    def test_blobs_rebuilt(self):
+        call_command('update_search_index', stdout=StringIO())
+        self.assertEqual(DirtyRecord.get_lag(), (0, None))
+        private = Blob.objects.get(is_public=False)
+        self.assertIn("http://searched.cz", private.blob)
+        self.assertListEqual(
+            [b.pk for b in Blob.search("searched", is_public=True)],
+            list(Blob.objects.filter(is_public=True).values_list(
+                'pk', flat=True)))
+
+        # Sources that are not public anymore lose the public Blob
+        self.source.state = source_constants.STATE_VOTE
+        self.source.save()
+        DirtyRecord.process_batch()
+        self.assertListEqual(
+            list(Blob.objects.values_list('is_public', flat=True)), [False])
+
+    def test_marked_during_batch(self):
+        get_search_blobs = Source.get_search_blobs
+
+        def edit_while_indexing(source):
+            blobs = get_search_blobs(source)
+            # Saved after its Blobs were computed from the old data
+            Source.objects.filter(pk=source.pk).update(name="Edited source")
+            source.refresh_from_db()
+            DirtyRecord.mark(source)
+            return blobs
+
+        with mock.patch.object(Source, 'get_search_blobs',
+                               edit_while_indexing):
+            self.assertEqual(DirtyRecord.process_batch(), 1)
+        self.assertEqual(DirtyRecord.get_lag()[0], 1)
+        DirtyRecord.process_batch()
+        self.assertEqual(DirtyRecord.get_lag()[0], 0)
+        self.assertSetEqual(set(Blob.objects.values_list('title', flat=True)),
+                            {"Edited source"})
+
+    def test_initialize(self):
+        Blob.objects.create(
+            record_type=ContentType.objects.get_for_model(Source),
+            record_id=self.source.pk + 1, url="/deleted", title="Deleted")
+        call_command('search_blob_initialize', '--model', 'source',
+                     '--processes', '1', stdout=StringIO())
+        self.assertSetEqual(
+            set(Blob.objects.values_list('record_id', 'is_public')),
+            {(self.source.pk, False), (self.source.pk, True)})
+
+    def test_initialize_keeps_inactive(self):
+        indexed, _ = [
+            QualityAssuranceCheck.objects.create(
+                source=self.source, checked_by=self.user,
+                comment="QA", active=active)
+            for active in (True, False)]
+        DirtyRecord.process_batch()
+        # Deactivated after it was indexed, its Blobs are kept
+        QualityAssuranceCheck.objects.filter(pk=indexed.pk).update(
+            active=False)
+        new = QualityAssuranceCheck.objects.create(
+            source=self.source, checked_by=self.user, comment="QA")
+        call_command('search_blob_initialize', '--model', 'qa',
+                     '--processes', '1', '--chunk-size', '1',
+                     stdout=StringIO())
+        record_type = ContentType.objects.get_for_model(QualityAssuranceCheck)
+        self.assertSetEqual(
+            set(Blob.objects.filter(record_type=record_type).values_list(
+                'record_id', flat=True)),
+            {indexed.pk, new.pk})
+
+    def test_results_hydrated(self):
+        for i in range(3):
+            self.create_source(f"Searched {i}", f"http://searched-{i}.cz",
+                               state=source_constants.STATE_RUNNING)
+        DirtyRecord.process_batch()
+        # Inactive sources keep their Blobs
+        Source.objects.filter(name="Searched 0").update(active=False)
+        # Blobs, sources, seeds, keywords, publishers and CC contracts
+        with self.assertNumQueries(6):
+            results = Blob.hydrate(Blob.objects.filter(is_public=True))
+            for result in results:
+                source = result.record_object
+                source.url, source.has_creative_commons
+                list(source.keywords.all())
+        self.assertEqual(len(results), 4)
+
+
+class BlobSearchTest(SourceTestCase):
+    """
+    Tests finding sources by their name, domain and URL
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_source("Seznam Zprávy",
+                           "https://www.seznam.cz/zpravy/domaci",
+                           state=source_constants.STATE_RUNNING)
+        DirtyRecord.process_batch()
+
+    def assertFound(self, query, found=True):
+        results = Blob.search(query, is_public=True)
+        self.assertEqual(len(results), int(found), query)
+
+    def test_search(self):
+        for query in ("Seznam", "zpravy", "Zprávy", "seznam.cz",
+                      "www.seznam.cz", "https://www.seznam.cz/zpravy",
+                      "seznam.cz/zpravy/domaci"):
+            self.assertFound(query)
+        for query in ("novinky.cz", "seznam.com"):
+            self.assertFound(query, found=False)
+
+    def test_raw_query(self):
+        self.assertEqual(Blob.get_raw_query("seznam"), "seznam:*")
+        self.assertEqual(Blob.get_raw_query("seznam.cz zprávy"),
+                         "(seznam:* <-> cz:*) & zprávy:*")
+        self.assertEqual(Blob.get_raw_query("https://www.seznam.cz/"),
+                         "(https:* <-> www:* <-> seznam:* <-> cz:*)")
+        self.assertEqual(Blob.get_raw_query(" & | ! "), "")
@@ -4,7 +4,7 @@ from core.generic_views import LoginMixin, FilteredListView
 from search_blob.field_filters import SearchLogFilter
 from search_blob.tables import SearchLogTable
 from www.models import SearchLog
-from .models import Blob
+from .models import Blob, DirtyRecord
 from .forms import SearchForm
 
 
@@ -26,7 +26,8 @@ class SearchView(LoginMixin, TemplateView):
         context.update({
             "results": results,
             "query": query,
-            'form': form
+            'form': form,
+            'index_lag': DirtyRecord.get_lag()[0],
         })
         return context
 
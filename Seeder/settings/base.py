@@ -257,6 +257,11 @@ CRONJOBS = [
     ('20 * * * *', 'contracts.cron.expire_contracts'),
     ('30 * * * *', 'contracts.cron.send_emails'),
     ('40 0 * * *', 'www.cron.reload_extinct_websites'),
+    ('0 2 * * 0', 'source.liveness.check_seeds'),
+    ('1 0 * * *', 'source.cron.update_valid_seeds'),
+    ('5 0 * * *', 'source.cron.recount_public_sources'),
+    ('* * * * *', 'harvests.cron.freeze_harvests'),
+    ('* * * * *', 'search_blob.cron.update_search_index'),
 ]
 
 # *     *     *   *    *        command to be executed
@@ -307,3 +312,7 @@ WEBARCHIV_EMAIL = 'webarchiv@nkp.cz'
 # RECAPTCHA_PRIVATE_KEY = ''
 
 NOCAPTCHA = True
+
+# Public pages are cached for anonymous users, changes of the data invalidate
+# them sooner, see www/cache.py
+WWW_CACHE_TIMEOUT = 60 * 15
@@ -137,8 +137,33 @@ SCREENSHOT_RECTANGLE = '0,0,1366,768'
 
 SCREENSHOT_MAX_AGE = relativedelta(days=365)
 SCREENSHOT_DIR = 'screenshots'  # relative to media root
+# Derivatives generated with every new screenshot, cropped to the center
+SCREENSHOT_SIZES = {
+    'thumb': (100, 100),
+    'medium': (660, 500),
+}
+SCREENSHOT_DERIVATIVE_FORMAT = 'WEBP'
+SCREENSHOT_DERIVATIVE_EXTENSION = 'webp'
+SCREENSHOT_DERIVATIVE_QUALITY = 80
+SCREENSHOT_WORKERS = 4  # parallel requests to Manet
+SCREENSHOT_TIMEOUT = 60  # seconds
+SCREENSHOT_RETRIES = 3
+SCREENSHOT_BACKOFF = 2  # seconds, doubled with every retry
 
 
 # Random QA
 RANDOM_QA_MAX_SOURCES = 5
 RANDOM_QA_MAX_TRIES = RANDOM_QA_MAX_SOURCES * 3
+
+
+# Seed liveness checks, see source/liveness.py
+LIVENESS_CONCURRENCY = 50  # requests at once
+LIVENESS_DELAY = 1  # seconds between requests to the same host
+LIVENESS_TIMEOUT = 10  # seconds
+# checks in a row a seed has to fail before its source is considered dead
+LIVENESS_DEAD_AFTER = 3
+
+
+# Time of the last deletion of a Seed or Source, deleted rows can't move the
+# Last-Modified of the seed dump forward
+DUMP_DELETED_CACHE_KEY = 'source:dump_deleted'
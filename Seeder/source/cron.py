@@ -0,0 +1,12 @@
+from . import models
+from .models import Seed
+
+
+def update_valid_seeds():
+    """ Seeds enter and leave their date windows as days pass """
+    Seed.update_valid()
+
+
+def recount_public_sources():
+    """ Counters drift when Sources are changed by QuerySet.update """
+    models.recount_public_sources()
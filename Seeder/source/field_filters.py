@@ -21,12 +21,16 @@ def filter_not_empty(queryset, name, value):
 
 
 def filter_has_cc(queryset, name, value):
-    return models.Source.objects.has_cc(value)
+    return queryset.has_cc(value)
 
 
 def filter_contract_number(queryset, name, value):
     # value in format e.g. '64 / 2017'
-    return models.Source.objects.contains_contract_number(value)
+    return queryset.contains_contract_number(value)
+
+
+def filter_seed_url(queryset, name, value):
+    return queryset.with_seed_url(value)
 
 
 class SourceFilter(BaseFilterSet):
@@ -58,9 +62,8 @@ class SourceFilter(BaseFilterSet):
                                           method=filter_has_cc)
     contract_number = django_filters.CharFilter(label=_('Contract number'),
                                                 method=filter_contract_number)
-    seed_url = django_filters.CharFilter(label=_("Seed url contains"),
-                                         field_name="seed__url",
-                                         lookup_expr="icontains")
+    seed_url = django_filters.CharFilter(label=_("Seed url or domain"),
+                                         method=filter_seed_url)
 
     created = DateRangeFilter()
     last_changed = DateRangeFilter()
@@ -12,12 +12,14 @@ class SourceForm(forms.ModelForm):
     """
     Adds new source
     """
+    # Creates the main seed, Source.main_url itself isn't editable
     main_url = forms.URLField(label=_('Main URL'))
+    field_order = ('name', 'main_url')
 
     class Meta:
         model = models.Source
         fields = (
-            'name', 'main_url', 'publisher', 'category',
+            'name', 'publisher', 'category',
             'keywords', 'suggested_by'
         )
 
@@ -37,6 +39,8 @@ class ManagementSourceForm(SourceForm):
     This is pretty much the same as SourceForm with the difference that it
     allows to select owner=curator of the source.
     """
+    field_order = ('owner',) + SourceForm.field_order
+
     class Meta(SourceForm.Meta):
         fields = ('owner',) + SourceForm.Meta.fields
 
@@ -0,0 +1,158 @@
+"""
+Liveness of seeds
+
+Seeds are checked concurrently by an asyncio event loop, a limited number of
+requests is running at once and requests to the same host are spaced out by
+a politeness delay. There's no asyncio HTTP client among the dependencies,
+so the blocking requests run in a thread pool of the same size as the limit.
+"""
+import time
+import asyncio
+import requests
+
+from logging import getLogger
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from source import constants
+from source.models import Seed, Source
+
+
+logger = getLogger('source.liveness')
+
+# The server is up even though it doesn't let us in
+ALIVE_ERROR_CODES = (401, 403, 429)
+
+
+def is_alive(status_code):
+    """ :param status_code: HTTP status or None if the request failed """
+    if status_code is None:
+        return False
+    return status_code < 400 or status_code in ALIVE_ERROR_CODES
+
+
+def get_host(url):
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+
+class LivenessChecker:
+    def __init__(self, concurrency=constants.LIVENESS_CONCURRENCY,
+                 delay=constants.LIVENESS_DELAY,
+                 timeout=constants.LIVENESS_TIMEOUT):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.timeout = timeout
+        self.executor = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url):
+        """
+        Runs in the thread pool, the body of the response isn't downloaded
+        :return: (status code, final URL if redirected, latency in ms)
+        """
+        start = time.monotonic()
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True,
+                                  allow_redirects=True) as r:
+                status_code = r.status_code
+                redirect_url = r.url if r.history else None
+        except requests.RequestException as e:
+            logger.info('Seed %s failed: %s', url, e)
+            status_code = redirect_url = None
+        latency = int((time.monotonic() - start) * 1000)
+        return status_code, redirect_url, latency
+
+    async def check_seed(self, seed, limit, host_locks, last_request):
+        host = get_host(seed.url)
+        # Requests to one host are made one by one, ``delay`` seconds apart;
+        # waiting for the host doesn't take up the concurrency limit
+        async with host_locks[host]:
+            wait = last_request[host] + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            async with limit:
+                result = await asyncio.get_event_loop().run_in_executor(
+                    self.executor, self.fetch, seed.url)
+            last_request[host] = time.monotonic()
+        seed.status_code, seed.redirect_url, seed.latency = result
+        seed.last_checked = timezone.now()
+        if is_alive(seed.status_code):
+            seed.failed_checks = 0
+        else:
+            seed.failed_checks += 1
+        return seed
+
+    async def check_all(self, seeds):
+        limit = asyncio.Semaphore(self.concurrency)
+        host_locks = defaultdict(asyncio.Lock)
+        last_request = defaultdict(lambda: float('-inf'))
+        return await asyncio.gather(*(
+            self.check_seed(seed, limit, host_locks, last_request)
+            for seed in seeds
+        ))
+
+    def check(self, seeds):
+        """ Check the seeds and store the results """
+        seeds = list(seeds)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            self.executor = executor
+            asyncio.run(self.check_all(seeds))
+        Seed.objects.bulk_update(seeds, [
+            'status_code', 'redirect_url', 'latency', 'last_checked',
+            'failed_checks',
+        ], batch_size=500)
+        return seeds
+
+
+def get_dead_sources(seeds):
+    """
+    A single failed check can be a temporary outage, so seeds have to fail
+    ``LIVENESS_DEAD_AFTER`` checks in a row to count as dead. All archiving
+    seeds of the Sources count, not only the checked ones (e.g. with limit)
+    :param seeds: checked seeds
+    :return: Sources of ``seeds`` whose archiving seeds are all dead, but
+             that aren't marked as dead yet
+    """
+    checked = {seed.source_id for seed in seeds}
+    alive = defaultdict(bool)
+    all_seeds = Seed.objects.archiving().order_by().values_list(
+        'source_id', 'failed_checks')
+    for source_id, failed_checks in all_seeds.iterator():
+        if source_id in checked:
+            alive[source_id] |= failed_checks < constants.LIVENESS_DEAD_AFTER
+    dead = [pk for pk, is_source_alive in alive.items() if not is_source_alive]
+    return Source.objects.filter(pk__in=dead, dead_source=False)
+
+
+def check_seeds(limit=None, set_dead=False, **kwargs):
+    """
+    Check archiving seeds, and mark Sources whose seeds are all dead as dead
+    if ``set_dead`` is used. Dead Sources are logged, so that the cron's
+    aren't lost.
+    :return: (checked seeds, dead Sources)
+    """
+    seeds = Seed.objects.archiving().order_by('pk').only(
+        'pk', 'url', 'source', 'failed_checks')
+    if limit:
+        seeds = seeds[:limit]
+    seeds = LivenessChecker(**kwargs).check(seeds)
+    # Listed before they're updated
+    dead_sources = list(get_dead_sources(seeds))
+    for source in dead_sources:
+        logger.warning('%s dead source %s: %s',
+                       'Marked' if set_dead else 'Found', source.pk,
+                       source.name)
+        if set_dead:
+            source.dead_source = True
+            source.save()
+    return seeds, dead_sources
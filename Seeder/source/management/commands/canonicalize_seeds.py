@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from source.models import Seed
+
+
+class Command(BaseCommand):
+    help = ("Fill canonical_url and domain of existing Seeds.\nSeeds that "
+            "already have them are skipped unless the --force option is used.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Recompute all Seeds, e.g. after the canonical form changed",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of Seeds updated at once",
+        )
+
+    def handle(self, *args, **options):
+        seeds = Seed.objects.all()
+        if not options.get("force"):
+            seeds = seeds.filter(canonical_url='')
+        seeds = seeds.only("pk", "url").order_by("pk")
+
+        batch, total = [], 0
+        for seed in seeds.iterator(chunk_size=options["batch_size"]):
+            seed.canonicalize()
+            batch.append(seed)
+            if len(batch) >= options["batch_size"]:
+                total += self.update(batch)
+                batch = []
+        total += self.update(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully canonicalized {total} seeds"))
+
+    def update(self, seeds):
+        # Not saving the seeds one by one, nothing else has changed
+        Seed.objects.bulk_update(seeds, ["canonical_url", "domain"])
+        if seeds:
+            self.stdout.write(f"Seeds up to {seeds[-1].pk} done")
+        return len(seeds)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from source import constants
+from source.liveness import check_seeds, is_alive
+
+
+class Command(BaseCommand):
+    help = ("Check whether archiving seeds are alive and store the results. "
+            "Sources whose seeds are all dead are listed, use --set-dead to "
+            "mark them as dead.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--set-dead', action='store_true',
+            help="Mark sources whose seeds are all dead as dead",
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help="Maximum number of seeds to check",
+        )
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=constants.LIVENESS_CONCURRENCY,
+            help="Number of requests running at once",
+        )
+        parser.add_argument(
+            '--delay', type=float, default=constants.LIVENESS_DELAY,
+            help="Seconds between requests to the same host",
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=constants.LIVENESS_TIMEOUT,
+            help="Seconds to wait for a response",
+        )
+
+    def handle(self, *args, **options):
+        seeds, dead_sources = check_seeds(
+            limit=options.get('limit'), set_dead=options['set_dead'],
+            concurrency=options['concurrency'], delay=options['delay'],
+            timeout=options['timeout'])
+        for source in dead_sources:
+            self.stdout.write('{0}: {1} {2}'.format(
+                'Marked dead' if options['set_dead'] else 'Dead',
+                source.pk, source.name))
+        alive = sum(1 for seed in seeds if is_alive(seed.status_code))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(seeds)} seeds checked, {alive} alive'))
@@ -0,0 +1,61 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from source import constants
+from source.models import Source, get_screenshot_path
+
+
+class Command(BaseCommand):
+    help = ("Delete screenshot files and their derivatives that no Source "
+            "references anymore")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only list the files that would be deleted",
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=24,
+            help="Keep files younger than this many hours, they may belong "
+                 "to screenshots that are just being taken",
+        )
+
+    def get_referenced(self):
+        """ :return: set of paths relative to media root that are in use """
+        referenced = set()
+        screenshots = Source._base_manager.exclude(screenshot='').exclude(
+            screenshot__isnull=True,
+        ).values_list('screenshot', 'screenshot_hash')
+        for name, content_hash in screenshots.iterator():
+            referenced.add(os.path.normpath(name))
+            if content_hash and name == get_screenshot_path(content_hash):
+                referenced.update(get_screenshot_path(content_hash, size)
+                                  for size in constants.SCREENSHOT_SIZES)
+        return referenced
+
+    def handle(self, *args, **options):
+        referenced = self.get_referenced()
+        max_mtime = time.time() - options['min_age'] * 3600
+        root = os.path.join(settings.MEDIA_ROOT, constants.SCREENSHOT_DIR)
+
+        deleted = size = 0
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                relative_path = os.path.relpath(path, settings.MEDIA_ROOT)
+                if (relative_path in referenced or
+                        os.path.getmtime(path) > max_mtime):
+                    continue
+                deleted += 1
+                size += os.path.getsize(path)
+                if options['dry_run']:
+                    self.stdout.write(relative_path)
+                else:
+                    os.remove(path)
+        self.stdout.write(self.style.SUCCESS(
+            '{0} {1} unreferenced files ({2:.1f} MB)'.format(
+                'Found' if options['dry_run'] else 'Deleted',
+                deleted, size / 1024 / 1024)))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from source.models import Source, get_name_initial
+
+
+class Command(BaseCommand):
+    help = ("Fill name_initial of Sources for the alphabetical browser.\n"
+            "Only Sources whose initial doesn't match their name are updated, "
+            "e.g. after names were changed by bulk updates.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of Sources updated at once",
+        )
+
+    def handle(self, *args, **options):
+        # Inactive Sources included
+        sources = Source._base_manager.only("pk", "name", "name_initial")
+        batch, total = [], 0
+        for source in sources.order_by("pk").iterator(
+                chunk_size=options["batch_size"]):
+            initial = get_name_initial(source.name)
+            if source.name_initial != initial:
+                source.name_initial = initial
+                batch.append(source)
+            if len(batch) >= options["batch_size"]:
+                total += self.update(batch)
+                batch = []
+        total += self.update(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully filled {total} name initials"))
+
+    def update(self, sources):
+        # Not saving the sources one by one, nothing else has changed
+        Source._base_manager.bulk_update(sources, ["name_initial"])
+        return len(sources)
@@ -1,9 +1,38 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+
+from source import constants
 from source.screenshots import take_screenshots
 
 
 class Command(BaseCommand):
-    help = 'Generates screenshots for the sources'
+    help = ("Generates screenshots for the sources without a recent one. "
+            "Use --since to re-take screenshots of sources changed since "
+            "the date.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int,
+            help="Maximum number of sources to process",
+        )
+        parser.add_argument(
+            '--since',
+            help="Sources changed since the date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            '--workers', type=int, default=constants.SCREENSHOT_WORKERS,
+            help="Number of parallel requests to Manet",
+        )
 
     def handle(self, *args, **options):
-        take_screenshots()
\ No newline at end of file
+        since = options.get('since')
+        if since:
+            since = parse_datetime(since) or parse_date(since)
+            if since is None:
+                raise CommandError("Invalid --since date")
+        stats = take_screenshots(
+            limit=options.get('limit'), since=since,
+            workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            '{new} new, {unchanged} unchanged, {failed} failed '
+            'screenshots'.format(**stats)))
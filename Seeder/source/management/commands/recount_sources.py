@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from source.models import recount_public_sources
+
+
+class Command(BaseCommand):
+    help = ("Recompute the numbers of public Sources in categories and sub "
+            "categories.\nThey're updated as Sources are saved, this repairs "
+            "drift after bulk updates.")
+
+    def handle(self, *args, **options):
+        corrected = recount_public_sources()
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully recounted sources, {corrected} counters corrected"))
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+def fill_main_url(apps, schema_editor):
+    """
+    Main URL is the URL of the included main seed or the first seed, seeds
+    are read in a single pass ordered by source
+    """
+    Source = apps.get_model("source", "Source")
+    Seed = apps.get_model("source", "Seed")
+    main_urls = {}
+    seeds = Seed.objects.order_by("source_id", "pk").values_list(
+        "source_id", "url", "main_seed", "state")
+    for source_id, url, main_seed, state in seeds.iterator():
+        if source_id not in main_urls:
+            main_urls[source_id] = (url, False)
+        if main_seed and state == "inc" and not main_urls[source_id][1]:
+            main_urls[source_id] = (url, True)
+    for source_id, (url, _) in main_urls.items():
+        Source.objects.filter(pk=source_id).update(main_url=url)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0007_strip_seed_urls_20240718_0951'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='main_url',
+            field=models.URLField(blank=True, editable=False, null=True, verbose_name='Main URL'),
+        ),
+        migrations.RunPython(fill_main_url,
+                             reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0008_source_main_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='screenshot_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+    ]
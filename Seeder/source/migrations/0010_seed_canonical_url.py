@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0009_source_screenshot_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seed',
+            name='canonical_url',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='seed',
+            name='domain',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200, null=True),
+        ),
+    ]
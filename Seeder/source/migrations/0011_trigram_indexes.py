@@ -0,0 +1,54 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:40
+
+from django.db import migrations
+
+# Plain indexes serve the similarity (%) operator, the UPPER() ones serve
+# icontains lookups, which Django runs as UPPER(column) LIKE UPPER(%s)
+FORWARD_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX source_source_name_trgm
+    ON source_source USING gin (name gin_trgm_ops);
+CREATE INDEX source_source_name_upper_trgm
+    ON source_source USING gin (UPPER(name) gin_trgm_ops);
+CREATE INDEX source_seed_canonical_url_upper_trgm
+    ON source_seed USING gin (UPPER(canonical_url) gin_trgm_ops);
+CREATE INDEX source_keyword_word_trgm
+    ON source_keyword USING gin (word gin_trgm_ops);
+CREATE INDEX source_keyword_word_upper_trgm
+    ON source_keyword USING gin (UPPER(word) gin_trgm_ops);
+CREATE INDEX source_category_name_trgm
+    ON source_category USING gin (name gin_trgm_ops);
+CREATE INDEX source_category_name_upper_trgm
+    ON source_category USING gin (UPPER(name) gin_trgm_ops);
+"""
+
+REVERSE_SQL = """
+DROP INDEX IF EXISTS source_source_name_trgm;
+DROP INDEX IF EXISTS source_source_name_upper_trgm;
+DROP INDEX IF EXISTS source_seed_canonical_url_upper_trgm;
+DROP INDEX IF EXISTS source_keyword_word_trgm;
+DROP INDEX IF EXISTS source_keyword_word_upper_trgm;
+DROP INDEX IF EXISTS source_category_name_trgm;
+DROP INDEX IF EXISTS source_category_name_upper_trgm;
+"""
+
+
+def run_postgresql(sql):
+    """ Trigram indexes are only available on PostgreSQL """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0010_seed_canonical_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgresql(FORWARD_SQL),
+                             reverse_code=run_postgresql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0011_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seed',
+            name='last_checked',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last checked'),
+        ),
+        migrations.AddField(
+            model_name='seed',
+            name='latency',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Latency (ms)'),
+        ),
+        migrations.AddField(
+            model_name='seed',
+            name='redirect_url',
+            field=models.URLField(blank=True, editable=False, max_length=2000, null=True, verbose_name='Redirected to'),
+        ),
+        migrations.AddField(
+            model_name='seed',
+            name='status_code',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Status code'),
+        ),
+    ]
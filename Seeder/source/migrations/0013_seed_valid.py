@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:31
+
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def fill_valid(apps, schema_editor):
+    """ Same as Seed.get_valid_filter at the time of the migration """
+    Seed = apps.get_model("source", "Seed")
+    today = timezone.localdate()
+    Seed.objects.filter(
+        Q(source__active=True) &
+        Q(state='inc') &  # SEED_STATE_INCLUDE
+        Q(Q(to_time__lte=today, from_time__gte=today) |
+          Q(to_time__isnull=True))
+    ).update(valid=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0012_seed_liveness'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seed',
+            name='valid',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='seed',
+            index=models.Index(condition=models.Q(valid=True), fields=['source'], name='source_seed_valid_idx'),
+        ),
+        migrations.RunPython(fill_valid,
+                             reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:38
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_public_sources(apps, schema_editor):
+    """ Same as recount_public_sources at the time of the migration """
+    Source = apps.get_model("source", "Source")
+    # PUBLIC_STATES
+    public = Source.objects.filter(active=True, state__in=['success'])
+    for name, field in (('Category', 'category'),
+                        ('SubCategory', 'sub_category')):
+        model = apps.get_model("source", name)
+        counts = public.order_by().values_list(field).annotate(Count('pk'))
+        for pk, count in counts:
+            model.objects.filter(pk=pk).update(public_sources=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0013_seed_valid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='public_sources',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='public_sources',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_public_sources,
+                             reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:45
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def get_name_initial(name):
+    """ Same as source.models.get_name_initial at the time of the migration """
+    name = (name or '').strip().upper()
+    if name.startswith('CH'):
+        return 'CH'
+    letter = unicodedata.normalize('NFKD', name[:1])[:1]
+    return letter if 'A' <= letter <= 'Z' else '#'
+
+
+def fill_name_initial(apps, schema_editor):
+    Source = apps.get_model("source", "Source")
+    sources = list(Source.objects.only('pk', 'name'))
+    for source in sources:
+        source.name_initial = get_name_initial(source.name)
+    Source.objects.bulk_update(sources, ['name_initial'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0014_public_source_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='name_initial',
+            field=models.CharField(default='#', editable=False, max_length=2),
+        ),
+        migrations.AddIndex(
+            model_name='source',
+            index=models.Index(fields=['name_initial', 'name'], name='source_name_initial_idx'),
+        ),
+        migrations.RunPython(fill_name_initial,
+                             reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0015_source_name_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='screenshot_attempt',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('source', '0016_source_screenshot_attempt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seed',
+            name='failed_checks',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Failed checks in a row'),
+        ),
+    ]
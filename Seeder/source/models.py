@@ -1,8 +1,12 @@
+import datetime
+import os
+import unicodedata
 import tld
 
 from django.db import models
 from django.conf import settings
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Q, F, Prefetch, Exists, OuterRef, Count, Sum
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
 from django.urls import reverse
@@ -11,7 +15,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 from django.utils.text import slugify
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import (
+    pre_save, post_save, post_delete, pre_delete)
 
 from tld.exceptions import TldDomainNotFound
 from reversion import revisions
@@ -19,7 +24,8 @@ from reversion import revisions
 from . import constants
 from contracts.constants import CREATIVE_COMMONS_TYPES
 from core.models import BaseModel, DatePickerField
-from core.utils import get_wayback_url
+from core.utils import (
+    get_wayback_url, canonicalize_url, get_registered_domain)
 from publishers.models import Publisher, ContactPerson
 from legacy_db.models import TransferRecord
 from search_blob.models import SearchModel, update_search
@@ -32,6 +38,45 @@ def validate_tld(value):
         raise ValidationError('Invalid domain name')
 
 
+def export_value(value):
+    """
+    Make a value safe for spreadsheets: datetimes are converted to naive UTC
+    and strings that could be taken as formulas are prefixed with an
+    apostrophe
+    """
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value, timezone.utc)
+    if isinstance(value, str) and value.startswith(('=', '+', '-', '@')):
+        return f"'{value}"
+    return value
+
+
+def get_name_initial(name):
+    """
+    Letter of the alphabetical browser, diacritics are ignored and CH is a
+    letter of its own as in the Czech alphabet
+    :return: 'A' to 'Z', 'CH' or '#' for anything else
+    """
+    name = (name or '').strip().upper()
+    if name.startswith('CH'):
+        return 'CH'
+    letter = unicodedata.normalize('NFKD', name[:1])[:1]
+    return letter if 'A' <= letter <= 'Z' else '#'
+
+
+def get_screenshot_path(content_hash, size=None):
+    """
+    Screenshots are stored under their hash, so identical images are only
+    stored once
+    :return: path of the screenshot or of its derivative relative to media root
+    """
+    directory = os.path.join(constants.SCREENSHOT_DIR, content_hash[:2])
+    if size is None:
+        return os.path.join(directory, f'{content_hash}.png')
+    return os.path.join(directory, '{0}_{1}.{2}'.format(
+        content_hash, size, constants.SCREENSHOT_DERIVATIVE_EXTENSION))
+
+
 class SlugOrCreateModel(object):
     """
     This is mixin that kind of handles slug prepopulation softly
@@ -91,15 +136,8 @@ class SeedManager(models.Manager):
     """
 
     def valid_seeds(self):
-        today = timezone.now()
-        return super().get_queryset().filter(
-            Q(source__active=True) &
-            Q(state=constants.SEED_STATE_INCLUDE) &
-            Q(
-                Q(to_time__lte=today, from_time__gte=today) |
-                Q(to_time__isnull=True)
-            )
-        )
+        """ Seeds flagged as valid, see Seed.get_valid_filter """
+        return super().get_queryset().filter(valid=True)
 
     def archiving(self):
         return self.valid_seeds().filter(
@@ -115,6 +153,8 @@ class SeedManager(models.Manager):
 class Category(models.Model, SlugOrCreateModel):
     name = models.CharField(max_length=150)
     slug = models.SlugField(unique=True, blank=True, null=True)
+    # Number of public Sources, see update_public_sources
+    public_sources = models.IntegerField(default=0, editable=False)
 
     from_field = 'name'
     slug_field = 'slug'
@@ -122,6 +162,12 @@ class Category(models.Model, SlugOrCreateModel):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def get_public_sources_total(cls):
+        """ Every Source has a category, so this is all public Sources """
+        return cls.objects.aggregate(
+            total=Sum('public_sources'))['total'] or 0
+
     def www_url(self):
         return reverse('www:category_detail', kwargs={'slug': self.slug_safe})
 
@@ -136,6 +182,8 @@ class SubCategory(models.Model, SlugOrCreateModel):
     category = models.ForeignKey(Category, on_delete=models.DO_NOTHING)
 
     subcategory_id = models.CharField(max_length=40, blank=True, null=True)
+    # Number of public Sources, see update_public_sources
+    public_sources = models.IntegerField(default=0, editable=False)
 
     from_field = 'name'
     slug_field = 'slug'
@@ -152,7 +200,45 @@ class SubCategory(models.Model, SlugOrCreateModel):
         ordering = ['name']
 
 
-class SourceManager(models.Manager):
+class SourceQuerySet(models.QuerySet):
+    def _valid_contracts(self, **kwargs):
+        from contracts.models import Contract
+        return Contract.objects.valid().filter(
+            sources=OuterRef('pk'), **kwargs)
+
+    def has_cc(self, value=True):
+        # Can search for non-CC Sources as well
+        return self.annotate(
+            has_cc_contract=Exists(self._valid_contracts(is_cc=True)),
+        ).filter(has_cc_contract=value)
+
+    def contains_contract_number(self, value):
+        """ :param value: contract number in format e.g. '64 / 2017' """
+        try:
+            contract_number, year = [int(s.strip()) for s in value.split('/')]
+        except ValueError:
+            return self.none()
+        return self.annotate(has_contract_number=Exists(self._valid_contracts(
+            contract_number=contract_number, year=year,
+        ))).filter(has_contract_number=True)
+
+    def with_seed_url(self, value):
+        """
+        Sources with a seed starting with the canonical form of ``value`` or,
+        if it's a bare domain, with a seed anywhere on the domain
+        """
+        canonical = canonicalize_url(value)
+        if not canonical:
+            return self
+        seeds = Q(canonical_url__startswith=canonical)
+        if canonical == get_registered_domain(value):
+            seeds |= Q(domain=canonical)
+        return self.annotate(has_seed_url=Exists(Seed.objects.filter(
+            seeds, source=OuterRef('pk'),
+        ))).filter(has_seed_url=True)
+
+
+class SourceManager(models.Manager.from_queryset(SourceQuerySet)):
     """
     Filters sources that needs quality assurance
     """
@@ -170,6 +256,10 @@ class SourceManager(models.Manager):
             state__in=constants.PUBLIC_STATES
         )
 
+    def with_main_seed(self):
+        """ Prefetch seeds so that ``main_seed`` doesn't query per Source """
+        return self.get_queryset().prefetch_related('seed_set')
+
     def needs_qa(self):
         """
         Finds sources that are archived and don't have QA or its QAs are old
@@ -182,26 +272,6 @@ class SourceManager(models.Manager):
             Q(qualityassurancecheck__last_changed__lte=qa_limit)
         )
 
-    def has_cc(self, value=True):
-        with_contract = self.get_queryset().exclude(contract=None)
-        pks = [s.pk for s in with_contract
-               if s.contract_set.valid().filter(is_cc=True).count() > 0]
-        # Can search for non-CC Sources as well
-        if value:
-            return self.get_queryset().filter(pk__in=pks)
-        else:
-            return self.get_queryset().exclude(pk__in=pks)
-
-    def contains_contract_number(self, value):
-        try:
-            contract_number, year = [int(s.strip()) for s in value.split('/')]
-            with_contract = self.get_queryset().exclude(contract=None)
-            pks = [s.pk for s in with_contract
-                   if s.contract_set.valid().filter(
-                       contract_number=contract_number, year=year).count() > 0]
-            return self.get_queryset().filter(pk__in=pks)
-        except Exception:
-            return self.get_queryset().none()
 
 
 class KeyWord(SlugOrCreateModel, models.Model):
@@ -293,8 +363,21 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
     )
 
     screenshot_date = models.DateTimeField(null=True, blank=True)
+    # Last time a screenshot was taken, even if it failed
+    screenshot_attempt = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    # SHA-256 of the screenshot, see get_screenshot_path
+    screenshot_hash = models.CharField(
+        max_length=64, null=True, blank=True, editable=False)
     keywords = models.ManyToManyField(KeyWord, blank=True)
     dead_source = models.BooleanField(_('Source is dead'), default=False)
+    # URL of the main seed, kept up to date when seeds are saved or deleted
+    main_url = models.URLField(
+        _('Main URL'), blank=True, null=True, editable=False)
+
+    # Letter of the alphabetical browser, see get_name_initial
+    name_initial = models.CharField(
+        max_length=2, default='#', editable=False)
 
     slug = models.SlugField(unique=True, blank=True, null=True)
     from_field = 'stripped_main_url'
@@ -302,12 +385,33 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
 
     objects = SourceManager()
 
+    search_prefetch = ('seed_set', 'keywords', 'publisher__contactperson_set')
+
+    # Columns of the full export, see export_all_sources
+    EXPORT_FIELDS = (
+        "id", "name", "owner__username", "state", "publisher__name",
+        "category__name", "sub_category__name", "suggested_by",
+        "dead_source", "created", "last_changed", "seed_urls",
+    )
+
+    @classmethod
+    def get_search_result_prefetch(cls):
+        from contracts.models import Contract
+        return ('seed_set', 'keywords', 'publisher', Prefetch(
+            'contract_set', to_attr='valid_cc_contracts',
+            queryset=Contract.objects.valid().filter(is_cc=True)))
+
     class Meta:
         verbose_name = _('Source')
         verbose_name_plural = _('Sources')
         ordering = [
             'name'
         ]
+        indexes = [
+            # Letters of the alphabetical browser, ordered by name
+            models.Index(fields=['name_initial', 'name'],
+                         name='source_name_initial_idx'),
+        ]
 
         # Extra permission for supervisors to enable them manage Sources that
         # they don't own..
@@ -318,6 +422,13 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_initial = get_name_initial(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_initial'}
+        return super().save(*args, **kwargs)
+
     def get_search_title(self):
         return self.name
 
@@ -356,6 +467,13 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
 
     @property
     def main_seed(self):
+        # Seeds prefetched e.g. for search results
+        if 'seed_set' in getattr(self, '_prefetched_objects_cache', {}):
+            seeds = self.seed_set.all()
+            main_active = [s for s in seeds if s.main_seed and
+                           s.state == constants.SEED_STATE_INCLUDE]
+            return min(main_active or seeds, key=lambda s: s.pk, default=None)
+
         main_active = self.seed_set.filter(
             state=constants.SEED_STATE_INCLUDE,
             main_seed=True,
@@ -363,8 +481,21 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
 
         return main_active if main_active else self.seed_set.first()
 
+    def refresh_main_url(self):
+        """
+        Re-compute ``main_url`` from the seeds and store it without saving
+        the whole Source
+        """
+        # Prefetched seeds could be outdated
+        getattr(self, '_prefetched_objects_cache', {}).pop('seed_set', None)
+        seed = self.main_seed
+        self.main_url = seed.url if seed else None
+        Source._base_manager.filter(pk=self.pk).update(main_url=self.main_url)
+
     @property
     def url(self):
+        if self.main_url:
+            return self.main_url
         return self.main_seed.url
 
     @property
@@ -410,6 +541,25 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
         """
         return
 
+    def get_screenshot_url(self, size):
+        """
+        :return: URL of a pre-generated derivative of the screenshot or None
+                 if the screenshot was stored before they were generated
+        """
+        if (not self.screenshot_hash or self.screenshot.name !=
+                get_screenshot_path(self.screenshot_hash)):
+            return None
+        return self.screenshot.storage.url(
+            get_screenshot_path(self.screenshot_hash, size))
+
+    @property
+    def screenshot_thumb_url(self):
+        return self.get_screenshot_url('thumb')
+
+    @property
+    def screenshot_medium_url(self):
+        return self.get_screenshot_url('medium')
+
     @property
     def screenshot_file_exists(self):
         try:
@@ -451,13 +601,20 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
             return self.get_suggested_by_display()
         return self.created_by
 
+    def get_cc_contracts(self):
+        """ Valid CC contracts, pre-fetched as ``valid_cc_contracts`` """
+        if not hasattr(self, 'valid_cc_contracts'):
+            self.valid_cc_contracts = list(
+                self.contract_set.valid().filter(is_cc=True))
+        return self.valid_cc_contracts
+
     def get_creative_commons(self):
-        cc_contracts = self.contract_set.valid().filter(is_cc=True)
+        cc_contracts = self.get_cc_contracts()
         # Only return something if there's at least one CC contract
-        if cc_contracts.count() == 0:
+        if len(cc_contracts) == 0:
             return None
         # Get the first CC contract's type
-        cc_contract = cc_contracts.first()
+        cc_contract = cc_contracts[0]
         cc_type = cc_contract.creative_commons_type
         # URL can be None if CC type is incorrect
         cc_url = cc_contract.get_creative_commons_url()
@@ -475,36 +632,32 @@ class Source(SearchModel, SlugOrCreateModel, BaseModel):
 
     @property
     def has_creative_commons(self):
-        return self.contract_set.valid().filter(is_cc=True).count() > 0
+        return len(self.get_cc_contracts()) > 0
 
     @property
     def is_public(self):
         return self.state in constants.PUBLIC_STATES
 
     @classmethod
-    def export_all_sources(cls):
+    def export_all_sources(cls, chunk_size=2000):
+        """
+        Rows of all sources for the full export, starting with the header.
+        Sources are read through a server-side cursor in chunks, so the
+        whole catalogue is never held in memory.
+        """
+        from django.db import connection
         from django.db.models.expressions import RawSQL
-        import pandas as pd
-        qs = cls.objects.prefetch_related(
-            "owner", "publisher", "category", "sub_category"
-            # string_agg is supported from Django 3
-        ).annotate(seed_urls=RawSQL(
-            "SELECT string_agg(url, ',') FROM source_seed WHERE "
-            "source_seed.source_id = source_source.id", ()))
-        df = pd.DataFrame.from_records(qs.values(
-            "id", "name", "owner__username", "state", "publisher__name",
-            "category__name", "sub_category__name", "suggested_by",
-            "dead_source", "created", "last_changed", "seed_urls",
-        ))
-        for col in df.columns:
-            # Make datetime fields timezone-naive
-            if df[col].dtype.name == "datetime64[ns, UTC]":
-                df[col] = df[col].dt.tz_convert("UTC").dt.tz_localize(None)
-            # Prefix problematic cols (formulas) with an apostrophe
-            if df[col].dtype == object:
-                df[col] = df[col].apply(lambda x: f"'{x}" if isinstance(
-                    x, str) and x.startswith(('=', '+', '-', '@')) else x)
-        return df
+        # string_agg is supported from Django 3, sqlite only has group_concat
+        aggregate = ("string_agg(url, ',')"
+                     if connection.vendor == 'postgresql'
+                     else "group_concat(url, ',')")
+        qs = cls.objects.annotate(seed_urls=RawSQL(
+            f"SELECT {aggregate} FROM source_seed WHERE "
+            "source_seed.source_id = source_source.id", ()
+        )).order_by("pk").values_list(*cls.EXPORT_FIELDS)
+        yield cls.EXPORT_FIELDS
+        for row in qs.iterator(chunk_size=chunk_size):
+            yield [export_value(value) for value in row]
 
 
 @revisions.register(exclude=('last_changed',))
@@ -528,6 +681,11 @@ class Seed(BaseModel):
 
     main_seed = models.BooleanField(_('Main seed'), default=False)
     url = models.URLField(_('Seed url'), validators=[validate_tld])
+    # Computed from url on save, used to pair and look up seeds
+    canonical_url = models.CharField(
+        max_length=200, blank=True, db_index=True, editable=False)
+    domain = models.CharField(
+        max_length=200, blank=True, null=True, db_index=True, editable=False)
     state = models.CharField(choices=constants.SEED_STATES,
                              default=constants.SEED_STATE_INCLUDE,
                              max_length=15)
@@ -545,6 +703,23 @@ class Seed(BaseModel):
     redirect = models.BooleanField(_('Redirect on seed'), default=False)
     robots = models.BooleanField(_('Robots.txt active'), default=False)
 
+    # Materialized result of get_valid_filter, updated on save and daily by
+    # the cron as the date window moves
+    valid = models.BooleanField(default=False, editable=False)
+
+    # Result of the last liveness check, see source/liveness.py
+    status_code = models.IntegerField(
+        _('Status code'), null=True, blank=True, editable=False)
+    redirect_url = models.URLField(
+        _('Redirected to'), max_length=2000, null=True, blank=True,
+        editable=False)
+    latency = models.IntegerField(
+        _('Latency (ms)'), null=True, blank=True, editable=False)
+    last_checked = models.DateTimeField(
+        _('Last checked'), null=True, blank=True, editable=False)
+    failed_checks = models.PositiveSmallIntegerField(
+        _('Failed checks in a row'), default=0, editable=False)
+
     gentle_fetch = models.CharField(
         max_length=10,
         choices=GENTLE_FETCH_CHOICES,
@@ -562,13 +737,71 @@ class Seed(BaseModel):
     class Meta:
         verbose_name = _('Seed')
         verbose_name_plural = _('Seeds')
+        indexes = [
+            models.Index(fields=['source'], condition=Q(valid=True),
+                         name='source_seed_valid_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # When setting one seed as main, set all other source seeds to False
         if self.main_seed and self.source:
             self.source.seed_set.exclude(pk=self.pk).update(main_seed=False)
+        self.canonicalize()
+        self.valid = self.is_valid()
         return super().save(*args, **kwargs)
 
+    @staticmethod
+    def get_valid_filter(today=None):
+        """
+        Seeds of active sources that are included and either have no end
+        date or are within their date window
+        """
+        today = today or timezone.localdate()
+        return (
+            Q(source__active=True) &
+            Q(state=constants.SEED_STATE_INCLUDE) &
+            Q(
+                Q(to_time__lte=today, from_time__gte=today) |
+                Q(to_time__isnull=True)
+            )
+        )
+
+    def is_valid(self, today=None):
+        """ Same as get_valid_filter for a single seed """
+        today = today or timezone.localdate()
+        return (
+            self.source.active and
+            self.state == constants.SEED_STATE_INCLUDE and (
+                self.to_time is None or (
+                    self.from_time is not None and
+                    self.to_time <= today <= self.from_time
+                )
+            )
+        )
+
+    @classmethod
+    def update_valid(cls, seeds=None, today=None):
+        """
+        Recompute the valid flag of ``seeds`` or of all seeds, changed seeds
+        get a new last_changed so the dump is modified
+        :return: number of seeds whose flag changed
+        """
+        if seeds is None:
+            seeds = cls.objects.all()
+        valid = cls.objects.filter(cls.get_valid_filter(today)).values('pk')
+        now = timezone.now()
+        return (
+            seeds.filter(valid=False, pk__in=valid).update(
+                valid=True, last_changed=now) +
+            seeds.filter(valid=True).exclude(pk__in=valid).update(
+                valid=False, last_changed=now)
+        )
+
+    def canonicalize(self):
+        """ Update canonical_url and domain from url """
+        self.canonical_url = canonicalize_url(self.url)
+        self.domain = get_registered_domain(self.url)
+
     def css_class(self):
         if self.main_seed:
             return 'light'
@@ -587,3 +820,101 @@ class Seed(BaseModel):
 
 
 post_save.connect(update_search, sender=Source)
+
+
+def update_valid_seeds(instance, **kwargs):
+    """ Seeds of inactive sources aren't valid """
+    Seed.update_valid(instance.seed_set.all())
+
+
+post_save.connect(update_valid_seeds, sender=Source)
+
+
+def get_counted_categories(source):
+    """
+    :return: (category, sub category) ids of a Source that's counted as
+             public in them, None if it's not public
+    """
+    if source.active and source.state in constants.PUBLIC_STATES:
+        return source.category_id, source.sub_category_id
+    return None
+
+
+def change_public_sources(categories, delta):
+    if categories is None:
+        return
+    category_id, sub_category_id = categories
+    Category.objects.filter(pk=category_id).update(
+        public_sources=F('public_sources') + delta)
+    if sub_category_id:
+        SubCategory.objects.filter(pk=sub_category_id).update(
+            public_sources=F('public_sources') + delta)
+
+
+def remember_counted_categories(instance, **kwargs):
+    """ Counters are moved from where the Source was counted before saving """
+    old = None
+    if instance.pk is not None:
+        old = Source._base_manager.filter(pk=instance.pk).only(
+            'active', 'state', 'category', 'sub_category').first()
+    instance._counted_categories = old and get_counted_categories(old)
+
+
+def update_public_sources(instance, **kwargs):
+    """
+    Keep the counters of public Sources in categories up to date, changes
+    made by QuerySet.update aren't counted, see recount_public_sources
+    """
+    old = getattr(instance, '_counted_categories', None)
+    new = get_counted_categories(instance)
+    if old != new:
+        change_public_sources(old, -1)
+        change_public_sources(new, 1)
+
+
+def uncount_public_source(instance, **kwargs):
+    change_public_sources(get_counted_categories(instance), -1)
+
+
+pre_save.connect(remember_counted_categories, sender=Source)
+post_save.connect(update_public_sources, sender=Source)
+post_delete.connect(uncount_public_source, sender=Source)
+
+
+def recount_public_sources():
+    """
+    Recompute all counters of public Sources in categories
+    :return: number of corrected counters
+    """
+    corrected = 0
+    for model, field in ((Category, 'category'),
+                         (SubCategory, 'sub_category')):
+        counts = dict(Source.objects.public().order_by().values_list(
+            field).annotate(count=Count('pk')))
+        drifted = []
+        for instance in model.objects.only('pk', 'public_sources'):
+            count = counts.get(instance.pk, 0)
+            if instance.public_sources != count:
+                instance.public_sources = count
+                drifted.append(instance)
+        model.objects.bulk_update(drifted, ['public_sources'], batch_size=500)
+        corrected += len(drifted)
+    return corrected
+
+
+def update_main_url(instance, **kwargs):
+    """ Keep main_url of the seed's Source up to date """
+    instance.source.refresh_main_url()
+
+
+post_save.connect(update_main_url, sender=Seed)
+post_delete.connect(update_main_url, sender=Seed)
+
+
+def remember_dump_deleted(**kwargs):
+    """ Deleted rows have no last_changed left to modify the seed dump """
+    cache.set(constants.DUMP_DELETED_CACHE_KEY, timezone.now(), None)
+
+
+post_delete.connect(remember_dump_deleted, sender=Seed)
+post_delete.connect(remember_dump_deleted, sender=Source)
@@ -1,58 +1,189 @@
 import os
+import hashlib
 import requests
 
+from io import BytesIO
 from logging import getLogger
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-from django.db.models import Q
+from django.db.models import Q, F
 from django.conf import settings
 from django.utils import timezone
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from source import constants
-from source.models import Source
+from source.models import Source, get_screenshot_path
 
 
 logger = getLogger('screenshots.generator')
 
 
-def take_screenshots():
+def get_session(workers=constants.SCREENSHOT_WORKERS,
+                retries=constants.SCREENSHOT_RETRIES,
+                backoff=constants.SCREENSHOT_BACKOFF):
     """
-    Downloads all the screenshots
+    Session shared by the worker threads, failed Manet requests are retried
+    with an exponential backoff
     """
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=backoff,
+                  status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
-    now = timezone.now()
-    sources = Source.objects.filter(
-        Q(screenshot_date__lte=now - constants.SCREENSHOT_MAX_AGE) |
-        Q(screenshot__isnull=True)
-    )
 
-    for source in sources:
-        msg = 'Generating screenshot for {0}'.format(source.id)
-        print(msg)
-
-        logger.info(msg)
-        screenshot_name = '{pk}_{date}.png'.format(
-            pk=source.pk, date=now.strftime('%d%m%Y')
+def get_screenshot_sources(limit=None, since=None):
+    """
+    Sources whose screenshot is missing or too old or, with ``since``,
+    sources changed since the date after their last screenshot. Sources are
+    marked as they're processed, so an interrupted run can simply be resumed.
+    Sources that weren't attempted for the longest time go first, so the ones
+    that keep failing don't block the rest when there's a ``limit``.
+    """
+    if since:
+        sources = Source.objects.filter(last_changed__gte=since).filter(
+            Q(screenshot_date__lt=F('last_changed')) |
+            Q(screenshot_date__isnull=True)
         )
+    else:
+        sources = Source.objects.filter(
+            Q(screenshot_date__lte=timezone.now() -
+              constants.SCREENSHOT_MAX_AGE) |
+            Q(screenshot_date__isnull=True) |
+            Q(screenshot__isnull=True)
+        )
+    sources = sources.exclude(main_url__isnull=True).order_by(
+        F('screenshot_attempt').asc(nulls_first=True),
+        F('screenshot_date').asc(nulls_first=True), 'pk',
+    ).only('pk', 'main_url', 'screenshot', 'screenshot_hash')
+    if limit:
+        sources = sources[:limit]
+    return sources
 
-        # relative path is expected in FileField.name
-        relative_path = os.path.join(constants.SCREENSHOT_DIR,
-                                     screenshot_name)
-        absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
 
-        r = requests.get(settings.MANET_URL, params={
-            'url': source.main_seed.url,
+def fetch_screenshot(session, url, timeout=constants.SCREENSHOT_TIMEOUT):
+    """
+    Runs in the worker threads, no database access here
+    :return: PNG content or None if Manet failed
+    """
+    try:
+        r = session.get(settings.MANET_URL, timeout=timeout, params={
+            'url': url,
             'width': constants.SCREENSHOT_RESOLUTION_X,
             'height': constants.SCREENSHOT_RESOLUTION_Y,
             'clipRect': constants.SCREENSHOT_RECTANGLE,
             'format': 'png',
             'delay': 1000
         })
+    except requests.RequestException as e:
+        logger.warning('Screenshot of %s failed: %s', url, e)
+        return None
+    if r.status_code != requests.codes.ok:
+        logger.warning('Screenshot of %s failed: HTTP %s', url, r.status_code)
+        return None
+    return r.content
+
+
+def write_file(relative_path, write):
+    """
+    Write a file under media root unless it already exists. It's written
+    under a temporary name first, so a half-written file is never used.
+    """
+    absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    if os.path.exists(absolute_path):
+        return
+    os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+    temp_path = '{0}.{1}.tmp'.format(absolute_path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        write(f)
+    os.replace(temp_path, absolute_path)
+
 
-        if r.status_code == requests.codes.ok:
-            with open(absolute_path, 'wb') as screen:
-                screen.write(r.content)
+def write_derivatives(image, content_hash):
+    """ Compressed smaller versions of the screenshot for the web pages """
+    image = image.convert('RGB')
+    for size, dimensions in constants.SCREENSHOT_SIZES.items():
+        derivative = ImageOps.fit(image, dimensions, Image.LANCZOS)
+        write_file(
+            get_screenshot_path(content_hash, size),
+            lambda f: derivative.save(
+                f, constants.SCREENSHOT_DERIVATIVE_FORMAT,
+                quality=constants.SCREENSHOT_DERIVATIVE_QUALITY))
+
+
+def screenshot_files_exist(content_hash):
+    """ Whether the screenshot and all of its derivatives are stored """
+    sizes = [None, *constants.SCREENSHOT_SIZES]
+    return all(os.path.exists(os.path.join(
+        settings.MEDIA_ROOT, get_screenshot_path(content_hash, size)))
+        for size in sizes)
+
+
+def store_screenshot(source, content, now):
+    """
+    Save the screenshot and its derivatives unless it's the same as the
+    current one, identical images of several sources share the files
+    :return: 'new', 'unchanged' or 'failed' if the content isn't an image
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    relative_path = get_screenshot_path(content_hash)
+    values = {'screenshot_date': now, 'screenshot_attempt': now}
+    if (content_hash != source.screenshot_hash or
+            source.screenshot.name != relative_path or
+            not screenshot_files_exist(content_hash)):
+        try:
+            image = Image.open(BytesIO(content))
+            image.load()
+        except OSError as e:
+            logger.warning('Screenshot of %s is not an image: %s',
+                           source.url, e)
+            return 'failed'
+        # The original goes last, it's only there once the derivatives are
+        write_derivatives(image, content_hash)
+        write_file(relative_path, lambda f: f.write(content))
+        values.update(screenshot=relative_path, screenshot_hash=content_hash)
+        result = 'new'
+    else:
+        result = 'unchanged'
+    # Screenshots aren't a change of the source, don't touch last_changed
+    Source._base_manager.filter(pk=source.pk).update(**values)
+    return result
+
+
+def take_screenshots(limit=None, since=None,
+                     workers=constants.SCREENSHOT_WORKERS):
+    """
+    Downloads the screenshots of sources in parallel
+    :return: dict of counts of new, unchanged and failed screenshots
+    """
+    sources = list(get_screenshot_sources(limit, since))
+    stats = {'new': 0, 'unchanged': 0, 'failed': 0}
+    if not sources:
+        return stats
 
-            source.screenshot.name = relative_path
-            source.screenshot_date = now
-            source.save()
+    session = get_session(workers)
+    # Only a bounded number of screenshots is fetched ahead, results are
+    # saved as they come so progress isn't lost if the run is interrupted
+    chunk_size = workers * 4
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(0, len(sources), chunk_size):
+            chunk = sources[i:i + chunk_size]
+            contents = executor.map(
+                lambda source: fetch_screenshot(session, source.url), chunk)
+            for source, content in zip(chunk, contents):
+                now = timezone.now()
+                if content is None:
+                    result = 'failed'
+                else:
+                    result = store_screenshot(source, content, now)
+                stats[result] += 1
+                if result == 'failed':
+                    Source._base_manager.filter(pk=source.pk).update(
+                        screenshot_attempt=now)
+    logger.info('Screenshots: %(new)s new, %(unchanged)s unchanged, '
+                '%(failed)s failed', stats)
+    return stats
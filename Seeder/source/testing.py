@@ -0,0 +1,36 @@
+"""
+Fixtures shared by the test suites of the apps working with sources
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils.text import slugify
+
+from source.models import Category, Seed, Source
+
+
+class SourceTestCase(TestCase):
+    """
+    TestCase with a user (pedro / password) and a category the sources are
+    created in
+    """
+    superuser = False
+
+    def setUp(self):
+        super().setUp()
+        create_user = (User.objects.create_superuser if self.superuser
+                       else User.objects.create_user)
+        self.user = create_user('pedro', '', 'password')
+        self.category = Category.objects.create(name="C", slug="c")
+
+    def create_source(self, name, *urls, **kwargs):
+        """
+        Create a Source owned by the user with a Seed for each of ``urls``
+        :param kwargs: other Source fields
+        """
+        kwargs.setdefault('slug', slugify(name))
+        kwargs.setdefault('category', self.category)
+        source = Source.objects.create(
+            created_by=self.user, owner=self.user, name=name, **kwargs)
+        for url in urls:
+            Seed.objects.create(source=source, url=url)
+        return source
@@ -0,0 +1,600 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from http.server import (
+    BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer)
+from io import BytesIO, StringIO
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+
+from contracts import constants as contract_constants
+from contracts.models import Contract
+from publishers.models import Publisher
+from source import constants
+from source.models import (
+    Category, SubCategory, Seed, Source, recount_public_sources)
+from source.cron import update_valid_seeds
+from source.liveness import LivenessChecker, check_seeds, get_dead_sources
+from source.screenshots import take_screenshots
+from source.testing import SourceTestCase
+from voting.models import VotingRound
+
+
+class MainUrlTest(SourceTestCase):
+    """
+    Tests that Source.main_url follows changes of the seeds
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.source = self.create_source("Source")
+
+    def get_main_url(self):
+        return Source.objects.get(pk=self.source.pk).main_url
+
+    def test_main_url(self):
+        first = Seed.objects.create(source=self.source, url="http://first.cz")
+        self.assertEqual(self.get_main_url(), "http://first.cz")
+        second = Seed.objects.create(
+            source=self.source, url="http://second.cz", main_seed=True)
+        self.assertEqual(self.get_main_url(), "http://second.cz")
+        # Main seed has to be included
+        second.state = constants.SEED_STATE_EXCLUDE
+        second.save()
+        self.assertEqual(self.get_main_url(), "http://first.cz")
+        first.delete()
+        self.assertEqual(self.get_main_url(), "http://second.cz")
+
+    def test_listing_queries(self):
+        for i in range(3):
+            Seed.objects.create(source=self.source, url=f"http://{i}.cz")
+        sources = Source.objects.all()
+        with self.assertNumQueries(1):
+            [(s.url, s.stripped_main_url, s.wayback_url) for s in sources]
+        with self.assertNumQueries(2):
+            [s.main_seed for s in Source.objects.with_main_seed()]
+
+
+class ContractFilterTest(SourceTestCase):
+    """
+    Tests filtering of sources by their valid contracts
+    """
+
+    def setUp(self):
+        super().setUp()
+        publisher = Publisher.objects.create(name="P")
+        self.cc, self.other, self.none = [
+            self.create_source(name) for name in ("cc", "other", "none")]
+        cc_contract = Contract.objects.create(
+            publisher=publisher, state=contract_constants.CONTRACT_STATE_VALID,
+            creative_commons_type="CC BY", contract_number=64, year=2017)
+        cc_contract.sources.add(self.cc)
+        contract = Contract.objects.create(
+            publisher=publisher, state=contract_constants.CONTRACT_STATE_VALID,
+            contract_number=65, year=2017)
+        contract.sources.add(self.other)
+
+    def test_has_cc(self):
+        with self.assertNumQueries(1):
+            self.assertListEqual(list(Source.objects.has_cc()), [self.cc])
+        self.assertSetEqual(set(Source.objects.has_cc(False)),
+                            {self.other, self.none})
+        # Composes with other filters
+        self.assertFalse(
+            Source.objects.filter(name="other").has_cc().exists())
+
+    def test_contract_number(self):
+        self.assertListEqual(
+            list(Source.objects.contains_contract_number("65 / 2017")),
+            [self.other])
+        self.assertFalse(
+            Source.objects.contains_contract_number("65 / 2018").exists())
+        self.assertFalse(
+            Source.objects.contains_contract_number("invalid").exists())
+
+
+class ExportTest(SourceTestCase):
+    """
+    Tests the streamed full export of sources
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_source("=1+1", "http://first.cz", "http://second.cz",
+                           slug="source")
+        self.client.force_login(self.user)
+
+    def test_rows(self):
+        header, row = list(Source.export_all_sources())
+        row = dict(zip(header, row))
+        self.assertEqual(row["name"], "'=1+1")
+        self.assertEqual(row["owner__username"], "pedro")
+        self.assertIsNone(row["created"].tzinfo)
+        self.assertEqual(sorted(row["seed_urls"].split(",")),
+                         ["http://first.cz", "http://second.cz"])
+
+    def test_csv(self):
+        response = self.client.get(reverse('source:export'), {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("id,name,"))
+        self.assertIn("'=1+1", lines[1])
+
+    def test_xlsx(self):
+        response = self.client.get(reverse('source:export'))
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.values)
+        self.assertEqual(rows[0][:2], ("id", "name"))
+        self.assertEqual(rows[1][1], "'=1+1")
+
+
+class ManetStub(BaseHTTPRequestHandler):
+    """
+    Stands in for Manet, fails with 503 as many times as ``failures`` says
+    and always with 404 for the ``broken`` urls
+    """
+    failures = 0
+    broken = ()
+    color = 'red'
+
+    def do_GET(self):
+        url = parse_qs(urlsplit(self.path).query)['url'][0]
+        if url in ManetStub.broken:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if ManetStub.failures:
+            ManetStub.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.end_headers()
+        Image.new('RGB', (1366, 768), ManetStub.color).save(self.wfile, 'PNG')
+
+    def log_message(self, *args):
+        pass
+
+
+class ScreenshotTest(SourceTestCase):
+    """
+    Tests taking screenshots against a stub Manet server
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), ManetStub)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overridden = override_settings(
+            MEDIA_ROOT=media_root,
+            MANET_URL='http://127.0.0.1:{0}/'.format(self.server.server_port))
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+        for i in range(3):
+            self.create_source(f"S{i}", f"http://{i}.cz")
+
+    def test_take_screenshots(self):
+        ManetStub.failures = 1
+        self.assertEqual(take_screenshots(limit=2),
+                         {'new': 2, 'unchanged': 0, 'failed': 0})
+        # The rest is taken on the next run
+        self.assertEqual(take_screenshots(),
+                         {'new': 1, 'unchanged': 0, 'failed': 0})
+        self.assertEqual(take_screenshots()['new'], 0)
+        source = Source.objects.first()
+        self.assertTrue(os.path.exists(source.screenshot.path))
+
+        # Same image isn't written again
+        Source.objects.update(screenshot_date=None)
+        self.assertEqual(take_screenshots(),
+                         {'new': 0, 'unchanged': 3, 'failed': 0})
+        self.assertEqual(Source.objects.get(pk=source.pk).screenshot,
+                         source.screenshot)
+
+    def test_failing_sources_rotated(self):
+        ManetStub.broken = ("http://0.cz", "http://1.cz")
+        self.addCleanup(setattr, ManetStub, 'broken', ())
+        self.assertEqual(take_screenshots(limit=2),
+                         {'new': 0, 'unchanged': 0, 'failed': 2})
+        # Sources that failed are tried again after the others
+        self.assertEqual(take_screenshots(limit=2),
+                         {'new': 1, 'unchanged': 0, 'failed': 1})
+
+    def test_storage(self):
+        take_screenshots()
+        sources = list(Source.objects.all())
+        # Identical screenshots share the files
+        self.assertEqual(len(set(s.screenshot.name for s in sources)), 1)
+        source = sources[0]
+        with Image.open(os.path.join(
+                settings.MEDIA_ROOT, source.screenshot_medium_url[
+                    len(settings.MEDIA_URL):])) as medium:
+            self.assertEqual((medium.format, medium.size),
+                             ('WEBP', (660, 500)))
+        self.assertTrue(source.screenshot_thumb_url.endswith('_thumb.webp'))
+
+        # Missing derivatives (e.g. after a crash) are written again
+        thumb = os.path.join(settings.MEDIA_ROOT, source.screenshot_thumb_url[
+            len(settings.MEDIA_URL):])
+        os.remove(thumb)
+        Source.objects.filter(pk=source.pk).update(screenshot_date=None)
+        self.assertEqual(take_screenshots()['new'], 1)
+        self.assertTrue(os.path.exists(thumb))
+
+        # Files of the replaced screenshot are garbage collected
+        ManetStub.color = 'blue'
+        self.addCleanup(setattr, ManetStub, 'color', 'red')
+        Source.objects.exclude(pk=source.pk).update(screenshot_date=None)
+        take_screenshots()
+        call_command('clean_screenshots', min_age=0, stdout=StringIO())
+        self.assertTrue(os.path.exists(source.screenshot.path))
+        self.assertEqual(len(os.listdir(os.path.dirname(
+            source.screenshot.path))), 1 + len(constants.SCREENSHOT_SIZES))
+        Source.objects.update(screenshot_date=None)
+        take_screenshots()
+        call_command('clean_screenshots', min_age=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(source.screenshot.path))
+        for source in Source.objects.all():
+            self.assertTrue(os.path.exists(source.screenshot.path))
+
+
+class SeedUrlTest(SourceTestCase):
+    """
+    Tests canonical URLs and domains of seeds and lookups using them
+    """
+
+    def setUp(self):
+        super().setUp()
+        for url in ("https://www.example.cz/", "http://blog.example.cz/a/",
+                    "http://other.cz"):
+            self.create_source(url, url)
+
+    def test_canonical_url(self):
+        seed = Seed.objects.get(url="http://blog.example.cz/a/")
+        self.assertEqual(seed.canonical_url, "blog.example.cz/a")
+        self.assertEqual(seed.domain, "example.cz")
+
+    def test_with_seed_url(self):
+        def names(value):
+            return set(Source.objects.with_seed_url(value).values_list(
+                'name', flat=True))
+        self.assertEqual(names("http://example.cz"), {
+            "https://www.example.cz/", "http://blog.example.cz/a/"})
+        self.assertEqual(names("https://blog.example.cz"),
+                         {"http://blog.example.cz/a/"})
+        self.assertEqual(names("www.other.cz"), {"http://other.cz"})
+
+    def test_canonicalize_seeds(self):
+        Seed.objects.update(canonical_url='', domain=None)
+        call_command('canonicalize_seeds', stdout=StringIO())
+        self.assertEqual(
+            Seed.objects.get(url="https://www.example.cz/").canonical_url,
+            "example.cz")
+
+
+class AutocompleteTest(SourceTestCase):
+    """
+    Tests the autocomplete fallback used on databases without pg_trgm
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.create_source("Blog", "http://www.first.cz/")
+        self.create_source("News", "http://second.cz")
+
+    def get_results(self, q):
+        response = self.client.get(
+            reverse('source:source_autocomplete'), {'q': q})
+        return [r['text'] for r in response.json()['results']]
+
+    def test_search(self):
+        self.assertEqual(self.get_results("blo"), [])
+        self.client.force_login(self.user)
+        self.assertEqual(self.get_results("blo"), ["Blog"])
+        self.assertEqual(self.get_results("https://first.cz"), ["Blog"])
+        self.assertEqual(len(self.get_results("")), 2)
+
+    def test_cache(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.get_results("news"), ["News"])
+        Source.objects.filter(name="News").update(name="Newspaper")
+        self.assertEqual(self.get_results("news"), ["News"])
+        cache.clear()
+        self.assertEqual(self.get_results("news"), ["Newspaper"])
+
+
+class FakeWebsite(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/moved':
+            self.send_response(301)
+            self.send_header('Location', '/')
+        elif self.path == '/':
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class LivenessTest(SourceTestCase):
+    """
+    Tests checking seeds against a local fake website
+    """
+
+    def setUp(self):
+        super().setUp()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeWebsite)
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:{0}'.format(server.server_port)
+
+        self.alive, self.dead = [
+            self.create_source(name, state=constants.STATE_RUNNING)
+            for name in ('alive', 'dead')]
+        for source, path in ((self.alive, '/moved'), (self.alive, '/gone'),
+                             (self.dead, '/gone')):
+            Seed.objects.create(source=source, url=url + path)
+        # Nothing is listening there
+        Seed.objects.create(source=self.dead, url='http://127.0.0.1:9/')
+        self.url = url
+
+    def test_check_seeds(self):
+        out = StringIO()
+        call_command('check_seeds', delay=0, timeout=5, stdout=out)
+        moved = Seed.objects.get(url=self.url + '/moved')
+        self.assertEqual(moved.status_code, 200)
+        self.assertEqual(moved.redirect_url, self.url + '/')
+        self.assertIsNotNone(moved.latency)
+        self.assertIsNotNone(moved.last_checked)
+        self.assertEqual(
+            Seed.objects.get(url='http://127.0.0.1:9/').status_code, None)
+        self.assertEqual(moved.failed_checks, 0)
+        self.assertEqual(
+            Seed.objects.get(url='http://127.0.0.1:9/').failed_checks, 1)
+        # A single failed check can be a temporary outage
+        self.assertNotIn('Dead:', out.getvalue())
+
+        for _ in range(constants.LIVENESS_DEAD_AFTER - 2):
+            call_command('check_seeds', delay=0, set_dead=True, stdout=out)
+        self.assertFalse(Source.objects.get(pk=self.dead.pk).dead_source)
+
+        call_command('check_seeds', delay=0, stdout=out)
+        self.assertIn('Dead: {0} dead'.format(self.dead.pk), out.getvalue())
+        self.assertFalse(Source.objects.get(pk=self.dead.pk).dead_source)
+
+        call_command('check_seeds', delay=0, set_dead=True, stdout=out)
+        self.assertTrue(Source.objects.get(pk=self.dead.pk).dead_source)
+        self.assertFalse(Source.objects.get(pk=self.alive.pk).dead_source)
+
+    def test_failed_checks_reset(self):
+        Seed.objects.update(failed_checks=constants.LIVENESS_DEAD_AFTER)
+        LivenessChecker(delay=0).check(Seed.objects.all())
+        self.assertEqual(
+            Seed.objects.get(url=self.url + '/moved').failed_checks, 0)
+        self.assertEqual(
+            Seed.objects.get(url='http://127.0.0.1:9/').failed_checks,
+            constants.LIVENESS_DEAD_AFTER + 1)
+
+    def test_unchecked_seeds_count(self):
+        Seed.objects.update(failed_checks=constants.LIVENESS_DEAD_AFTER)
+        Seed.objects.filter(url=self.url + '/moved').update(failed_checks=0)
+        # The alive seed wasn't checked, e.g. because of --limit
+        seeds = Seed.objects.exclude(url=self.url + '/moved')
+        self.assertEqual([source.pk for source in get_dead_sources(seeds)],
+                         [self.dead.pk])
+
+    def test_dead_sources_logged(self):
+        Seed.objects.update(failed_checks=constants.LIVENESS_DEAD_AFTER - 1)
+        with self.assertLogs('source.liveness', 'WARNING') as logs:
+            check_seeds(delay=0, timeout=5)
+        self.assertEqual(logs.output, [
+            'WARNING:source.liveness:Found dead source {0}: dead'.format(
+                self.dead.pk)])
+
+    def test_politeness_delay(self):
+        checker = LivenessChecker(delay=0.2)
+        start = time.monotonic()
+        checker.check(Seed.objects.filter(url__startswith=self.url))
+        # Three requests to the same host
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+
+class SeedValidityTest(SourceTestCase):
+    """
+    Tests that the valid flag of seeds follows the validity rules
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.source = self.create_source(
+            "Source", state=constants.STATE_RUNNING)
+        self.today = timezone.localdate()
+        self.day = timedelta(days=1)
+
+    def create_seed(self, **kwargs):
+        return Seed.objects.create(
+            source=self.source, url=f"http://{Seed.objects.count()}.cz",
+            **kwargs)
+
+    def assertValid(self, seed, valid, today=None):
+        self.assertEqual(seed.is_valid(today), valid)
+        queryset = Seed.objects.filter(
+            Seed.get_valid_filter(today), pk=seed.pk)
+        self.assertEqual(queryset.exists(), valid)
+
+    def test_date_window(self):
+        no_end = self.create_seed(from_time=self.today + self.day)
+        inside = self.create_seed(
+            to_time=self.today - self.day, from_time=self.today + self.day)
+        ended = self.create_seed(
+            to_time=self.today - self.day, from_time=self.today - self.day)
+        self.assertValid(no_end, True)
+        self.assertValid(inside, True)
+        self.assertValid(ended, False)
+        self.assertValid(inside, False, today=self.today + 2 * self.day)
+        self.assertValid(ended, True, today=self.today - self.day)
+
+    def test_flag(self):
+        seed = self.create_seed(
+            to_time=self.today - self.day, from_time=self.today + self.day)
+        excluded = self.create_seed(state=constants.SEED_STATE_EXCLUDE)
+        self.assertEqual(list(Seed.objects.valid_seeds()), [seed])
+        self.assertEqual(list(Seed.objects.archiving()), [seed])
+
+        # Daily cron
+        self.assertEqual(
+            Seed.update_valid(today=self.today + 2 * self.day), 1)
+        self.assertFalse(Seed.objects.valid_seeds().exists())
+        update_valid_seeds()
+        self.assertEqual(list(Seed.objects.valid_seeds()), [seed])
+
+        # Sources are saved as inactive when they're deleted
+        self.source.active = False
+        self.source.save()
+        self.assertFalse(Seed.objects.valid_seeds().exists())
+        self.source.active = True
+        self.source.save()
+        excluded.state = constants.SEED_STATE_INCLUDE
+        excluded.save()
+        self.assertEqual(Seed.objects.valid_seeds().count(), 2)
+
+
+class DumpTest(SourceTestCase):
+    """
+    Tests the streamed dump of public seeds
+    """
+
+    def setUp(self):
+        super().setUp()
+        for name, state in (("public", constants.STATE_RUNNING),
+                            ("private", constants.STATE_VOTE)):
+            self.create_source(name, f"http://{name}.cz", state=state)
+
+    def test_dump(self):
+        response = self.client.get(reverse('source:dump'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content),
+                         b'http://public.cz\n')
+
+        response = self.client.get(
+            reverse('source:dump'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        # Not modified until a public seed changes
+        response = self.client.get(
+            reverse('source:dump'),
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        etag = response['ETag']
+        response = self.client.get(
+            reverse('source:dump'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Seed.objects.get(url="http://public.cz").delete()
+        response = self.client.get(
+            reverse('source:dump'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def assertModified(self, last_modified, modified=True):
+        response = self.client.get(
+            reverse('source:dump'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200 if modified else 304)
+
+    def test_modified_since(self):
+        # Last-Modified only has a precision of seconds
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Seed.objects.update(last_changed=hour_ago)
+        Source.objects.update(last_changed=hour_ago)
+        cache.delete(constants.DUMP_DELETED_CACHE_KEY)
+        last_modified = self.client.get(
+            reverse('source:dump'))['Last-Modified']
+        self.assertModified(last_modified, modified=False)
+
+        # Validity updated by the cron
+        Source.objects.filter(name="public").update(active=False)
+        Seed.update_valid()
+        self.assertModified(last_modified)
+
+        Seed.objects.update(last_changed=hour_ago)
+        Source._base_manager.update(last_changed=hour_ago)
+        self.assertModified(last_modified, modified=False)
+        Seed.objects.get(url="http://private.cz").delete()
+        self.assertModified(last_modified)
+
+
+class PublicSourceCountersTest(SourceTestCase):
+    """
+    Tests that numbers of public sources in categories follow changes of
+    the sources
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.other = Category.objects.create(name="O", slug="o")
+        self.sub_category = SubCategory.objects.create(
+            name="S", slug="s", category=self.category)
+
+    def create_source(self, name, state=constants.STATE_RUNNING, **kwargs):
+        return super().create_source(name, state=state, **kwargs)
+
+    def get_counts(self):
+        return [model.objects.get(pk=instance.pk).public_sources
+                for model, instance in ((Category, self.category),
+                                        (Category, self.other),
+                                        (SubCategory, self.sub_category))]
+
+    def test_counters(self):
+        source = self.create_source("a", sub_category=self.sub_category)
+        self.create_source("b")
+        private = self.create_source("c", state=constants.STATE_VOTE)
+        self.assertEqual(self.get_counts(), [2, 0, 1])
+        self.assertEqual(Category.get_public_sources_total(), 2)
+
+        source.category = self.other
+        source.sub_category = None
+        source.save()
+        self.assertEqual(self.get_counts(), [1, 1, 0])
+        # Saving again doesn't count the source twice
+        source.save()
+        self.assertEqual(self.get_counts(), [1, 1, 0])
+
+        source.active = False
+        source.save()
+        private.state = constants.STATE_RUNNING
+        private.save()
+        self.assertEqual(self.get_counts(), [2, 0, 0])
+
+        deleted = self.create_source("d")
+        self.assertEqual(self.get_counts(), [3, 0, 0])
+        VotingRound.objects.filter(source=deleted).delete()
+        deleted.delete()
+        self.assertEqual(self.get_counts(), [2, 0, 0])
+
+    def test_recount(self):
+        self.create_source("a", sub_category=self.sub_category)
+        Source.objects.update(category=self.other, sub_category=None)
+        self.assertEqual(self.get_counts(), [1, 0, 1])
+        self.assertEqual(recount_public_sources(), 3)
+        self.assertEqual(self.get_counts(), [0, 1, 0])
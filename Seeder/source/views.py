@@ -1,21 +1,29 @@
+import tempfile
+from hashlib import md5
+
 from django.urls import reverse
 from django.views import View
 from django.views.generic import DetailView
-from django.http.response import HttpResponseRedirect
+from django.http.response import (
+    HttpResponseRedirect, StreamingHttpResponse, FileResponse)
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic.base import TemplateView
 from django.views.generic.edit import FormView
-from django.db.models import Q
+from django.db.models import Q, Max, Count
 from django.contrib import messages
+from django.core.cache import cache
 
 from dal import autocomplete
 from formtools.wizard.views import SessionWizardView
 from datetime import datetime
+from openpyxl import Workbook
 
 from contracts.models import Contract
+from core.autocomplete import RankedAutocompleteView
 from core.generic_views import ObjectMixinFixed, MessageView
 from publishers import forms as publisher_forms
 from core import generic_views
+from core.utils import chunked_text, csv_lines, canonicalize_url
 from comments.views import CommentViewGeneric
 
 from . import forms, models, tables, field_filters, constants
@@ -132,7 +140,8 @@ class AddSource(generic_views.LoginMixin, SessionWizardView):
         source_data = self.get_cleaned_data_for_step('source')
         publisher_data = self.get_cleaned_data_for_step('create_publisher')
         filters = (Q(name__icontains=source_data['name']) |
-                   Q(seed__url=source_data['main_url']))
+                   Q(seed__canonical_url=canonicalize_url(
+                       source_data['main_url'])))
         if publisher_data:
             filters |= Q(publisher__name__icontains=publisher_data['name'])
 
@@ -260,30 +269,38 @@ class SourceList(SourceView, generic_views.FilteredListView):
 
 
 class SourceExportAll(SourceView, View):
+    # Rows are kept in memory until the spooled XLSX exceeds this many bytes
+    spool_size = 10 * 1024 * 1024
+
     def get(self, request):
-        """ Download all sources in an XLSX file """
-        from .models import Source
-        from django.http import HttpResponse
-        df = Source.export_all_sources()
-        # Export the DF straight into a downloading response
-        filename = f"sources_{datetime.now():%Y-%m-%d}.xlsx"
-        response = HttpResponse(
+        """ Download all sources in an XLSX or CSV (?format=csv) file """
+        rows = models.Source.export_all_sources()
+        filename = f"sources_{datetime.now():%Y-%m-%d}"
+        if request.GET.get("format") == "csv":
+            response = StreamingHttpResponse(
+                chunked_text(csv_lines(rows)), content_type="text/csv")
+            response["Content-Disposition"] = (
+                f"attachment; filename={filename}.csv")
+            return response
+
+        # Write-only workbook only keeps the row being written, the finished
+        # file is spooled to disk once it gets large
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        for row in rows:
+            sheet.append(row)
+        spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        workbook.save(spooled)
+        spooled.seek(0)
+        return FileResponse(
+            spooled, as_attachment=True, filename=f"{filename}.xlsx",
             content_type=("application/vnd.openxmlformats-officedocument."
                           "spreadsheetml.sheet"))
-        response["Content-Disposition"] = f"attachment; filename={filename}"
-        df.to_excel(response, index=False, engine="openpyxl")
-        return response
 
 
-class CategoryAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return models.Category.objects.none()
-
-        qs = models.Category.objects.all()
-        if self.q:
-            qs = qs.filter(name__icontains=self.q)
-        return qs.distinct()
+class CategoryAutocomplete(RankedAutocompleteView):
+    model = models.Category
+    search_fields = ('name',)
 
 
 class SubcategoryAutocomplete(autocomplete.Select2QuerySetView):
@@ -301,52 +318,59 @@ class SubcategoryAutocomplete(autocomplete.Select2QuerySetView):
         return qs.distinct()
 
 
-class SourceAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return models.Source.objects.none()
-
-        qs = models.Source.objects.all()
-        if self.q:
-            qs = qs.filter(
-                Q(name__icontains=self.q) |
-                Q(seed__url__icontains=self.q)
-            )
-        return qs.distinct()
-
-
-class SourcePublicAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return models.Source.objects.none()
+class SourceAutocomplete(RankedAutocompleteView):
+    model = models.Source
+    search_fields = ('name',)
 
-        qs = models.Source.objects.archiving()
-        if self.q:
-            qs = qs.filter(
-                Q(name__icontains=self.q) |
-                Q(seed__url__icontains=self.q)
-            )
-        return qs.distinct()
+    def get_search_filter(self):
+        # Subquery instead of a join, so no distinct is needed
+        seeds = models.Seed.objects.filter(
+            canonical_url__icontains=canonicalize_url(self.q))
+        return (super().get_search_filter() |
+                Q(pk__in=seeds.values('source_id')))
 
 
-class KeywordAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return models.KeyWord.objects.none()
+class SourcePublicAutocomplete(SourceAutocomplete):
+    def get_base_queryset(self):
+        return models.Source.objects.archiving()
 
-        qs = models.KeyWord.objects.all()
-        if self.q:
-            qs = qs.filter(word__icontains=self.q)
-        return qs.distinct()
 
+class KeywordAutocomplete(RankedAutocompleteView):
+    model = models.KeyWord
+    search_fields = ('word',)
 
-class SourceDump(TemplateView):
-    template_name = 'dump.txt'
 
-    content_type = 'text/text'
+class SourceDump(generic_views.ConditionalStreamingMixin, TemplateView):
+    """
+    Public seeds as plain text, one per line. Seeds are streamed from a
+    server-side cursor and mirrors polling the dump get 304 Not Modified until
+    a seed or source changes or is deleted.
+    """
 
     def get_context_data(self, **kwargs):
         c = super().get_context_data(**kwargs)
-        c['urls'] = models.Seed.objects.public_seeds(
-        ).all().values_list('url', flat=True)
+        seeds = models.Seed.objects.public_seeds()
+        c['urls'] = seeds.order_by('pk').values_list('url', flat=True)
+        # Count changes when seeds are deleted or stop being public
+        c['changes'] = seeds.order_by().aggregate(
+            seed=Max('last_changed'), source=Max('source__last_changed'),
+            count=Count('pk'))
+        # Seeds stop being public by changes of any rows, not just public ones
+        c['last_modified'] = [
+            model._base_manager.aggregate(
+                last_changed=Max('last_changed'))['last_changed']
+            for model in (models.Seed, models.Source)
+        ] + [cache.get(constants.DUMP_DELETED_CACHE_KEY)]
         return c
+
+    def get_last_modified(self, context):
+        return max((d for d in context['last_modified'] if d is not None),
+                   default=None)
+
+    def get_etag(self, context):
+        changes = '{seed}|{source}|{count}'.format(**context['changes'])
+        return md5(changes.encode()).hexdigest()
+
+    def get_streaming_content(self, context):
+        return ('{0}\n'.format(url)
+                for url in context['urls'].iterator(chunk_size=2000))
@@ -0,0 +1,137 @@
+"""
+Cache of the public pages
+
+Cached responses and fragments depend on groups of data, e.g. all public
+sources of a category. Every group has a version token that's part of the
+cache keys, so invalidating a group only means changing its token; the
+entries that used the old one are never read again and simply expire.
+
+Groups:
+    source_list             listings of all public sources
+    category_counts         numbers of public sources in (sub)categories
+    category:<slug>         public sources of a category
+    subcategory:<slug>      public sources of a subcategory
+    keyword:<slug>          public sources with a keyword
+    topic_collections       the list of topic collections
+    news                    the news on the index page
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+
+PREFIX = 'www'
+
+# Names of everything that's cached, hit & miss counters are kept for these
+CACHED = set()
+
+
+def register(name):
+    CACHED.add(name)
+    return name
+
+
+def _version_key(group):
+    return f'{PREFIX}:version:{group}'
+
+
+def get_versions(groups):
+    """ :return: list of current version tokens of ``groups`` """
+    keys = [_version_key(group) for group in groups]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Evicted or never invalidated; a new token can't match any
+            # older entry
+            cache.add(key, uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*groups):
+    cache.set_many({_version_key(group): uuid4().hex for group in groups},
+                   None)
+
+
+def _count(name, result):
+    key = f'{PREFIX}:stats:{name}:{result}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counters don't expire, they're reset by the stats command
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_stats():
+    """ :return: {name: (hits, misses)} """
+    keys = {name: (f'{PREFIX}:stats:{name}:hit', f'{PREFIX}:stats:{name}:miss')
+            for name in sorted(CACHED)}
+    counts = cache.get_many([key for pair in keys.values() for key in pair])
+    return {name: (counts.get(hit, 0), counts.get(miss, 0))
+            for name, (hit, miss) in keys.items()}
+
+
+def reset_stats():
+    cache.delete_many([f'{PREFIX}:stats:{name}:{result}'
+                       for name in CACHED for result in ('hit', 'miss')])
+
+
+def make_key(name, groups, *parts):
+    """ Key of a cached entry, changes with the language and the groups """
+    return ':'.join(map(str, [
+        PREFIX, name, translation.get_language(), *parts,
+        *get_versions(groups),
+    ]))
+
+
+def get_or_set(name, groups, compute, *parts, timeout=None):
+    """
+    Cached result of ``compute()``, e.g. the context of a template fragment
+    """
+    key = make_key(name, groups, *parts)
+    value = cache.get(key)
+    _count(name, 'miss' if value is None else 'hit')
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout or settings.WWW_CACHE_TIMEOUT)
+    return value
+
+
+class CachedResponseMixin:
+    """
+    Caches whole responses of anonymous users, keyed on the language, the
+    full path (page & filters) and the list type of the session
+    """
+    cache_groups = ()
+    cache_timeout = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        register(cls.__name__)
+
+    def get_cache_groups(self):
+        return self.cache_groups
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        name = type(self).__name__
+        key = make_key(name, self.get_cache_groups(), request.get_full_path(),
+                       request.session.get('list_type'))
+        response = cache.get(key)
+        _count(name, 'miss' if response is None else 'hit')
+        if response is not None:
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = self.cache_timeout or settings.WWW_CACHE_TIMEOUT
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(
+                    lambda r: cache.set(key, r, timeout))
+            else:
+                cache.set(key, response, timeout)
+        return response
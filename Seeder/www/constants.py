@@ -1,31 +1,5 @@
-''' Key is upper letter, value is upper regex to match it + diacritics '''
-ALPHABET_SEARCH_CONVERSION = {
-    '#': r'[^A-ZÁČĎÉĚÍŇÓŘŠŤÚŮÝŽ]',  # a bit hacky without using Unicode regex
-    'A': r'[AÁ]',
-    'B': r'B',
-    'C': r'[CČ]',
-    'D': r'[DĎ]',
-    'E': r'[EÉĚ]',
-    'F': r'F',
-    'G': r'G',
-    'H': r'H',
-    'CH': r'CH',
-    'I': r'[IÍ]',
-    'J': r'J',
-    'K': r'K',
-    'L': r'L',
-    'M': r'M',
-    'N': r'[NŇ]',
-    'O': r'[OÓ]',
-    'P': r'P',
-    'Q': r'Q',
-    'R': r'[RŘ]',
-    'S': r'[SŠ]',
-    'T': r'[TŤ]',
-    'U': r'[UÚŮ]',
-    'V': r'V',
-    'W': r'W',
-    'X': r'X',
-    'Y': r'[YÝ]',
-    'Z': r'[ZŽ]',
-}
+# Letters of the alphabetical source browser, see Source.name_initial
+ALPHABET = (
+    '#', 'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'CH', 'I', 'J', 'K', 'L', 'M',
+    'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X', 'Y', 'Z',
+)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from www import cache as www_cache
+# Cached views and fragments are registered when the views are imported
+from www import views  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = ("Print hit & miss counts of the cached public pages and "
+            "fragments, for tuning WWW_CACHE_TIMEOUT. Use --reset to start "
+            "counting again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help="Reset the counters after printing them",
+        )
+
+    def handle(self, *args, **options):
+        total_hits = total = 0
+        for name, (hits, misses) in www_cache.get_stats().items():
+            requests = hits + misses
+            self.stdout.write('{0}: {1} hits, {2} misses ({3:.0%})'.format(
+                name, hits, misses, hits / requests if requests else 0))
+            total_hits += hits
+            total += requests
+        if options['reset']:
+            www_cache.reset_stats()
+        self.stdout.write(self.style.SUCCESS('{0}/{1} requests cached'.format(
+            total_hits, total)))
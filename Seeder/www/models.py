@@ -3,6 +3,10 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import (
+    post_save, pre_delete, post_delete, m2m_changed,
+)
+from django.dispatch import receiver
 from django.utils import timezone, dateparse
 from django.utils.translation import ugettext_lazy as _
 from django.utils.text import slugify
@@ -13,7 +17,13 @@ from ckeditor.fields import RichTextField
 
 from core.models import BaseModel, DatePickerField
 from core.utils import get_wayback_url
-from source.models import Source
+from harvests.models import ExternalTopicCollection
+from source.constants import PUBLIC_STATES
+from source.models import (
+    Source, Seed, Category, SubCategory, KeyWord, get_counted_categories,
+)
+
+from . import cache as www_cache
 
 
 @revisions.register(exclude=('last_changed',))
@@ -252,3 +262,115 @@ class ExtinctWebsite(BaseModel):
         # Delete all current objects, bulk_create new ones
         cls.objects.all().delete()
         return cls.objects.bulk_create(new_objects)
+
+
+def get_source_groups(category_id, sub_category_id):
+    """ :return: cache groups of public pages listing a Source """
+    groups = ['source_list']
+    if category_id:
+        groups += [f'category:{slug}' for slug in Category.objects.filter(
+            pk=category_id).values_list('slug', flat=True)]
+    if sub_category_id:
+        for slug, category_slug in SubCategory.objects.filter(
+                pk=sub_category_id).values_list('slug', 'category__slug'):
+            groups += [f'subcategory:{slug}', f'category:{category_slug}']
+    return groups
+
+
+def get_keyword_groups(keywords):
+    return [f'keyword:{slug}'
+            for slug in keywords.values_list('slug', flat=True)]
+
+
+@receiver(post_save, sender=Source)
+def invalidate_saved_source(sender, instance, **kwargs):
+    """
+    Only changes of public Sources (or Sources that were public) show on the
+    public pages. Counts of categories change when a Source is published,
+    hidden or moved. Categories where the Source was listed before saving
+    are remembered by remember_counted_categories.
+    """
+    old = getattr(instance, '_counted_categories', None)
+    new = get_counted_categories(instance)
+    if old is None and new is None:
+        return
+    groups = get_keyword_groups(instance.keywords.all())
+    for categories in (old, new):
+        if categories is not None:
+            groups += get_source_groups(*categories)
+    if old != new:
+        groups.append('category_counts')
+    www_cache.invalidate(*set(groups))
+
+
+@receiver(pre_delete, sender=Source)
+def invalidate_deleted_source(sender, instance, **kwargs):
+    categories = get_counted_categories(instance)
+    if categories is not None:
+        www_cache.invalidate(
+            'category_counts',
+            *get_source_groups(*categories),
+            *get_keyword_groups(instance.keywords.all()),
+        )
+
+
+@receiver(m2m_changed, sender=Source.keywords.through)
+def invalidate_source_keywords(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    # Keywords are gone after clearing, so they're collected before
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        sources = instance.source_set.all()
+        if pk_set is not None:
+            sources = sources.filter(pk__in=pk_set)
+        if sources.filter(state__in=PUBLIC_STATES).exists():
+            www_cache.invalidate(f'keyword:{instance.slug}')
+    elif instance.state in PUBLIC_STATES:
+        keywords = instance.keywords.all()
+        if pk_set is not None:
+            keywords = KeyWord.objects.filter(pk__in=pk_set)
+        www_cache.invalidate(*get_keyword_groups(keywords))
+
+
+@receiver(post_save, sender=Seed)
+@receiver(post_delete, sender=Seed)
+def invalidate_seed(sender, instance, **kwargs):
+    """ Lists of sources link to their main seeds """
+    source = Source._base_manager.filter(pk=instance.source_id).first()
+    categories = source and get_counted_categories(source)
+    if categories is not None:
+        www_cache.invalidate(
+            *get_source_groups(*categories),
+            *get_keyword_groups(source.keywords.all()),
+        )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    www_cache.invalidate('category_counts', f'category:{instance.slug}')
+
+
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_sub_category(sender, instance, **kwargs):
+    www_cache.invalidate('category_counts', f'subcategory:{instance.slug}')
+
+
+@receiver(post_save, sender=KeyWord)
+@receiver(post_delete, sender=KeyWord)
+def invalidate_keyword(sender, instance, **kwargs):
+    www_cache.invalidate(f'keyword:{instance.slug}')
+
+
+@receiver(post_save, sender=ExternalTopicCollection)
+@receiver(post_delete, sender=ExternalTopicCollection)
+def invalidate_topic_collections(sender, instance, **kwargs):
+    www_cache.invalidate('topic_collections')
+
+
+@receiver(post_save, sender=NewsObject)
+@receiver(post_delete, sender=NewsObject)
+def invalidate_news(sender, instance, **kwargs):
+    www_cache.invalidate('news')
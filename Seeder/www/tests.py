@@ -1,8 +1,15 @@
 from datetime import date
+from io import StringIO
+from unittest import mock
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models.functions import Lower
 from django.test import TestCase, Client
 from django.utils.translation import activate
 from django.urls import reverse
+from django.utils.text import slugify
 from django.urls.resolvers import URLPattern, URLResolver
 from django.urls.exceptions import NoReverseMatch
 from www.urls import urlpatterns as urls_www
@@ -18,6 +25,9 @@ from blacklists.models import Blacklist
 from contracts.models import Contract
 from qa.models import QualityAssuranceCheck
 from www.models import NewsObject
+from www import cache as www_cache
+from paginator.paginator import KeysetPaginator
+from source.testing import SourceTestCase
 from voting.models import VotingRound
 
 DATE = date.today()
@@ -208,3 +218,261 @@ class SeederUrlsTest(TestCase):
 
     def test_cs_seeder_urls(self):
         self.a.access_urls(self.url_names, self.url_kwargs, 'cs', admin=True)
+
+
+class PublicCacheTest(SourceTestCase):
+    """
+    Tests that public pages are cached and only changes of the data they show
+    invalidate them
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.keyword = KeyWord.objects.create(word="K", slug="k")
+        self.public, self.hidden = [
+            self.create_source(name, f'http://{name}.cz', state=state)
+            for name, state in (
+                ('public', source_constants.STATE_RUNNING),
+                ('hidden', source_constants.STATE_VOTE),
+            )]
+        self.public.keywords.add(self.keyword)
+        activate('en')
+        self.category_url = reverse('www:category_detail',
+                                    kwargs={'slug': 'c'})
+        self.keyword_url = reverse('www:keyword', kwargs={'slug': 'k'})
+        www_cache.reset_stats()
+
+    def get(self, url):
+        return self.client.get(url).content.decode()
+
+    def get_stats(self, name):
+        return www_cache.get_stats()[name]
+
+    def test_hit(self):
+        self.get(self.category_url)
+        self.get(self.category_url)
+        self.get(self.category_url + '?page=2')
+        self.assertEqual(self.get_stats('CategoryDetail'), (1, 2))
+
+    def test_logged_in(self):
+        self.client.login(username='pedro', password='password')
+        self.get(self.category_url)
+        self.get(self.category_url)
+        self.assertEqual(self.get_stats('CategoryDetail'), (0, 0))
+        # Counts of categories are still cached
+        self.assertEqual(self.get_stats('categories'), (1, 1))
+
+    def test_invalidation(self):
+        self.assertIn('public', self.get(self.category_url))
+        self.get(self.keyword_url)
+
+        # Sources that aren't public don't invalidate anything
+        self.hidden.name = 'Renamed hidden'
+        self.hidden.save()
+        self.get(self.category_url)
+        self.assertEqual(self.get_stats('CategoryDetail'), (1, 1))
+
+        self.public.name = 'Renamed public'
+        self.public.save()
+        self.assertIn('Renamed public', self.get(self.category_url))
+        self.assertIn('Renamed public', self.get(self.keyword_url))
+        self.assertEqual(self.get_stats('CategoryDetail'), (1, 2))
+        self.assertEqual(self.get_stats('KeywordViews'), (0, 2))
+
+        self.public.keywords.remove(self.keyword)
+        self.assertNotIn('Renamed public', self.get(self.keyword_url))
+
+        self.hidden.state = source_constants.STATE_RUNNING
+        self.hidden.save()
+        self.assertIn('Renamed hidden', self.get(self.category_url))
+
+
+class KeysetPaginatorTest(SourceTestCase):
+    """
+    Tests that pages sought using cursors are the same as with OFFSET
+    """
+    superuser = True
+
+    def setUp(self):
+        super().setUp()
+        # Duplicate names so that the primary key breaks ties
+        for i in range(23):
+            self.create_source(f"S{i % 7}", slug=f"s{i}")
+
+    def get_pages(self, queryset, per_page=5, orphans=0):
+        keyset_paginator = KeysetPaginator(queryset, per_page)
+        if keyset_paginator.ordering:
+            # With the primary key breaking ties as well
+            queryset = keyset_paginator.get_ordered_queryset()
+        paginator = Paginator(queryset, per_page, orphans=orphans)
+        return [list(paginator.page(n)) for n in paginator.page_range]
+
+    def assert_pages(self, queryset, **kwargs):
+        expected = self.get_pages(queryset, **kwargs)
+        for start in range(1, len(expected) + 1):
+            cursor = KeysetPaginator(queryset, 5, **kwargs).page(start).cursor
+            for number, page in enumerate(expected, 1):
+                paginator = KeysetPaginator(queryset, 5, cursor=cursor,
+                                            **kwargs)
+                self.assertEqual(list(paginator.page(number)), page)
+                self.assertEqual(paginator.num_pages, len(expected))
+
+    def test_pages(self):
+        self.assert_pages(Source.objects.all())
+        self.assert_pages(Source.objects.order_by('-name', '-pk'))
+        self.assert_pages(Source.objects.all().reverse(), orphans=3)
+
+    def test_fallback(self):
+        # Expressions can't be sought, OFFSET is used
+        queryset = Source.objects.order_by(Lower('name'), 'pk')
+        paginator = KeysetPaginator(queryset, 5)
+        self.assertIsNone(paginator.ordering)
+        self.assertIsNone(paginator.page(2).cursor)
+        self.assertEqual(list(paginator.page(2)),
+                         self.get_pages(queryset)[1])
+
+    def test_invalid_cursor(self):
+        queryset = Source.objects.all()
+        cursor = KeysetPaginator(queryset, 5).page(2).cursor
+        for invalid in ('nonsense', cursor[:-4]):
+            paginator = KeysetPaginator(queryset, 5, cursor=invalid)
+            self.assertEqual(list(paginator.page(3)),
+                             self.get_pages(queryset)[2])
+        # Cursor of a different ordering is ignored
+        paginator = KeysetPaginator(queryset.order_by('-name'), 5,
+                                    cursor=cursor)
+        self.assertIsNone(paginator.decode_cursor())
+
+    def test_approximate_count(self):
+        queryset = Source.objects.all()
+        expected = self.get_pages(queryset)
+        with mock.patch('paginator.paginator.estimate_count',
+                        return_value=100):
+            # Counted exactly up to the limit
+            paginator = KeysetPaginator(queryset, 5)
+            self.assertEqual(paginator.count, 23)
+            self.assertFalse(paginator.approximate)
+
+        limit = mock.patch.object(KeysetPaginator, 'exact_count_limit', 10)
+        limit.start()
+        self.addCleanup(limit.stop)
+        # Estimates too low and too high
+        for estimate in (12, 100):
+            with mock.patch('paginator.paginator.estimate_count',
+                            return_value=estimate):
+                pages, number, cursor = [], 1, None
+                while True:
+                    paginator = KeysetPaginator(queryset, 5, cursor=cursor)
+                    page = paginator.page(number)
+                    pages.append(list(page))
+                    if not page.has_next():
+                        break
+                    number, cursor = page.next_page_number(), page.cursor
+                self.assertEqual(pages, expected)
+                self.assertEqual(paginator.num_pages, len(expected))
+
+        # The last page by the estimate is past the end
+        with mock.patch('paginator.paginator.estimate_count',
+                        return_value=100):
+            paginator = KeysetPaginator(queryset, 5)
+            with self.assertRaises(EmptyPage):
+                paginator.page(paginator.num_pages)
+            self.assertEqual(list(paginator.page(paginator.num_pages)),
+                             expected[-1])
+
+    def test_table(self):
+        self.client.force_login(self.user)
+        names = []
+        url = reverse('source:list')
+        while url:
+            table = self.client.get(url).context['table']
+            names += [row.record.name for row in table.page.object_list]
+            self.assertTrue(table.page.cursor)
+            url = table.page.has_next() and '{0}?page={1}&cursor={2}'.format(
+                reverse('source:list'), table.page.next_page_number(),
+                table.page.cursor)
+        self.assertEqual(names, [
+            s.name for s in Source.objects.order_by('-created', 'pk')])
+
+
+class AlphabetTest(SourceTestCase):
+    """
+    Tests the alphabetical browser of public sources
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for name in ("Čtenář", "chata", "Cesta", " Ärzte", "2000", "Zoo"):
+            self.create_source(name, f'http://{slugify(name)}.cz',
+                               state=source_constants.STATE_RUNNING)
+        activate('en')
+
+    def test_name_initial(self):
+        self.assertEqual(
+            dict(Source.objects.values_list('name', 'name_initial')),
+            {"Čtenář": 'C', "chata": 'CH', "Cesta": 'C', " Ärzte": 'A',
+             "2000": '#', "Zoo": 'Z'})
+        Source.objects.update(name_initial='#')
+        call_command('fill_name_initials', stdout=StringIO())
+        self.assertEqual(Source.objects.filter(name_initial='C').count(), 2)
+
+    def get_context(self, **params):
+        return self.client.get(reverse('www:categories'), params).context
+
+    def test_browser(self):
+        self.assertEqual(self.get_context()['startswith_options'], [
+            ('#', 1), ('A', 1), ('C', 2), ('CH', 1), ('Z', 1)])
+        sources = self.get_context(startswith='C')['sources']
+        self.assertEqual([s.name for s in sources], ["Cesta", "Čtenář"])
+        sources = self.get_context(startswith='unknown')['sources']
+        self.assertEqual(len(sources), 6)
+
+
+class TopicCollectionDetailTest(SourceTestCase):
+    """
+    Tests the sources and custom seeds of a topic collection on the web
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.collection = ExternalTopicCollection.objects.create(
+            title_cs="tc", title_en="tc", owner=self.user, annotation="",
+            active=True)
+        # Saved in pre_save, so objects.create would insert it twice
+        self.internal = TopicCollection(
+            title_cs="tc_int", title_en="tc_int", owner=self.user,
+            annotation="", all_open=True, external_collection=self.collection,
+            custom_seeds="http://b.cz\nhttp://a.cz\nhttp://b.cz")
+        self.internal.save()
+        other = TopicCollection(
+            title_cs="tc_other", title_en="tc_other", owner=self.user,
+            annotation="", custom_seeds="", all_open=True,
+            external_collection=self.collection)
+        other.save()
+        for name, state in (("A hidden", source_constants.STATE_VOTE),
+                            ("B public", source_constants.STATE_RUNNING),
+                            ("C public", source_constants.STATE_RUNNING)):
+            source = self.create_source(
+                name, f'http://{slugify(name)}.cz', state=state)
+            # In both collections, but listed once
+            self.internal.custom_sources.add(source)
+            other.custom_sources.add(source)
+        activate('en')
+        self.url = reverse('www:collection_detail',
+                           kwargs={'slug': self.collection.slug})
+
+    def test_detail(self):
+        context = self.client.get(self.url).context
+        self.assertEqual([s.name for s in context['source_paginator']],
+                         ["B public", "C public", "A hidden"])
+        self.assertEqual([s['url'] for s in context['custom_seeds']],
+                         ["http://b.cz", "http://a.cz"])
+
+        self.internal.custom_seeds = "http://c.cz"
+        self.internal.save()
+        context = self.client.get(self.url).context
+        self.assertEqual([s['name'] for s in context['custom_seeds']],
+                         ["c.cz"])
@@ -1,7 +1,6 @@
 import re
 import pandas as pd
 from typing import Any
-from urllib.parse import urlparse
 from datetime import date
 
 from django.core.mail import send_mail
@@ -12,7 +11,8 @@ from django.views.generic.base import TemplateView, View
 from django.views.generic.detail import DetailView
 from django.http.response import HttpResponse, HttpResponseRedirect, Http404
 from django.utils.translation import ugettext as _
-from django.db.models import Sum, When, Case, IntegerField, Q, Min, Max, Count
+from django.db.models import (
+    When, Case, IntegerField, Q, Min, Max, Count)
 from django.db.models.functions import TruncDay
 from django.core.paginator import EmptyPage
 from django.urls import reverse
@@ -25,19 +25,24 @@ from settings.base import WAYBACK_URL
 from source.models import Source, Category, SubCategory, KeyWord
 from source.constants import PUBLIC_STATES
 from harvests.models import ExternalTopicCollection
-from paginator.paginator import CustomPaginator
+from paginator.paginator import CustomPaginator, KeysetPaginator
 from www.forms import NominationForm
 from www.models import Nomination, SearchLog
 from django_tables2.views import MultiTableMixin
 
 from . import models
 from .models import ExtinctWebsite as EW
+from . import cache as www_cache
 from . import forms
 from . import constants
 from .tables import ExtinctWebsitesTable
 
 ITEMS_PER_PAGE = 12
 
+CATEGORIES_FRAGMENT = www_cache.register('categories')
+CATEGORY_DETAIL_FRAGMENT = www_cache.register('category_detail')
+INITIALS_FRAGMENT = www_cache.register('initials')
+
 
 class PaginatedView:
     per_page = ITEMS_PER_PAGE
@@ -49,23 +54,25 @@ class PaginatedView:
             return 1
 
     def get_paginator(self):
-        paginator = CustomPaginator(
+        paginator = KeysetPaginator(
             self.get_paginator_queryset(),
-            self.per_page)
+            self.per_page,
+            cursor=self.request.GET.get('cursor'))
         page = self.get_page_num()
         try:
             sources = paginator.page(page)
         except EmptyPage:
-            sources = paginator.page(1)
+            sources = paginator.page(paginator.num_pages)
         return sources
 
     def get_paginator_queryset(self):
         raise NotImplementedError
 
 
-class Index(TemplateView):
+class Index(www_cache.CachedResponseMixin, TemplateView):
     template_name = 'index.html'
     view_name = 'index'
+    cache_groups = ['source_list', 'news']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -79,10 +86,12 @@ class Index(TemplateView):
         return context
 
 
-class TopicCollections(PaginatedView, TemplateView):
+class TopicCollections(www_cache.CachedResponseMixin, PaginatedView,
+                       TemplateView):
     template_name = 'topic_collections/list.html'
     view_name = 'topic_collections'
     sub_view_name = 'topic_collections'
+    cache_groups = ['topic_collections']
 
     def get_queryset(self):
         qs = super(TopicCollections, self).get_queryset()
@@ -110,16 +119,16 @@ class TopicCollectionDetail(PaginatedView, DetailView):
         return qs.filter(active=True)
 
     def get_paginator_queryset(self):
-        qs = self.get_object().custom_sources
-        # Manually first select the PUBLIC sources and then everything else
-        pks = list(
-            qs.filter(state__in=PUBLIC_STATES).values_list("pk", flat=True))
-        pks += list(
-            qs.exclude(state__in=PUBLIC_STATES).values_list("pk", flat=True))
-        # In order to return a real QS, must do some Case-When magic
-        preserved = Case(
-            *[When(pk=pk, then=pos) for pos, pk in enumerate(pks)])
-        return qs.filter(pk__in=pks).order_by(preserved)
+        # Public sources first, deduplicated by the subquery as a source can
+        # be in several internal collections
+        return Source.objects.filter(
+            pk__in=self.object.custom_sources.values('pk'),
+        ).annotate(
+            public_order=Case(
+                When(state__in=PUBLIC_STATES, then=0),
+                default=1, output_field=IntegerField(),
+            ),
+        ).order_by('public_order', 'name', 'pk')
 
     def get_context_data(self, **kwargs):
         """
@@ -129,14 +138,7 @@ class TopicCollectionDetail(PaginatedView, DetailView):
         so we need to decide which paginator is longer and use that for range
         """
         context = super().get_context_data(**kwargs)
-        custom_seeds = [
-            {
-                'name': urlparse(url).netloc,
-                'url': url,
-                'wayback_url': get_wayback_url(url)
-            }
-            for url in set(self.get_object().custom_seeds.split())
-        ]
+        custom_seeds = self.object.get_custom_seeds()
 
         page = self.get_page_num()
         source_paginator = CustomPaginator(
@@ -245,46 +247,33 @@ class CategoryBaseView(PaginatedView):
     view_name = 'categories'
 
     def get_categories_context(self):
-        return {
-            'sources_total': Source.objects.public().count(),
-            'categories': Category.objects.all().annotate(
-                num_sources=Sum(
-                    Case(
-                        When(source__state__in=PUBLIC_STATES, then=1),
-                        default=0, output_field=IntegerField()
-                    )
-                )
-            ).filter(num_sources__gt=0)
-        }
+        # Counts are shared by all category pages, logged in users included
+        return www_cache.get_or_set(
+            CATEGORIES_FRAGMENT, ['category_counts'], lambda: {
+                'sources_total': Category.get_public_sources_total(),
+                'categories': list(Category.objects.filter(
+                    public_sources__gt=0)),
+            })
 
     def get_categories_detail_context(self, category):
-        sub_categories = SubCategory.objects.filter(category=category)\
-            .annotate(
-                num_sources=Sum(
-                    Case(
-                        When(source__state__in=PUBLIC_STATES, then=1),
-                        default=0, output_field=IntegerField()
-                    )
-                ))\
-            .filter(num_sources__gt=0)
-
-        return {
-            'sub_categories': sub_categories,
-            'cat_sources_total': category.source_set.filter(
-                state__in=PUBLIC_STATES
-            ).count(),
-        }
+        return www_cache.get_or_set(
+            CATEGORY_DETAIL_FRAGMENT, ['category_counts'], lambda: {
+                'sub_categories': list(SubCategory.objects.filter(
+                    category=category, public_sources__gt=0)),
+                'cat_sources_total': category.public_sources,
+            }, category.pk)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update(self.get_categories_context())
         context['sources'] = self.get_paginator()
-        context['startswith_options'] = \
-            constants.ALPHABET_SEARCH_CONVERSION.keys()
         return context
 
 
-class Categories(CategoryBaseView, TemplateView):
+class Categories(www_cache.CachedResponseMixin, CategoryBaseView,
+                 TemplateView):
+    cache_groups = ['source_list', 'category_counts']
+
     def get_current_startswith(self):
         # Get the "startswith" URL parameter if present
         try:
@@ -294,22 +283,37 @@ class Categories(CategoryBaseView, TemplateView):
 
     def get_paginator_queryset(self):
         startswith = self.get_current_startswith()
-        # Filter by "startswith" if exists using a regex conversion chart
-        if startswith is not None:
-            startre = constants.ALPHABET_SEARCH_CONVERSION.get(startswith, '.')
-            return Source.objects.public().filter(
-                name__iregex=rf'^{startre}.*$')
+        # Filter by "startswith" if it's a letter of the alphabet
+        if startswith in constants.ALPHABET:
+            return Source.objects.public().filter(name_initial=startswith)
         return Source.objects.public()
 
+    def get_startswith_options(self):
+        """ :return: list of (letter, number of public sources) """
+        def compute():
+            counts = dict(Source.objects.public().order_by().values_list(
+                'name_initial').annotate(count=Count('pk')))
+            # Letters without sources are hidden
+            return [(letter, counts[letter])
+                    for letter in constants.ALPHABET if counts.get(letter)]
+
+        return www_cache.get_or_set(INITIALS_FRAGMENT, ['source_list'],
+                                    compute)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['startswith_options'] = self.get_startswith_options()
         return context
 
 
-class CategoryDetail(CategoryBaseView, DetailView):
+class CategoryDetail(www_cache.CachedResponseMixin, CategoryBaseView,
+                     DetailView):
     model = Category
     context_object_name = 'current_category'
 
+    def get_cache_groups(self):
+        return [f'category:{self.kwargs["slug"]}', 'category_counts']
+
     def get_paginator_queryset(self):
         return Source.objects.public().filter(
             Q(category=self.get_object()) |
@@ -323,10 +327,14 @@ class CategoryDetail(CategoryBaseView, DetailView):
         return context
 
 
-class SubCategoryDetail(CategoryBaseView, DetailView):
+class SubCategoryDetail(www_cache.CachedResponseMixin, CategoryBaseView,
+                        DetailView):
     model = SubCategory
     context_object_name = 'current_sub_category'
 
+    def get_cache_groups(self):
+        return [f'subcategory:{self.kwargs["slug"]}', 'category_counts']
+
     def get_paginator_queryset(self):
         return Source.objects.public().filter(
             sub_category=self.get_object()
@@ -347,11 +355,14 @@ class ChangeListView(View):
         return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/'))
 
 
-class KeywordViews(PaginatedView, DetailView):
+class KeywordViews(www_cache.CachedResponseMixin, PaginatedView, DetailView):
     model = KeyWord
     context_object_name = 'keyword'
     view_name = 'index'
 
+    def get_cache_groups(self):
+        return [f'keyword:{self.kwargs["slug"]}']
+
     template_name = 'keyword.html'
 
     def get_paginator_queryset(self):
@@ -421,7 +432,8 @@ class SearchView(PaginatedView, TemplateView):
         results = Blob.search_paginator(
             query,
             self.request.GET.get('page', 1),
-            is_public=True
+            is_public=True,
+            hydrate=True,
         )
 
         sources = [